@@ -0,0 +1,217 @@
+"""
+
+module:: AutoCodec
+    :synopsis: Tries several codecs and both predictive directions on an image and keeps only the smallest result, together with a tag
+    saying how to decode it. The predictive transformation is computed once per direction and shared by every codec.
+
+Several libs are imported here:
+    matplotlib
+    numpy
+    concurrent.futures (process pool)
+    imageio
+    LZWCodec
+    RLEHuffmanCodec
+    StdlibCodec
+    PredictiveTransform
+    estimate
+
+
+File format: 1 byte with the tag (index of the codec in CODECS * 2 + 1 if vertical) and then the data given by the codec's
+compress_residuals().
+
+"""
+
+import os
+import time
+import numpy as np
+import matplotlib.image as mpimg
+import imageio
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from lzw import LZWCodec
+from rlehuff import RLEHuffmanCodec
+from stdcodec import StdlibCodec
+from predictive import PredictiveTransform, check_image
+from estimator import estimate
+
+
+# the order is part of the file format (tag), new codecs go to the end
+CODECS = ("lzw", "rlehuff", "zlib")
+CLASSES = {"lzw": LZWCodec, "rlehuff": RLEHuffmanCodec, "zlib": StdlibCodec}
+
+# smaller images are encoded in this process, sending them to the workers costs more than it saves
+PARALLEL_PIXELS = 2**18
+
+
+def _compress_candidate(codec, residuals):
+    """
+    Encodes the residuals with one codec (it runs in a worker process).
+    """
+    return CLASSES[codec]().compress_residuals(residuals)
+
+
+class AutoCodec:
+    """
+    This codec encodes an image with each candidate (codec and predictive direction) and keeps the smallest result.
+
+    Use only encode() and decode(), or compress() and decompress() in memory.
+
+    The worker processes are started by the first image big enough to use them (see PARALLEL_PIXELS) and kept for the next
+    ones. Call close() (or use the codec as a context manager) to stop them.
+    """
+
+    def __init__(self, codecs=("lzw", "rlehuff"), workers=None, timeBudget=None, useEstimator=False):
+        """
+        Codec constructor.
+
+        Parameters:
+            codecs (tuple): codecs to try, from CODECS. Default: ("lzw", "rlehuff")
+            workers (int): number of processes encoding candidates at the same time. Default: None, number of CPUs
+            timeBudget (float): seconds to wait for the candidates, the smallest finished one is kept (at least one is always
+                waited for). Candidates still running then finish in the background, on workers the next image cannot use until
+                they are done. Default: None, waits for all of them
+            useEstimator (boolean): if True, the candidates are not all encoded, only the best one for estimate(). Default: False
+        """
+        assert all(codec in CODECS for codec in codecs), "unknown codec"
+        self.codecs = codecs
+        self.workers = workers or os.cpu_count() or 1
+        self.timeBudget = timeBudget
+        self.useEstimator = useEstimator
+        self._pool = None
+
+
+    def close(self):
+        """
+        Stops the worker processes, if they were started, and waits for them to exit.
+        """
+        if (self._pool is not None):
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def candidates(self, data):
+        """
+        Parameters:
+            data (2D array): image
+
+        Returns:
+            list: candidates to be tried, as (codec, vertical)
+        """
+        if (self.useEstimator):
+            codec, vertical, _ = estimate(data)["best"]
+            if (codec in self.codecs):
+                return [(codec, vertical)]
+        return [(codec, vertical) for vertical in (False, True) for codec in self.codecs]
+
+
+    def compress(self, data):
+        """
+        Encodes a given image in memory with the best candidate.
+
+        Parameters:
+            data (2D array): image to be encoded (uint8)
+
+        Returns:
+            bytes: tag and encoded data (see the file format)
+        """
+        t1 = time.perf_counter()
+        data = check_image(data, "AutoCodec")
+        candidates = self.candidates(data)
+
+        pt = PredictiveTransform()
+        residuals = {vertical: pt.encode(data, vertical) for vertical in set(v for _, v in candidates)}
+
+        results = {}
+        if (self.workers > 1 and len(candidates) > 1 and np.size(data) >= PARALLEL_PIXELS):
+            if (self._pool is None):
+                self._pool = ProcessPoolExecutor(max_workers=min(self.workers, len(self.codecs) * 2))
+            jobs = {self._pool.submit(_compress_candidate, codec, residuals[vertical]): (codec, vertical) for codec, vertical in candidates}
+            pending = set(jobs)
+            try:
+                while (len(pending) > 0):
+                    timeout = None
+                    if (self.timeBudget is not None):
+                        timeout = max(0, self.timeBudget - (time.perf_counter() - t1))
+                    done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for job in done:
+                        results[jobs[job]] = job.result()
+                    if (self.timeBudget is not None and time.perf_counter() - t1 >= self.timeBudget and len(results) > 0):
+                        break
+            finally:
+                # candidates which did not start are dropped, the ones still running finish in the background and are ignored
+                for job in pending:
+                    job.cancel()
+        else:
+            for codec, vertical in candidates:
+                results[(codec, vertical)] = _compress_candidate(codec, residuals[vertical])
+                if (self.timeBudget is not None and time.perf_counter() - t1 >= self.timeBudget):
+                    break
+
+        (codec, vertical), payload = min(results.items(), key=lambda item: len(item[1]))
+        tag = CODECS.index(codec) * 2 + int(vertical)
+
+        return bytes([tag]) + payload
+
+
+    def decompress(self, payload):
+        """
+        Decodes the output of compress() back to the image, in memory. The codec and direction are read from the tag.
+
+        Parameters:
+            payload (bytes): data given by compress()
+
+        Returns:
+            2D array: decoded image (uint8)
+        """
+        codec, vertical = self.read_tag(payload)
+        residuals = CLASSES[codec]().decompress_residuals(payload[1:])
+
+        pt = PredictiveTransform()
+        return pt.decode(residuals, vertical).astype(np.uint8)
+
+
+    def read_tag(self, payload):
+        """
+        Parameters:
+            payload (bytes): data given by compress()
+
+        Returns:
+            string: codec which was chosen
+            boolean: True if the predictive transformation was vertical
+        """
+        return CODECS[payload[0] // 2], bool(payload[0] % 2)
+
+
+    def encode(self, filein, fileout):
+        """
+        Encodes a given file with the best candidate and outputs it in another file.
+
+        Parameters:
+            filein (string): file to be encoded (.bmp format)
+            fileout (string): file to be created as output
+        """
+        data = mpimg.imread(filein)
+
+        with open(fileout, "wb") as f:
+            f.write(self.compress(data))
+
+
+    def decode(self, filein, fileout):
+        """
+        Decodes a given file and outputs the decoded data into a .bmp (bitmap) file.
+
+        Parameters:
+            filein (string): file to be decoded
+            fileout (string): file to be created and outputted (preferably .bmp format)
+        """
+        with open(filein, "rb") as f:
+            payload = f.read()
+
+        imageio.imwrite(fileout, self.decompress(payload))
@@ -0,0 +1,334 @@
+"""
+
+module:: BatchProcessor
+    :synopsis: Pipelined batch driver. The next files are read on reader threads while the current one is being encoded (prefetch),
+    and the outputs are written on writer threads while the next ones are encoded (write-behind), so disk and CPU work at the same
+    time.
+
+Several libs are imported here:
+    matplotlib
+    numpy
+    concurrent.futures (thread pools)
+    threading
+    imageio
+    LZWCodec
+    RLEHuffmanCodec
+    StdlibCodec
+
+
+The compressed files are the output of the codec's compress() (the same bytes as the in-memory API), one per image.
+
+At most "prefetch" files are read ahead, and at most "inFlight" outputs wait to be written: when they are all taken, the encoding
+waits for a write to finish, so memory stays bounded however many files there are.
+
+Reads and writes have their own threads: with one pool, a burst of writes could take every thread and the next file would not be
+read ahead until they were done.
+
+"""
+
+import os
+import time
+import threading
+import collections
+import numpy as np
+import matplotlib.image as mpimg
+import imageio
+from concurrent.futures import ThreadPoolExecutor
+from lzw import LZWCodec
+from rlehuff import RLEHuffmanCodec
+from stdcodec import StdlibCodec
+
+
+CODECS = {"lzw": LZWCodec, "rlehuff": RLEHuffmanCodec, "zlib": StdlibCodec}
+
+
+def _busy_time(intervals):
+    """
+    Parameters:
+        intervals (list): (start, end) times
+
+    Returns:
+        list: the same time as sorted intervals that do not overlap
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if (len(merged) > 0 and start <= merged[-1][1]):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _overlap_time(a, b):
+    """
+    Parameters:
+        a (list): (start, end) times
+        b (list): (start, end) times
+
+    Returns:
+        float: time during which both a and b were busy
+    """
+    a, b = _busy_time(a), _busy_time(b)
+    i = j = 0
+    total = 0.0
+    while (i < len(a) and j < len(b)):
+        total += max(0.0, min(a[i][1], b[j][1]) - max(a[i][0], b[j][0]))
+        if (a[i][1] < b[j][1]):
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+class BatchReport:
+    """
+    Times of a batch: when each file was read, encoded (or decoded) and written.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self.reads = []
+        self.computes = []
+        self.writes = []
+        self.files = 0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.wall = 0.0
+        self._lock = threading.Lock()
+
+
+    def record(self, stage, start, end, size=0):
+        """
+        Records one step (it may be called from any thread).
+
+        Parameters:
+            stage (string): "read", "compute" or "write"
+            start (float): time.perf_counter() when it started
+            end (float): time.perf_counter() when it ended
+            size (int): bytes read or written
+        """
+        with self._lock:
+            if (stage == "read"):
+                self.reads.append((start, end))
+                self.bytesRead += size
+            elif (stage == "write"):
+                self.writes.append((start, end))
+                self.bytesWritten += size
+            else:
+                self.computes.append((start, end))
+
+
+    def summary(self):
+        """
+        Returns:
+            dict: number of files, bytes, wall time, busy time of each stage, time during which I/O and compute overlapped
+            (seconds) and the share of the I/O time hidden behind compute
+        """
+        io = self.reads + self.writes
+        io_time = sum(end - start for start, end in _busy_time(io))
+        overlap = _overlap_time(io, self.computes)
+        return {
+            "files": self.files,
+            "bytesRead": self.bytesRead,
+            "bytesWritten": self.bytesWritten,
+            "wall": self.wall,
+            "read": sum(end - start for start, end in self.reads),
+            "compute": sum(end - start for start, end in self.computes),
+            "write": sum(end - start for start, end in self.writes),
+            "io": io_time,
+            "overlap": overlap,
+            "hiddenIO": overlap / io_time if io_time > 0 else 0.0,
+        }
+
+
+class BatchProcessor:
+    """
+    Encodes (or decodes) many files with one codec, reading ahead and writing behind on their own threads.
+
+    Use compress_files() and decompress_files(), or compress_directory() and decompress_directory().
+    """
+
+    def __init__(self, codec="lzw", prefetch=2, inFlight=4, readThreads=1, writeThreads=1):
+        """
+        Constructor.
+
+        Parameters:
+            codec (string): "lzw", "rlehuff" or "zlib". Default: "lzw"
+            prefetch (int): number of files read ahead of the one being encoded. Default: 2
+            inFlight (int): max number of outputs waiting to be written. Default: 4
+            readThreads (int): number of threads reading files. Default: 1
+            writeThreads (int): number of threads writing files. Default: 1
+        """
+        assert codec in CODECS, "unknown codec " + repr(codec)
+        assert prefetch >= 1 and inFlight >= 1 and readThreads >= 1 and writeThreads >= 1
+        self.codec = codec
+        self.prefetch = prefetch
+        self.inFlight = inFlight
+        self.readThreads = readThreads
+        self.writeThreads = writeThreads
+
+
+    def _run(self, filesin, filesout, read, compute, write):
+        """
+        Runs the pipeline: read() on the reader threads, compute() on this thread, write() on the writer threads.
+
+        Parameters:
+            filesin (list): input files
+            filesout (list): output files, one per input file
+            read (function): file -> (data, bytes read)
+            compute (function): data -> output
+            write (function): (output, file) -> bytes written
+
+        Returns:
+            BatchReport: times of the batch
+        """
+        assert len(filesin) == len(filesout), "one output file per input file"
+        report = BatchReport()
+        slots = threading.BoundedSemaphore(self.inFlight)
+
+        def timed_read(filein):
+            start = time.perf_counter()
+            data, size = read(filein)
+            report.record("read", start, time.perf_counter(), size)
+            return data
+
+        def timed_write(output, fileout):
+            try:
+                start = time.perf_counter()
+                size = write(output, fileout)
+                report.record("write", start, time.perf_counter(), size)
+            finally:
+                slots.release()
+
+        t1 = time.perf_counter()
+        readers = ThreadPoolExecutor(max_workers=self.readThreads)
+        writers = ThreadPoolExecutor(max_workers=self.writeThreads)
+        try:
+            reads = collections.deque()
+            writes = []
+            next_file = 0
+            for fileout in filesout:
+                # keep "prefetch" files being read ahead of this one
+                while (next_file < len(filesin) and len(reads) <= self.prefetch):
+                    reads.append(readers.submit(timed_read, filesin[next_file]))
+                    next_file += 1
+                data = reads.popleft().result()
+
+                start = time.perf_counter()
+                output = compute(data)
+                report.record("compute", start, time.perf_counter())
+                del data
+
+                # waits here when "inFlight" outputs are not written yet
+                slots.acquire()
+                writes.append(writers.submit(timed_write, output, fileout))
+                del output
+                report.files += 1
+
+            for job in writes:
+                job.result()
+        finally:
+            readers.shutdown(wait=True, cancel_futures=True)
+            writers.shutdown(wait=True, cancel_futures=True)
+        report.wall = time.perf_counter() - t1
+
+        return report
+
+
+    def compress_files(self, filesin, filesout, vertical=False):
+        """
+        Encodes each file of a list into another file.
+
+        Parameters:
+            filesin (list): files to be encoded (.bmp format)
+            filesout (list): files to be created as output, one per input file
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+
+        Returns:
+            BatchReport: times of the batch
+        """
+        codec = CODECS[self.codec]()
+
+        def read(filein):
+            data = mpimg.imread(filein)
+            return data, os.path.getsize(filein)
+
+        def write(payload, fileout):
+            with open(fileout, "wb") as f:
+                f.write(payload)
+            return len(payload)
+
+        return self._run(filesin, filesout, read, lambda data: codec.compress(data, vertical=vertical), write)
+
+
+    def decompress_files(self, filesin, filesout, vertical=False):
+        """
+        Decodes each file of a list (given by compress_files()) into a .bmp (bitmap) file.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            filesin (list): files to be decoded
+            filesout (list): files to be created and outputted (preferably .bmp format), one per input file
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+
+        Returns:
+            BatchReport: times of the batch
+        """
+        codec = CODECS[self.codec]()
+
+        def read(filein):
+            with open(filein, "rb") as f:
+                payload = f.read()
+            return payload, len(payload)
+
+        def write(image, fileout):
+            imageio.imwrite(fileout, np.asarray(image, dtype=np.uint8))
+            return os.path.getsize(fileout)
+
+        return self._run(filesin, filesout, read, lambda payload: codec.decompress(payload, vertical=vertical), write)
+
+
+    def compress_directory(self, dirin, dirout, extension=".bmp", vertical=False):
+        """
+        Encodes every file of a directory with the given extension. Outputs are named after the input with the codec name as
+        extension (egg.bmp -> egg.lzw).
+
+        Parameters:
+            dirin (string): directory with the files to be encoded
+            dirout (string): directory where the encoded files are created
+            extension (string): extension of the files to be encoded. Default: ".bmp"
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+
+        Returns:
+            BatchReport: times of the batch
+        """
+        os.makedirs(dirout, exist_ok=True)
+        names = sorted(name for name in os.listdir(dirin) if name.endswith(extension))
+        filesin = [os.path.join(dirin, name) for name in names]
+        filesout = [os.path.join(dirout, os.path.splitext(name)[0] + "." + self.codec) for name in names]
+
+        return self.compress_files(filesin, filesout, vertical)
+
+
+    def decompress_directory(self, dirin, dirout, extension=".bmp", vertical=False):
+        """
+        Decodes every file of a directory given by compress_directory() (egg.lzw -> egg.bmp).
+
+        Parameters:
+            dirin (string): directory with the files to be decoded
+            dirout (string): directory where the decoded files are created
+            extension (string): extension of the decoded files. Default: ".bmp"
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+
+        Returns:
+            BatchReport: times of the batch
+        """
+        os.makedirs(dirout, exist_ok=True)
+        names = sorted(name for name in os.listdir(dirin) if name.endswith("." + self.codec))
+        filesin = [os.path.join(dirin, name) for name in names]
+        filesout = [os.path.join(dirout, os.path.splitext(name)[0] + extension) for name in names]
+
+        return self.decompress_files(filesin, filesout, vertical)
@@ -0,0 +1,230 @@
+"""
+
+module:: ContextHuffmanCodec
+    :synopsis: This codec encodes the residuals of the predictive transformation with Huffman codes, using a different table for each
+    context. The context of a pixel is given by the magnitude of the residuals of its left and upper neighbors (as in JPEG-LS), which
+    the decoder already knows when it gets to that pixel.
+
+Several libs are imported here:
+    matplotlib
+    numpy
+    json
+    imageio
+    HuffmanCodec
+    PredictiveTransform
+
+
+The activity of a pixel is |left residual| + |upper residual| (0 outside the image) and its context is the number of thresholds
+below its activity. Each context has its own table and its own stream of codes.
+
+"""
+
+import json
+import numpy as np
+import matplotlib.image as mpimg
+import imageio
+from huffmancodec import HuffmanCodec
+from predictive import PredictiveTransform, check_image, check_residuals
+
+
+# "end of file" symbol of each stream (residuals are never this low)
+EOF = -1000
+
+
+def activity(residuals):
+    """
+    Activity of each pixel: |left residual| + |upper residual|, 0 outside the image.
+
+    Parameters:
+        residuals (2D array): residuals given by PredictiveTransform
+
+    Returns:
+        2D array: activity of each pixel
+    """
+    magnitude = np.abs(residuals.astype(np.int32))
+    final_data = np.zeros_like(magnitude)
+    final_data[:, 1:] += magnitude[:, :-1]
+    final_data[1:, :] += magnitude[:-1, :]
+    return final_data
+
+
+class ContextHuffmanCodec:
+    """
+    This codec makes a predictive transformation before encoding. Huffman codes with one table per context are used afterwards.
+
+    Use only encode() and decode(), or compress() and decompress() in memory.
+    """
+
+    def __init__(self, thresholds=(0, 2, 6, 16)):
+        """
+        Codec constructor.
+
+        Parameters:
+            thresholds (tuple): activity thresholds, there are len(thresholds) + 1 contexts. Stored with the table. Default: (0, 2, 6, 16)
+        """
+        self.thresholds = tuple(thresholds)
+
+
+    def encode_residuals(self, data):
+        """
+        Encodes already transformed (predictive) residuals.
+
+        Parameters:
+            data (2D array): residuals given by PredictiveTransform
+
+        Returns:
+            bytes: encoded data (the streams of all the contexts)
+            dict: tables, thresholds, size of each stream and size of the image, to be stored as JSON
+        """
+        # the decoder finds the contexts of activities up to 2 * 255 only
+        check_residuals(data, "ContextHuffmanCodec")
+        heigth, length = data.shape
+        contexts = np.digitize(activity(data), self.thresholds, right=True).flatten()
+        data = data.astype(np.int32).flatten()
+
+        tables = []
+        streams = []
+        for context in range(len(self.thresholds) + 1):
+            symbols = data[contexts == context].tolist()
+            if (len(symbols) == 0):
+                tables.append({})
+                streams.append(b"")
+                continue
+            codec = HuffmanCodec.from_data(symbols, eof=EOF)
+            table = codec.get_code_table()
+            tables.append({str(s): [b, v] for s, (b, v) in table.items()})
+            streams.append(codec.encode(symbols))
+
+        js = {
+            "size": {"length": length, "heigth": heigth},
+            "thresholds": list(self.thresholds),
+            "tables": tables,
+            "sizes": [len(stream) for stream in streams],
+        }
+
+        return b"".join(streams), js
+
+
+    def decode_residuals(self, enc, js):
+        """
+        Decodes the output of encode_residuals() back to the residuals. The contexts are computed pixel by pixel from the residuals
+        already decoded, and each pixel takes the next symbol of the stream of its context.
+
+        Parameters:
+            enc (bytes): encoded data
+            js (dict): as given by encode_residuals()
+
+        Returns:
+            2D array: residuals (int16) to be given to PredictiveTransform
+        """
+        length, heigth = js["size"]["length"], js["size"]["heigth"]
+        thresholds = js["thresholds"]
+
+        streams = []
+        offset = 0
+        for table, size in zip(js["tables"], js["sizes"]):
+            table = {int(s): (b, v) for s, (b, v) in table.items()}
+            codec = HuffmanCodec(table, check=False, eof=EOF)
+            streams.append(codec.decode_streaming(enc[offset:offset + size]).__next__)
+            offset += size
+
+        # context of each activity (residuals are at most 255 in magnitude)
+        lut = np.digitize(np.arange(2 * 256), thresholds, right=True).tolist()
+
+        final_data = np.zeros((heigth, length), dtype=np.int16)
+        up = [0] * length
+        for i in range(heigth):
+            row = [0] * length
+            left = 0
+            for j in range(length):
+                left = streams[lut[abs(left) + abs(up[j])]]()
+                row[j] = left
+            final_data[i, :] = row
+            up = row
+
+        return final_data
+
+
+    def compress(self, data, vertical=False):
+        """
+        Transforms using PredictiveTransform and encodes a given image in memory.
+
+        The table is packed together with the encoded data: 4 bytes (big endian) with the length of the JSON table, the JSON table
+        and then the encoded data.
+
+        Parameters:
+            data (2D array): image to be encoded (uint8)
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+
+        Returns:
+            bytes: table and encoded data
+        """
+        pt = PredictiveTransform()
+        enc, js = self.encode_residuals(pt.encode(check_image(data, "ContextHuffmanCodec"), vertical))
+        table = json.dumps(js).encode()
+
+        return len(table).to_bytes(4, "big") + table + enc
+
+
+    def decompress(self, payload, vertical=False):
+        """
+        Decodes the output of compress() back to the image, in memory.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            payload (bytes): data given by compress()
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+
+        Returns:
+            2D array: decoded image (uint8)
+        """
+        size = int.from_bytes(payload[:4], "big")
+        js = json.loads(bytes(payload[4:4 + size]).decode())
+
+        pt = PredictiveTransform()
+        return pt.decode(self.decode_residuals(bytes(payload[4 + size:]), js), vertical).astype("uint8")
+
+
+    def encode(self, filein, fileout, filetreeout, vertical=False):
+        """
+        Transforms using PredictiveTransform and encodes a given file and outputs it in another file.
+
+        Parameters:
+            filein (string): file to be encoded (.bmp format)
+            fileout (string): file to be created as output
+            filetreeout (string): file to be created with the tables (.json format)
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+        """
+        data = mpimg.imread(filein)
+
+        pt = PredictiveTransform()
+        enc, js = self.encode_residuals(pt.encode(check_image(data, "ContextHuffmanCodec"), vertical))
+
+        with open(fileout, "wb") as f:
+            f.write(enc)
+
+        with open(filetreeout, "w") as fp:
+            json.dump(js, fp)
+
+
+    def decode(self, filein, fileout, filetreein, vertical=False):
+        """
+        Decodes a given file and outputs the decoded data into a .bmp (bitmap) file.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            filein (string): file to be decoded
+            fileout (string): file to be created and outputted (preferably .bmp format)
+            filetreein (string): file with the tables (.json format)
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+        """
+        with open(filetreein) as fp:
+            js = json.load(fp)
+
+        with open(filein, "rb") as f:
+            enc = f.read()
+
+        pt = PredictiveTransform()
+        imageio.imwrite(fileout, pt.decode(self.decode_residuals(enc, js), vertical).astype("uint8"))
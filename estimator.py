@@ -0,0 +1,183 @@
+"""
+
+module:: Estimator
+    :synopsis: Estimates how well an image compresses, for each predictive direction, without encoding it: order-0 entropy, size with
+    Huffman codes, run statistics and sizes of RLE + Huffman and LZW. Everything but the LZW estimate is computed with numpy over
+    histograms, and LZW encodes only a few short windows (at most SAMPLE_FRACTION of the pixels).
+
+Several libs are imported here:
+    numpy
+    collections
+    HuffmanCodec
+    LZWCodec
+    PredictiveTransform
+
+
+Use estimate(image).
+
+"""
+
+import collections
+import math
+import numpy as np
+from huffmancodec import HuffmanCodec
+from lzw import LZWCodec
+from predictive import PredictiveTransform
+
+
+# LZW sample: windows of at most this many symbols, covering at most this fraction of the data
+SAMPLE_FRACTION = 0.05
+
+
+def huffman_bits(frequencies):
+    """
+    Size of the data coded with Huffman codes built from its own frequencies (the "end of file" symbol is not counted).
+
+    Parameters:
+        frequencies (dict): symbol -> frequency
+
+    Returns:
+        int: size in bits
+    """
+    frequencies = {s: f for s, f in frequencies.items() if f > 0}
+    if (len(frequencies) == 0):
+        return 0
+    table = HuffmanCodec.from_frequencies(frequencies, eof="EOF").get_code_table()
+    return sum(f * table[s][0] for s, f in frequencies.items())
+
+
+def run_statistics(data):
+    """
+    Runs of equal values of a 1D array (as RLEHuffmanCodec.rle_encode sees them).
+
+    Parameters:
+        data (array): 1D data
+
+    Returns:
+        array: value of each run
+        array: length of each run
+    """
+    if (len(data) == 0):
+        return data[:0], np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.diff(data)) + 1
+    starts = np.concatenate([[0], starts])
+    lengths = np.diff(np.concatenate([starts, [len(data)]]))
+    return data[starts], lengths
+
+
+def lzw_codes(data, window=4096, samples=8, chunkSize=50000):
+    """
+    Estimates how many LZW codes the data gives, encoding only a few short windows spread over it.
+
+    A short window gives more codes per symbol than a whole chunk (the dictionary is still small). The codes of a whole chunk are
+    extrapolated from the codes of each window and of its first half, with two growth models: x / log(x) and a power law fitted
+    to the window. The first one overestimates and the second one underestimates, their geometric mean is used.
+
+    Parameters:
+        data (array): 1D data to be encoded (residuals + 255)
+        window (int): symbols of each window. Default: 4096
+        samples (int): max number of windows, they cover at most SAMPLE_FRACTION of the data. Default: 8
+        chunkSize (int): size of the LZW chunks. Default: 50000
+
+    Returns:
+        float: estimated number of codes (reset codes included)
+    """
+    n = len(data)
+    if (n == 0):
+        return 0.0
+    window = min(window, n)
+    count = int(min(samples, max(1, SAMPLE_FRACTION * n // window)))
+    chunk = min(chunkSize, n)
+
+    codec = LZWCodec()
+    starts = np.unique(np.linspace(0, n - window, count).astype(np.int64))
+    rate = 0.0
+    for start in starts:
+        sample = data[start:start + window]
+        full = len(codec.encode_LZW(sample)) - 1
+        half = len(codec.encode_LZW(sample[:window // 2])) - 1
+        if (window < 4 or chunk <= window or half <= 0):
+            rate += full / window
+            continue
+        log_model = full * math.log2(window) / math.log2(chunk) / window
+        power_model = full * (chunk / window) ** (math.log(full / half) / math.log(window / (window // 2))) / chunk
+        rate += math.sqrt(log_model * power_model)
+
+    # codes per symbol times the symbols, plus the reset code of each chunk
+    return rate / len(starts) * n + math.ceil(n / chunkSize)
+
+
+def estimate_direction(residuals, samples=8, chunkSize=50000):
+    """
+    Estimates for the residuals of one predictive direction.
+
+    Parameters:
+        residuals (2D array): residuals given by PredictiveTransform
+        samples (int): max number of windows encoded with LZW to estimate its size (see lzw_codes()). Default: 8
+        chunkSize (int): size of the LZW chunks. Default: 50000
+
+    Returns:
+        dict: estimates (sizes in bytes, entropy in bits per pixel)
+    """
+    data = residuals.flatten().astype(np.int32)
+    n = len(data)
+
+    histogram = np.bincount(data + 255, minlength=511)
+    p = histogram[histogram > 0] / n
+    entropy = float(-(p * np.log2(p)).sum())
+    huffman = huffman_bits({str(s - 255): int(f) for s, f in enumerate(histogram)})
+
+    # RLE symbols: runs of 3 or more are "count", "*", "value", the others are one "value" per pixel, all separated by "#"
+    values, lengths = run_statistics(data)
+    long_runs = lengths >= 3
+    symbols = collections.Counter()
+    for s, f in enumerate(np.bincount(values[long_runs] + 255, minlength=511)):
+        symbols[str(s - 255)] += int(f)
+    for s, f in enumerate(np.bincount(values[~long_runs] + 255, weights=lengths[~long_runs], minlength=511)):
+        symbols[str(s - 255)] += int(f)
+    for s, f in enumerate(np.bincount(lengths[long_runs])):
+        symbols[str(s)] += int(f)
+    symbols["*"] = int(np.count_nonzero(long_runs))
+    symbols["#"] = max(0, sum(symbols.values()) - 2 * symbols["*"] - 1)
+
+    return {
+        "entropy": entropy,
+        "entropyBytes": entropy * n / 8,
+        "huffmanBytes": huffman / 8,
+        "runs": {
+            "count": len(lengths),
+            "meanLength": float(lengths.mean()) if len(lengths) > 0 else 0.0,
+            "longRuns": int(np.count_nonzero(long_runs)),
+            "pixelsInLongRuns": int(lengths[long_runs].sum()),
+        },
+        "rleHuffmanBytes": huffman_bits(symbols) / 8,
+        "lzwBytes": 2 * lzw_codes(data + 255, samples=samples, chunkSize=chunkSize),
+    }
+
+
+def estimate(image, samples=8, chunkSize=50000):
+    """
+    Estimates how well an image compresses, for both predictive directions.
+
+    Parameters:
+        image (2D array): image (uint8)
+        samples (int): max number of windows encoded with LZW to estimate its size (see lzw_codes()). Default: 8
+        chunkSize (int): size of the LZW chunks. Default: 50000
+
+    Returns:
+        dict: "pixels", and the estimates for "horizontal" and "vertical" (see estimate_direction()), and "best", the smallest
+        estimate as (codec, vertical, bytes) with codec "lzw" or "rlehuff"
+    """
+    pt = PredictiveTransform()
+    result = {"pixels": int(np.size(image))}
+
+    candidates = []
+    for name, vertical in (("horizontal", False), ("vertical", True)):
+        result[name] = estimate_direction(pt.encode(image, vertical), samples, chunkSize)
+        candidates.append((result[name]["lzwBytes"], "lzw", vertical))
+        candidates.append((result[name]["rleHuffmanBytes"], "rlehuff", vertical))
+
+    size, codec, vertical = min(candidates)
+    result["best"] = (codec, vertical, size)
+
+    return result
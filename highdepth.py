@@ -0,0 +1,235 @@
+"""
+
+module:: HighDepthCodec
+    :synopsis: Codec for 12 and 16-bit images (medical, scientific...). The residuals of the predictive transformation are split in a
+    magnitude class, coded with Huffman codes or LZW, and raw bits, so the tables stay small (17 classes instead of 65536 residuals).
+
+Several libs are imported here:
+    numpy
+    json
+    imageio (reads and writes 16-bit .png/.tiff)
+    HuffmanCodec
+    LZWCodec
+    PredictiveTransform
+
+
+Residuals are wrapped to 16 bits (the predictive decoder works mod 65536) and stored as in JPEG: the class of a residual r is the
+number of bits of |r| (0 for r = 0), followed by that many bits: r if r > 0, or r + 2^class - 1 if r < 0.
+
+Format: 4 bytes (big endian) with the length of a JSON header, the JSON header, the coded classes and then the raw bits.
+
+"""
+
+import json
+import numpy as np
+import imageio
+from huffmancodec import HuffmanCodec
+from lzw import LZWCodec
+from predictive import PredictiveTransform
+
+
+# "end of file" symbol of the Huffman codes of the classes
+EOF = -1
+
+
+def split_residuals(data):
+    """
+    Splits residuals in magnitude classes and raw bits.
+
+    Parameters:
+        data (array): residuals (any integer type, they are wrapped to 16 bits)
+
+    Returns:
+        array: class of each residual (0 to 16)
+        bytes: raw bits of all the residuals, packed
+    """
+    data = data.astype(np.int64).flatten()
+    data = ((data + 32768) & 0xFFFF) - 32768
+
+    magnitude = np.abs(data)
+    classes = np.zeros(len(data), dtype=np.int64)
+    for b in range(17):
+        classes += magnitude >= (1 << b)
+
+    extra = np.where(data < 0, data + (1 << classes) - 1, data)
+
+    # every residual gives "class" bits, most significant first
+    total = int(classes.sum())
+    starts = np.cumsum(classes) - classes
+    position = np.arange(total) - np.repeat(starts, classes)
+    shift = np.repeat(classes, classes) - 1 - position
+    bits = (np.repeat(extra, classes) >> shift) & 1
+
+    return classes, np.packbits(bits.astype(np.uint8)).tobytes()
+
+
+def join_residuals(classes, raw):
+    """
+    Inverse of split_residuals().
+
+    Parameters:
+        classes (array): class of each residual
+        raw (bytes): raw bits, packed
+
+    Returns:
+        array: residuals (int32, wrapped to the signed 16-bit range)
+    """
+    classes = np.asarray(classes, dtype=np.int64)
+    total = int(classes.sum())
+    bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8))[:total].astype(np.int64)
+
+    starts = np.cumsum(classes) - classes
+    position = np.arange(total) - np.repeat(starts, classes)
+    shift = np.repeat(classes, classes) - 1 - position
+
+    extra = np.zeros(len(classes), dtype=np.int64)
+    nonzero = classes > 0
+    if (total > 0):
+        extra[nonzero] = np.add.reduceat(bits << shift, starts[nonzero])
+
+    half = np.where(nonzero, 1 << np.maximum(classes - 1, 0), 1)
+    data = np.where(extra >= half, extra, extra - (1 << classes) + 1)
+    data[~nonzero] = 0
+
+    return data.astype(np.int32)
+
+
+class HighDepthCodec:
+    """
+    This codec makes a predictive transformation before encoding. The magnitude classes of the residuals are coded with Huffman codes
+    or LZW, and the raw bits are stored as they are.
+
+    Use only encode() and decode(), or compress() and decompress() in memory.
+    """
+
+    def __init__(self, coder="huffman", chunkSize=50000):
+        """
+        Codec constructor.
+
+        Parameters:
+            coder (string): coder of the classes, "huffman" or "lzw". Default: "huffman"
+            chunkSize (int): size of the LZW chunks. Default: 50000
+        """
+        assert coder in ("huffman", "lzw"), "unknown coder " + repr(coder)
+        self.coder = coder
+        self.chunkSize = chunkSize
+
+
+    def compress_residuals(self, data):
+        """
+        Encodes already transformed (predictive) residuals in memory.
+
+        Parameters:
+            data (2D array): residuals given by PredictiveTransform
+
+        Returns:
+            bytes: encoded data (see the format)
+        """
+        heigth, length = data.shape
+        classes, raw = split_residuals(data)
+
+        header = {"size": {"length": length, "heigth": heigth}, "coder": self.coder}
+        if (self.coder == "huffman"):
+            codec = HuffmanCodec.from_data(classes.tolist(), eof=EOF)
+            coded = codec.encode(classes.tolist())
+            header["table"] = [[s, b, v] for s, (b, v) in codec.get_code_table().items()]
+        else:
+            lzw = LZWCodec()
+            coded = np.concatenate([lzw.encode_LZW(classes[i:i + self.chunkSize])
+                                    for i in range(0, len(classes), self.chunkSize)]).astype("<u2").tobytes()
+        header["sizes"] = [len(coded), len(raw)]
+
+        header = json.dumps(header).encode()
+        return len(header).to_bytes(4, "big") + header + coded + raw
+
+
+    def decompress_residuals(self, payload):
+        """
+        Decodes the output of compress_residuals() back to the residuals.
+
+        Parameters:
+            payload (bytes): data given by compress_residuals()
+
+        Returns:
+            2D array: residuals (int32) to be given to PredictiveTransform
+        """
+        size = int.from_bytes(payload[:4], "big")
+        header = json.loads(bytes(payload[4:4 + size]).decode())
+        length, heigth = header["size"]["length"], header["size"]["heigth"]
+        coded_size, raw_size = header["sizes"]
+        offset = 4 + size
+
+        coded = bytes(payload[offset:offset + coded_size])
+        raw = bytes(payload[offset + coded_size:offset + coded_size + raw_size])
+
+        if (header["coder"] == "huffman"):
+            table = {s: (b, v) for s, b, v in header["table"]}
+            classes = HuffmanCodec(table, check=False, eof=EOF).decode(coded)
+        else:
+            classes = LZWCodec().decode_LZW(np.frombuffer(coded, dtype="<u2"), 16)
+
+        return join_residuals(classes, raw).reshape(heigth, length)
+
+
+    def compress(self, data, vertical=False):
+        """
+        Transforms using PredictiveTransform and encodes a given image in memory.
+
+        Parameters:
+            data (2D array): image to be encoded (uint16, or uint8)
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+
+        Returns:
+            bytes: encoded data
+        """
+        pt = PredictiveTransform()
+        return self.compress_residuals(pt.encode(np.asarray(data, dtype=np.uint16), vertical))
+
+
+    def decompress(self, payload, vertical=False):
+        """
+        Decodes the output of compress() back to the image, in memory.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            payload (bytes): data given by compress()
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+
+        Returns:
+            2D array: decoded image (uint16)
+        """
+        pt = PredictiveTransform()
+        return pt.decode(self.decompress_residuals(payload), vertical, dtype="uint16")
+
+
+    def encode(self, filein, fileout, vertical=False):
+        """
+        Transforms using PredictiveTransform and encodes a given file and outputs it in another file.
+
+        Parameters:
+            filein (string): file to be encoded (16-bit .png or .tiff)
+            fileout (string): file to be created as output
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+        """
+        data = imageio.v2.imread(filein)
+
+        with open(fileout, "wb") as f:
+            f.write(self.compress(data, vertical))
+
+
+    def decode(self, filein, fileout, vertical=False):
+        """
+        Decodes a given file and outputs the decoded data into a 16-bit image file.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            filein (string): file to be decoded
+            fileout (string): file to be created and outputted (.png or .tiff format, which keep 16 bits)
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+        """
+        with open(filein, "rb") as f:
+            payload = f.read()
+
+        imageio.imwrite(fileout, self.decompress(payload, vertical))
@@ -6,9 +6,15 @@ pypi.org: https://pypi.org/project/dahuffman/
 
 """
 
+import array
 import collections
+import collections.abc
 import itertools
+import json
+import mmap
+import struct
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from heapq import heappush, heappop, heapify
 
 import logging
@@ -49,9 +55,26 @@ class _EndOfFileSymbol:
 _EOF = _EndOfFileSymbol()
 
 
-# TODO store/load code table from file
 # TODO Directly encode to and decode from file
 
+# Streams (or blocks) with fewer encoded bytes than this in total are decoded in this process even if workers are given:
+# starting the worker processes and sending them the tables costs more than decoding them
+PARALLEL_BYTES = 2 ** 16
+
+# Binary code table file (PrefixCodec.save/load), little endian, every section starts at a multiple of 8 bytes:
+#   header: magic, version, symbol kind, concat, flags, LUT bits, number of symbols, index of the EOF symbol, metadata size
+#   code lengths (uint8), code values (uint64),
+#   symbols: int64 values (kind 0) or uint32 offsets (number of symbols + 1) into a UTF-8 blob (kind 1),
+#   decode LUT (int32, 2**LUT bits entries): for the next LUT bits of the stream, (symbol index << 8) | code length,
+#   or -1 when the code is longer than LUT bits,
+#   metadata (JSON)
+_TABLE_MAGIC = b'PFXT'
+_TABLE_VERSION = 1
+_TABLE_HEADER = struct.Struct('<4sBBBBBxxxIIQ4x')
+_TABLE_CONCATS = [list, u''.join, bytes]
+_TABLE_DEFAULT_EOF = 1
+_TABLE_HUFFMAN = 2
+
 def _guess_concat(data):
     """
     Guess concat function from given data
@@ -62,6 +85,123 @@ def _guess_concat(data):
     }.get(type(data), list)
 
 
+def _decode_stream(table, eof, data):
+    """
+    Decode one substream of PrefixCodec.encode_streams() (used by worker processes)
+    """
+    return list(PrefixCodec(table, check=False, eof=eof).decode_streaming(data))
+
+
+def _align(offset):
+    return -(-offset // 8) * 8
+
+
+def _table_section(buffer, offset, typecode, count):
+    """
+    View (no copy) of count items of the given array typecode at offset of buffer, and the offset of the next section.
+    """
+    size = array.array(typecode).itemsize * count
+    view = buffer[offset:offset + size]
+    if sys.byteorder == 'big':
+        # the file is little endian
+        view = array.array(typecode, bytes(view))
+        view.byteswap()
+    else:
+        view = view.cast(typecode)
+    return view, _align(offset + size)
+
+
+class _TableArrays(collections.abc.Mapping):
+    """
+    Read-only code table (mapping of symbol to (bitsize, value)) backed by the arrays of a
+    code table file, usually memory-mapped. Nothing is parsed when loading: the symbol
+    index is only built the first time a symbol is looked up (encoding), and decoding
+    uses the LUT directly.
+    Pickled by path, so worker processes map the same file (shared through the page cache).
+    """
+
+    def __init__(self, path, buffer):
+        self.path = str(path)
+        self._buffer = buffer
+        (magic, version, self.kind, concat, self.flags, self.lut_bits,
+         self.count, self.eof, metadata_size) = _TABLE_HEADER.unpack_from(buffer, 0)
+        if magic != _TABLE_MAGIC or version != _TABLE_VERSION:
+            raise ValueError('{p!r} is not a code table file'.format(p=self.path))
+        self.concat = _TABLE_CONCATS[concat]
+
+        view = memoryview(buffer)
+        offset = _TABLE_HEADER.size
+        self.lengths, offset = _table_section(view, offset, 'B', self.count)
+        self.values, offset = _table_section(view, offset, 'Q', self.count)
+        if self.kind == 0:
+            self._symbols, offset = _table_section(view, offset, 'q', self.count)
+        else:
+            self._offsets, offset = _table_section(view, offset, 'I', self.count + 1)
+            self._blob = view[offset:offset + self._offsets[self.count]]
+            offset = _align(offset + self._offsets[self.count])
+        self.lut = None
+        if self.lut_bits:
+            self.lut, offset = _table_section(view, offset, 'i', 1 << self.lut_bits)
+        self.metadata = json.loads(bytes(view[offset:offset + metadata_size])) if metadata_size else None
+
+        self._cache = {}
+        self._index = None
+        self._long_codes = None
+
+    def __reduce__(self):
+        return _load_table_arrays, (self.path,)
+
+    def symbol(self, i):
+        """
+        Symbol at index i (_EOF for the default "end of file" symbol)
+        """
+        if i == self.eof and self.flags & _TABLE_DEFAULT_EOF:
+            return _EOF
+        if self.kind == 0:
+            return self._symbols[i]
+        symbol = self._cache.get(i)
+        if symbol is None:
+            symbol = self._cache[i] = bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode('utf-8')
+        return symbol
+
+    def index(self):
+        """
+        Mapping of symbol to its index (built once, on first use)
+        """
+        if self._index is None:
+            self._index = {self.symbol(i): i for i in range(self.count)}
+        return self._index
+
+    def long_codes(self):
+        """
+        Mapping of (bitsize, value) to symbol index, for the codes longer than the LUT
+        """
+        if self._long_codes is None:
+            self._long_codes = {
+                (self.lengths[i], self.values[i]): i for i in range(self.count) if self.lengths[i] > self.lut_bits
+            }
+        return self._long_codes
+
+    def __getitem__(self, symbol):
+        i = self.index()[symbol]
+        return self.lengths[i], self.values[i]
+
+    def __iter__(self):
+        return (self.symbol(i) for i in range(self.count))
+
+    def __len__(self):
+        return self.count
+
+
+def _load_table_arrays(path):
+    """
+    Memory-map a code table file (read only)
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _TableArrays(path, buffer)
+
+
 def ensure_dir(path: Union[str, Path]) -> Path:
     path = Path(path)
     if not path.exists():
@@ -186,6 +326,10 @@ class PrefixCodec:
         :param data: sequence of bytes (string, list or generator of bytes)
         :return: generator of symbols
         """
+        if isinstance(self._table, _TableArrays) and self._table.lut is not None:
+            yield from self._decode_lut(data)
+            return
+
         # Reverse lookup table: map (bitsize, value) to symbols
         lookup = {(b, v): s for s, (b, v) in self._table.items()}
 
@@ -203,47 +347,216 @@ class PrefixCodec:
                     buffer = 0
                     size = 0
 
-    def save(self, path: Union[str, Path], metadata: Any = None):
+    def _decode_lut(self, data):
+        """
+        Decode given data with the LUT of a loaded code table file:
+        one lookup of the next LUT bits per symbol instead of one per bit.
+        Codes longer than the LUT are looked up bit by bit after the LUT bits.
+
+        :param data: sequence of bytes
+        :return: generator of symbols
+        """
+        table = self._table
+        lut = table.lut
+        bits = table.lut_bits
+        mask = (1 << bits) - 1
+        longest = max(table.lengths)
+        eof = table.eof
+        symbol = table.symbol
+
+        buffer = 0
+        size = 0
+        for byte in data:
+            buffer = (buffer << 8) + byte
+            size += 8
+            while size >= bits:
+                entry = lut[(buffer >> (size - bits)) & mask]
+                if entry >= 0:
+                    i, b = entry >> 8, entry & 255
+                else:
+                    # longer code, which may still be incomplete
+                    i = b = None
+                    long_codes = table.long_codes()
+                    for n in range(bits + 1, min(size, longest) + 1):
+                        i = long_codes.get((n, (buffer >> (size - n)) & ((1 << n) - 1)))
+                        if i is not None:
+                            b = n
+                            break
+                    if i is None:
+                        break
+                size -= b
+                buffer &= (1 << size) - 1
+                if i == eof:
+                    return
+                yield symbol(i)
+
+        # Last bits (fewer than the LUT bits): only complete codes, the rest is padding or a cut "end of file"
+        while size > 0:
+            peek = buffer >> (size - bits) if size >= bits else buffer << (bits - size)
+            entry = lut[peek & mask]
+            if entry < 0 or (entry & 255) > size or entry >> 8 == eof:
+                return
+            size -= entry & 255
+            buffer &= (1 << size) - 1
+            yield symbol(entry >> 8)
+
+    def build_lut(self, bits):
+        """
+        Build the decode LUT of the code table file format.
+
+        :param bits: number of bits looked up at once
+        :return: array of 2**bits int32 entries: (symbol index << 8) | code length, or -1
         """
-        Persist the code table to a file.
+        lut = array.array('i', [-1]) * (1 << bits)
+        for i, (b, v) in enumerate(self._table.values()):
+            if b <= bits:
+                start = v << (bits - b)
+                lut[start:start + (1 << (bits - b))] = array.array('i', [(i << 8) | b]) * (1 << (bits - b))
+        return lut
+
+    def encode_streams(self, data, streams=4, interleave=True):
+        """
+        Encode given data in several independent substreams sharing this code table,
+        so they can be decoded at the same time.
+
+        Layout: 1 byte number of streams, 1 byte interleave flag,
+        4 bytes (big endian) size of each stream, and then the streams.
+
+        :param data: sequence of symbols
+        :param streams: number of substreams (1-255)
+        :param interleave: if True, symbols are dealt round-robin to the streams,
+            otherwise each stream gets a contiguous block of symbols
+        :return: byte string
+        """
+        assert 1 <= streams <= 255
+        data = list(data)
+        if interleave:
+            parts = [data[i::streams] for i in range(streams)]
+        else:
+            size = -(-len(data) // streams)
+            parts = [data[i * size:(i + 1) * size] for i in range(streams)]
+        encoded = [self.encode(part) for part in parts]
+        header = struct.pack('>BB%dI' % streams, streams, interleave, *[len(e) for e in encoded])
+        return header + b''.join(encoded)
+
+    def decode_streams(self, data, concat=None, workers=None):
+        """
+        Decode data given by encode_streams().
+
+        :param data: byte string
+        :param concat: optional override of function to concatenate the decoded symbols
+        :param workers: if given, number of processes decoding the streams at the same time (only when there are at least
+            PARALLEL_BYTES of them)
+        :return:
+        """
+        streams, interleave = struct.unpack('>BB', data[:2])
+        sizes = struct.unpack('>%dI' % streams, data[2:2 + 4 * streams])
+        offset = 2 + 4 * streams
+        parts = []
+        for size in sizes:
+            parts.append(bytes(data[offset:offset + size]))
+            offset += size
+
+        if workers and workers > 1 and streams > 1 and offset >= PARALLEL_BYTES:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                decoded = list(pool.map(_decode_stream, [self._table] * streams, [self._eof] * streams, parts))
+        else:
+            decoded = [list(self.decode_streaming(part)) for part in parts]
+
+        if interleave:
+            symbols = [None] * sum(len(d) for d in decoded)
+            for i, d in enumerate(decoded):
+                symbols[i::streams] = d
+        else:
+            symbols = list(itertools.chain.from_iterable(decoded))
+        return (concat or self._concat)(symbols)
+
+    def save(self, path: Union[str, Path], metadata: Any = None, lut_bits: int = 12):
+        """
+        Persist the code table to a binary code table file (see the format at the top of this module).
+        Symbols must be all ints or all strings; the "end of file" symbol may be the default one.
         :param path: file path to persist to
-        :param metadata: additional metadata
+        :param metadata: additional metadata (must be JSON serializable)
+        :param lut_bits: bits of the decode LUT, at most the longest code (0 for no LUT)
         :return:
         """
         code_table = self.get_code_table()
-        data = {
-            "code_table": code_table,
-            "type": type(self),
-            "concat": self._concat,
-        }
-        if metadata:
-            data['metadata'] = metadata
+        symbols = list(code_table.keys())
+        default_eof = self._eof == _EOF
+        eof = symbols.index(self._eof) if self._eof in code_table else 0xFFFFFFFF
+        plain = [s for s in symbols if not (default_eof and s == _EOF)]
+        if all(isinstance(s, int) for s in plain):
+            kind = 0
+        elif all(isinstance(s, str) for s in plain):
+            kind = 1
+        else:
+            raise ValueError('code table file symbols must be all int or all str')
+        if self._concat not in _TABLE_CONCATS:
+            raise ValueError('code table file concat must be list, str or bytes')
+
+        lengths = [b for b, _ in code_table.values()]
+        lut_bits = min(lut_bits, max(lengths, default=0))
+        flags = (_TABLE_DEFAULT_EOF if default_eof else 0) | (_TABLE_HUFFMAN if isinstance(self, HuffmanCodec) else 0)
+        meta = json.dumps(metadata).encode('utf-8') if metadata else b''
+
+        sections = [
+            array.array('B', lengths),
+            array.array('Q', [v for _, v in code_table.values()]),
+        ]
+        if kind == 0:
+            sections.append(array.array('q', [0 if s == _EOF and default_eof else s for s in symbols]))
+        else:
+            blobs = [b'' if s == _EOF and default_eof else s.encode('utf-8') for s in symbols]
+            sections.append(array.array('I', [0] + list(itertools.accumulate(len(b) for b in blobs))))
+            sections.append(b''.join(blobs))
+        if lut_bits:
+            sections.append(self.build_lut(lut_bits))
+
         path = Path(path)
         ensure_dir(path.parent)
         with path.open(mode='wb') as f:
-            # TODO also provide JSON option? Requires handling of _EOF and possibly other non-string code table keys.
-            pickle.dump(data, file=f)
+            f.write(_TABLE_HEADER.pack(_TABLE_MAGIC, _TABLE_VERSION, kind, _TABLE_CONCATS.index(self._concat), flags,
+                                       lut_bits, len(symbols), eof, len(meta)))
+            for section in sections:
+                if isinstance(section, array.array) and sys.byteorder == 'big':
+                    section = array.array(section.typecode, section)
+                    section.byteswap()
+                data = bytes(section)
+                f.write(data + b'\0' * (_align(len(data)) - len(data)))
+            f.write(meta)
         _log.info('Saved {c} code table ({l} items) to {p!r}'.format(
             c=type(self).__name__, l=len(code_table), p=str(path)
         ))
 
     @staticmethod
-    def load(path: Union[str, Path]) -> 'PrefixCodec':
+    def load(path: Union[str, Path], allow_pickle: bool = False) -> 'PrefixCodec':
         """
-        Load a persisted PrefixCodec
-        :param path: path to serialized PrefixCodec code table data.
+        Load a persisted PrefixCodec.
+        Code table files are memory-mapped and used as they are (no parsing), see _TableArrays.
+        Old pickled files are only read with allow_pickle=True (never on untrusted files).
+        :param path: path to the code table file
+        :param allow_pickle: also accept the old pickled format
         :return:
         """
         path = Path(path)
         with path.open(mode='rb') as f:
-            data = pickle.load(f)
-        cls = data['type']
-        assert issubclass(cls, PrefixCodec)
-        code_table = data['code_table']
+            magic = f.read(len(_TABLE_MAGIC))
+        if magic != _TABLE_MAGIC:
+            if not allow_pickle:
+                raise ValueError('{p!r} is not a code table file (pickled files need allow_pickle=True)'.format(p=str(path)))
+            with path.open(mode='rb') as f:
+                data = pickle.load(f)
+            cls = data['type']
+            assert issubclass(cls, PrefixCodec)
+            return cls(data['code_table'], concat=data['concat'])
+
+        code_table = _load_table_arrays(path)
+        cls = HuffmanCodec if code_table.flags & _TABLE_HUFFMAN else PrefixCodec
+        eof = code_table.symbol(code_table.eof) if code_table.eof < code_table.count else _EOF
         _log.info('Loading {c} with {l} code table items from {p!r}'.format(
             c=cls.__name__, l=len(code_table), p=str(path)
         ))
-        return cls(code_table, concat=data['concat'])
+        return cls(code_table, concat=code_table.concat, check=False, eof=eof)
 
 
 class HuffmanCodec(PrefixCodec):
@@ -9,7 +9,11 @@ Several libs are imported here:
     matplotlib
     numpy
     math
+    json
     imageio (to store the output info in a .bmp file)
+    PrimedDictionary (optional primed dictionaries)
+    multiprocessing.shared_memory and concurrent.futures (workers mode)
+    memory (maxMemory option)
     PredictiveTransform
 
 
@@ -17,13 +21,241 @@ This LZW Algorithm was coded by "adityagupta3006" as in https://github.com/adity
 
 This codec was made by Rodrigo Ferreira based on the above. 
 
+Encoded data: shape of the image (2 uint16) followed by the LZW codes. When the decoder needs options (the ID of a primed dictionary, the
+dictionary-full policy if it is not "freeze"),
+a header comes first: 0 (no image has 0 rows), the number of uint16 words of the header and a JSON object packed in those words.
+
 """
 
 import numpy as np
 import matplotlib.image as mpimg
 import math
+import json
+import heapq
 import imageio
-from predictive import PredictiveTransform
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from predictive import PredictiveTransform, check_image, check_residuals
+from memory import parse_memory, plan_workers
+from lzwdict import PrimedDictionary
+
+
+# Workers mode: the input and output arrays live in shared memory, workers only get offsets.
+# These are the views of the worker process, set by _attach_shared().
+_shared = {}
+
+
+def _attach_shared(blocks, dictionary=None, policy="freeze"):
+    """
+    Process pool initializer. Attaches to the shared memory blocks created by the main process.
+
+    Parameters:
+        blocks (dict): name of the array -> (shared memory name, dtype, number of elements)
+        dictionary (PrimedDictionary): primed dictionary of the codec, if any
+        policy (string): dictionary-full policy of the codec
+    """
+    _shared["codec"] = LZWCodec(dictionary, policy)
+    for key, (name, dtype, count) in blocks.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _shared[key] = (shm, np.ndarray((count,), dtype=dtype, buffer=shm.buf))
+
+
+def _create_shared(blocks, arrays):
+    """
+    Creates a shared memory block for each given array (or size) and copies the arrays into them.
+
+    Parameters:
+        blocks (list): list where the created SharedMemory objects are appended (to be released later)
+        arrays (dict): name of the array -> array to copy, or (dtype, number of elements) to only allocate
+
+    Returns:
+        dict: name of the array -> view of the shared memory
+        dict: description to be given to _attach_shared()
+    """
+    views = {}
+    description = {}
+    for key, value in arrays.items():
+        if (isinstance(value, tuple)):
+            dtype, count = value
+        else:
+            dtype, count = value.dtype, value.size
+        dtype = np.dtype(dtype)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, dtype.itemsize * count))
+        blocks.append(shm)
+        views[key] = np.ndarray((count,), dtype=dtype, buffer=shm.buf)
+        if (not isinstance(value, tuple)):
+            views[key][:] = value.ravel()
+        description[key] = (shm.name, dtype.str, count)
+    return views, description
+
+
+def _release_shared(blocks):
+    """
+    Closes and removes the shared memory blocks created by _create_shared().
+    """
+    for shm in blocks:
+        try:
+            shm.close()
+        except BufferError:
+            # a view is still alive (an exception was raised while using it), the block is freed when it goes away
+            pass
+        shm.unlink()
+
+
+def _encode_shared_chunk(index, strPoint, endPoint, outPoint):
+    """
+    Encodes data[strPoint:endPoint] and writes the codes at out[outPoint:], their count goes to counts[index].
+    """
+    data = _shared["data"][1]
+    out = _shared["out"][1]
+    counts = _shared["counts"][1]
+
+    comp = _shared["codec"].encode_LZW(data[strPoint:endPoint])
+    out[outPoint:outPoint + len(comp)] = comp
+    counts[index] = len(comp)
+
+
+def _decoded_length_shared(strPoint, endPoint, size):
+    """
+    Computes how many symbols the codes in codes[strPoint:endPoint] decode to, without decoding them.
+    """
+    return _shared["codec"].decoded_length(_shared["codes"][1][strPoint:endPoint], size)
+
+
+def _decode_shared_chunk(strPoint, endPoint, outPoint, size, outBlock):
+    """
+    Decodes codes[strPoint:endPoint] and writes the symbols at out[outPoint:].
+
+    The output block is only created once the decoded lengths are known, so it is attached here (once per worker).
+    """
+    if ("out" not in _shared or _shared["out"][0].name != outBlock[0]):
+        shm = shared_memory.SharedMemory(name=outBlock[0])
+        _shared["out"] = (shm, np.ndarray((outBlock[2],), dtype=outBlock[1], buffer=shm.buf))
+    codes = _shared["codes"][1]
+    out = _shared["out"][1]
+
+    decoded = _shared["codec"].decode_LZW(codes[strPoint:endPoint], size)
+    out[outPoint:outPoint + len(decoded)] = decoded.astype(np.uint8)
+
+
+# Dictionary-full policies. "freeze" stops adding entries until the chunk ends (default), "lru" and "lfu" replace the least recently
+# or least frequently used entry, "reset" emits the reset code when the ratio gets worse than it was when the dictionary filled.
+POLICIES = ("freeze", "lru", "lfu", "reset")
+
+# "reset" policy: the ratio (symbols per code) is measured every RESET_WINDOW codes, the dictionary is reset when it falls
+# below RESET_DEGRADATION times the ratio of the first window after the dictionary filled
+RESET_WINDOW = 1024
+RESET_DEGRADATION = 0.9
+
+# maxMemory option (bytes, measured with tracemalloc): each symbol of a chunk being encoded or decoded, each dictionary entry, and
+# each pixel of the arrays kept for the whole image. Chunks are never made smaller than MIN_CHUNK_SIZE.
+SYMBOL_BYTES = 48
+ENTRY_BYTES = 200
+PIXEL_BYTES = 8
+MIN_CHUNK_SIZE = 4096
+
+
+class _DictionaryPolicy:
+    """
+    Gives the code of each new dictionary entry, following the dictionary-full policy.
+
+    Encoder and decoder keep one each and call used() and add() in the same order, so both choose the same codes. Only entries
+    without children are replaced, so an entry is never the prefix of an entry which was added after it was replaced.
+    """
+
+    def __init__(self, policy, first, limit):
+        """
+        Constructor.
+
+        Parameters:
+            policy (string): one of POLICIES
+            first (int): first code which can be given (512 + primed entries), codes below are never replaced
+            limit (int): codes must be lower than this (the reset code)
+        """
+        self.evicts = policy in ("lru", "lfu")
+        self.lfu = policy == "lfu"
+        self.first = first
+        self.limit = limit
+        self.next_code = first
+        self.clock = 0
+        self.keys = {}
+        self.uses = {}
+        self.parents = {}
+        self.children = {}
+        self.heap = []
+
+
+    def _push(self, code):
+        key = (self.uses[code], self.keys[code]) if self.lfu else self.keys[code]
+        heapq.heappush(self.heap, (key, code))
+
+
+    def used(self, code):
+        """
+        Records that a code was emitted (encoder) or received (decoder).
+        """
+        if (self.evicts and code >= self.first):
+            self.clock += 1
+            self.keys[code] = self.clock
+            self.uses[code] += 1
+            if (self.children[code] == 0):
+                self._push(code)
+
+
+    def add(self, parent):
+        """
+        Gives the code of a new entry made of the entry "parent" plus one symbol.
+
+        Returns:
+            int: code of the new entry, None if the dictionary is full and the policy does not replace entries
+        """
+        if (self.next_code < self.limit):
+            code = self.next_code
+            self.next_code += 1
+        elif (not self.evicts):
+            return None
+        else:
+            code = None
+
+        if (self.evicts):
+            # the parent gets a child first, so it is not the one replaced
+            if (parent >= self.first):
+                self.children[parent] += 1
+            if (code is None):
+                code = self._victim()
+                if (code is None):
+                    if (parent >= self.first):
+                        self.children[parent] -= 1
+                    return None
+            self.clock += 1
+            self.keys[code] = self.clock
+            self.uses[code] = 0
+            self.parents[code] = parent
+            self.children[code] = 0
+            self._push(code)
+        return code
+
+
+    def _victim(self):
+        """
+        Removes and returns the entry to be replaced: the least recently (or frequently) used entry without children.
+        None if there is no such entry.
+        """
+        while True:
+            if (len(self.heap) == 0):
+                return None
+            key, code = heapq.heappop(self.heap)
+            current = (self.uses.get(code), self.keys.get(code)) if self.lfu else self.keys.get(code)
+            if (current == key and self.children[code] == 0):
+                break
+
+        parent = self.parents.pop(code)
+        if (parent >= self.first):
+            self.children[parent] -= 1
+            if (self.children[parent] == 0):
+                self._push(parent)
+        return code
+
 
 class LZWCodec:
     """
@@ -32,17 +264,64 @@ class LZWCodec:
     Use only encode() and decode()
     """ 
 
-    def __init__(self):
+    def __init__(self, dictionary=None, policy="freeze", maxMemory=None):
         """
         Codec constructor.
+
+        Parameters:
+            dictionary (PrimedDictionary): entries added after the 512 single symbols when each chunk starts (see lzwdict).
+                Its ID is stored in the data, and the decoder loads it if it has none. Default: None
+            policy (string): what to do when the dictionary is full, one of POLICIES. Stored in the data, the decoder uses the one
+                of the data. Default: "freeze", no more entries until the chunk ends
+            maxMemory (int or string): memory budget in bytes (or "512M", "2G"...). Chunk sizes and the number of workers are
+                reduced to fit in it (see plan()). Default: None, no budget
+        """
+        assert policy in POLICIES, "unknown policy " + repr(policy)
+        self.dictionary = dictionary
+        self.policy = policy
+        self.primer = dictionary.entries if dictionary is not None else []
+        self.maxMemory = parse_memory(maxMemory)
+
+
+    def plan(self, pixels, chunkSize, workers):
         """
-        pass
+        Chooses the chunk size and the number of workers so that encoding (or decoding) fits in maxMemory.
+
+        Every chunk being coded holds its symbols and a dictionary of up to 2^16 entries. Workers are dropped first, and when
+        not even one worker fits the chunks are coded one by one in this process, halving their size until they fit.
+        A smaller chunk size gives other codes (and usually a bigger output), but chunks end with the reset code and their size
+        is not needed to decode, so the data decodes the same with any budget.
+
+        Parameters:
+            pixels (int): number of pixels of the image
+            chunkSize (int): chunk size asked for
+            workers (int): number of workers asked for (None for this process)
+
+        Returns:
+            int: chunk size
+            int: number of workers, None to code in this process
+        """
+        if (self.maxMemory is None):
+            return chunkSize, workers
+
+        fixed = pixels * PIXEL_BYTES
+        chunk_bytes = lambda size: size * SYMBOL_BYTES + min(size, pow(2, 16) - 512) * ENTRY_BYTES
+
+        workers = plan_workers(self.maxMemory, fixed, chunk_bytes(chunkSize), workers)
+        if (workers > 1):
+            return chunkSize, workers
+
+        while (chunkSize > MIN_CHUNK_SIZE and fixed + chunk_bytes(chunkSize) > self.maxMemory):
+            chunkSize = max(MIN_CHUNK_SIZE, chunkSize // 2)
+        return chunkSize, None
 
 
     def encode_LZW(self,data):
         """
         Encodes a given data using LZW.
 
+        The dictionary maps (code of the prefix, symbol) to the code of each entry, single symbols are their own code.
+
         Parameters:
             data (array): the data to be encoded
 
@@ -53,39 +332,281 @@ class LZWCodec:
         #initialize dictionary and defines max size
         size = 16
         max_dic_size = pow(2,int(size))
-        dictionary_size = 512                   
-        dictionary = {str(i): i for i in range(dictionary_size)}
-        string = ""
-        compressed_data = np.arange(0,dtype=np.uint16)
+        dictionary_size, dictionary = self._initial_dictionary()
+        entries = {}
+        policy = _DictionaryPolicy(self.policy, dictionary_size, max_dic_size-1)
+        string = -1
+        compressed_data = []
+
+        #"reset" policy: symbols and codes since the last measure, and ratio of the first measure after the dictionary filled
+        symbols = 0
+        codes = 0
+        baseline = None
         
         #encodes data
-        for symbol in data:
-            if (len(string)==0):
-                string_plus_symbol = str(symbol)
-            else:             
-                string_plus_symbol = string + "#" + str(symbol)
-    
-            if string_plus_symbol in dictionary:
-                string = string_plus_symbol
-            else:
-                compressed_data = np.append(compressed_data, [*dictionary].index(string))
-
-                #while having space add new combination to dictionary
-                if (len(dictionary) < max_dic_size-1):
-                    dictionary[string_plus_symbol] = dictionary_size
-                    dictionary_size += 1
-                string = str(symbol)
+        for symbol in data.tolist() if isinstance(data, np.ndarray) else data:
+            symbol = int(symbol)
+            symbols += 1
+            if (string < 0):
+                string = symbol
+                continue
+
+            code = dictionary.get((string, symbol))
+            if code is not None:
+                string = code
+                continue
+
+            compressed_data.append(string)
+            policy.used(string)
+
+            #while having space (or by the policy) add new combination to dictionary
+            code = policy.add(string)
+            if code is not None:
+                if code in entries:
+                    del dictionary[entries[code]]
+                dictionary[(string, symbol)] = code
+                entries[code] = (string, symbol)
+                if (self.policy == "reset" and policy.next_code == policy.limit):
+                    #the dictionary is full, start measuring (this symbol is the first of the next code)
+                    symbols = 1
+
+            elif (self.policy == "reset"):
+                codes += 1
+                if (codes == RESET_WINDOW):
+                    ratio = (symbols - 1) / codes
+                    symbols = 1
+                    codes = 0
+                    if (baseline is None):
+                        baseline = ratio
+                    elif (ratio < RESET_DEGRADATION * baseline):
+                        #append number that represents resetting the dictionary and start again
+                        compressed_data.append(max_dic_size-1)
+                        dictionary_size, dictionary = self._initial_dictionary()
+                        entries = {}
+                        policy = _DictionaryPolicy(self.policy, dictionary_size, max_dic_size-1)
+                        baseline = None
+
+            string = symbol
      
-        if string in dictionary:
-            compressed_data = np.append(compressed_data, [*dictionary].index(string))
+        if string >= 0:
+            compressed_data.append(string)
         
         #append number that represents resetting the dictionary
-        compressed_data = np.append(compressed_data, max_dic_size-1)
+        compressed_data.append(max_dic_size-1)
+
+        return np.array(compressed_data, dtype=np.uint16)
+
+
+    def _initial_dictionary(self):
+        """
+        Returns:
+            int: size of the initial dictionary (512 single symbols + primed entries)
+            dict: (code of the prefix, symbol) -> code, for the primed entries
+        """
+        dictionary_size = 512
+        dictionary = {}
+        prefixes = {}
+        for entry in self.primer:
+            prefix = prefixes[entry[:-1]] if len(entry) > 2 else entry[0]
+            dictionary[(prefix, entry[-1])] = dictionary_size
+            prefixes[entry] = dictionary_size
+            dictionary_size += 1
+        return dictionary_size, dictionary
+
+
+    def encode_shared(self, data1D, chunkSize, workers):
+        """
+        Encodes the chunks of data1D in several worker processes.
+
+        The data and the output are kept in shared memory: each worker only gets the offsets of its chunk and writes the codes
+        directly into its own region of the output (a chunk never has more than chunkSize+1 codes), so neither the data nor
+        the codes are pickled.
+
+        Parameters:
+            data1D (array): data to be encoded (residuals + 255)
+            chunkSize (int): size of the chunks to encode
+            workers (int): number of worker processes
+
+        Returns:
+            array: LZW codes of every chunk (uint16)
+        """
+
+        nChunks = -(-len(data1D) // chunkSize)
+        blocks = []
+        try:
+            views, description = _create_shared(blocks, {
+                "data": data1D.astype(np.uint16),
+                "out": (np.uint16, nChunks * (chunkSize + 1)),
+                "counts": (np.int64, nChunks),
+            })
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared, initargs=(description, self.dictionary, self.policy)) as pool:
+                jobs = [pool.submit(_encode_shared_chunk, i, i * chunkSize, min((i + 1) * chunkSize, len(data1D)), i * (chunkSize + 1))
+                        for i in range(nChunks)]
+                for job in jobs:
+                    job.result()
+
+            out, counts = views["out"], views["counts"]
+            result = np.concatenate([out[i * (chunkSize + 1):i * (chunkSize + 1) + counts[i]] for i in range(nChunks)])
+            del out, counts, views
+            return result
+        finally:
+            _release_shared(blocks)
+
+
+    def stream_options(self):
+        """
+        Returns:
+            dict: options the decoder needs to know, written in the header of the encoded data (empty for the defaults)
+        """
+        options = {}
+        if (self.dictionary is not None):
+            options["dictionary"] = self.dictionary.id
+        if (self.policy != "freeze"):
+            options["policy"] = self.policy
+        return options
+
+
+    def stream_header(self, shape):
+        """
+        Parameters:
+            shape (tuple): shape of the image
+
+        Returns:
+            array: header of the encoded data (uint16): options (see stream_options()), if any, and the shape of the image
+        """
+        header = [np.array([shape[0], shape[1]], dtype = np.uint16)]
+        options = self.stream_options()
+        if (options):
+            raw = json.dumps(options).encode()
+            raw += b" " * (len(raw) % 2)
+            header.insert(0, np.frombuffer(raw, dtype="<u2").astype(np.uint16))
+            header.insert(0, np.array([0, len(raw) // 2], dtype = np.uint16))
+        return np.concatenate(header)
+
+
+    def read_stream_header(self, comp_data):
+        """
+        Reads the options written by stream_header() and finds the codec which has to decode the data: this one, or another
+        one with the dictionary (loaded with PrimedDictionary.load() if this codec has none) and the policy the data was encoded
+        with. The policy of this codec does not matter, the one of the data is used.
+
+        Parameters:
+            comp_data (array): encoded data
+
+        Returns:
+            LZWCodec: codec to decode the data with
+            array: encoded data without the options (shape of the image followed by the codes)
+        """
+        options = {}
+        if (len(comp_data) > 1 and comp_data[0] == 0):
+            words = int(comp_data[1])
+            options = json.loads(comp_data[2:2 + words].astype("<u2").tobytes().decode())
+            comp_data = comp_data[2 + words:]
+
+        id = options.get("dictionary")
+        policy = options.get("policy", "freeze")
+        current = self.dictionary.id if self.dictionary is not None else None
+        if (policy not in POLICIES):
+            raise ValueError("data was encoded with unknown policy " + repr(policy))
+        if (id == current and policy == self.policy):
+            return self, comp_data
+
+        dictionary = self.dictionary
+        if (id is None and current is not None):
+            raise ValueError("data was encoded without a primed dictionary, but the codec has dictionary " + current)
+        if (id is not None and current is not None and id != current):
+            raise ValueError("data was encoded with primed dictionary " + id + ", but the codec has dictionary " + current)
+        if (id is not None and current is None):
+            try:
+                dictionary = PrimedDictionary.load(id)
+            except FileNotFoundError:
+                raise ValueError("data was encoded with primed dictionary " + id + ", which is not stored in \"dictionaries\" "
+                                 "(give it with LZWCodec(dictionary=PrimedDictionary.load(id, directory)))") from None
+
+        return LZWCodec(dictionary, policy, self.maxMemory), comp_data
+
+
+    def encode_residuals(self, data, chunkSize=50000, workers=None):
+        """
+        Encodes an already transformed (predictive) 2D array with LZW, chunk by chunk.
+
+        With maxMemory, chunkSize and workers may be reduced (see plan()).
+
+        Parameters:
+            data (2D array): residuals given by PredictiveTransform
+            chunkSize (int): size of the chunks to encode. Default: 50000
+            workers (int): if given, the chunks are encoded by this many processes sharing memory (see encode_shared()). Default: None
+
+        Returns:
+            array: header (see stream_header()) followed by the LZW codes of every chunk (uint16)
+        """
+
+        check_residuals(data, "LZWCodec")
+        chunkSize, workers = self.plan(data.size, chunkSize, workers)
+        data = data + 255
+
+        if (workers):
+            return np.append(self.stream_header(data.shape), self.encode_shared(data.flatten(), chunkSize, workers))
+
+        #splits the data in chunks to encode
+        strPoint = 0
+        endPoint = chunkSize
+        data1D = data.flatten()
+        #stores the options and the shape of the image
+        compressed_data = [self.stream_header(data.shape)]
+
+        while (strPoint < len(data1D)):
+            #encodes the chunk with LZW
+            compressed_data.append(self.encode_LZW(data1D[strPoint:endPoint]))
+
+            strPoint = endPoint
+            endPoint += chunkSize
+            if(endPoint>len(data1D)):
+                endPoint = len(data1D)
 
-        return compressed_data
+        return np.concatenate(compressed_data)
 
 
-    def encode(self, filein, fileout, chunkSize=50000, vertical=False):
+    def compress_residuals(self, data, chunkSize=50000, workers=None):
+        """
+        Encodes already transformed (predictive) residuals in memory.
+
+        Parameters:
+            data (2D array): residuals given by PredictiveTransform
+            chunkSize (int): size of the chunks to encode. Default: 50000
+            workers (int): number of worker processes sharing memory. Default: None, encodes in this process.
+
+        Returns:
+            bytes: the same content as the .npy file written by encode(), without the numpy header
+        """
+
+        return self.encode_residuals(data, chunkSize, workers).astype("<u2").tobytes()
+
+
+    def compress(self, data, chunkSize=50000, vertical=False, workers=None):
+        """
+        Transforms using PredictiveTransform and encodes a given image in memory.
+
+        Parameters:
+            data (2D array): image to be encoded (uint8)
+            chunkSize (int): size of the chunks to encode. Default: 50000
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+            workers (int): number of worker processes sharing memory. Default: None, encodes in this process.
+
+        Returns:
+            bytes: see compress_residuals()
+        """
+
+        data = check_image(data, "LZWCodec")
+
+        pt = PredictiveTransform()
+        data = pt.encode(data, vertical)
+
+        return self.compress_residuals(data, chunkSize, workers)
+
+
+    def encode(self, filein, fileout, chunkSize=50000, vertical=False, workers=None):
         """
         Transforms using PredictiveTransform and encodes a given file and outputs it in another file.
 
@@ -97,6 +618,7 @@ class LZWCodec:
             fileout (string): file to be created as output (.npy format)
             chunckSize (int): size of the chunks to encode. Default: 50000
             vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+            workers (int): number of worker processes sharing memory. Default: None, encodes in this process.
         """
 
         # read data from file
@@ -104,24 +626,8 @@ class LZWCodec:
     
         pt = PredictiveTransform()
         data = pt.encode(data, vertical)
-        data[:] += 255
-        
-        #splits the data in chunks to encode
-        strPoint = 0
-        endPoint = chunkSize
-        data1D = data.flatten()
-        #stores the shape of the image
-        compressed_data = np.array([data.shape[0], data.shape[1]], dtype = np.uint16)
 
-        while (strPoint < len(data1D)):
-            #encodes the chunk with LZW
-            comp = np.array(self.encode_LZW(data1D[strPoint:endPoint]), dtype = np.uint16)
-            compressed_data = np.append(compressed_data, comp)
-
-            strPoint = endPoint
-            endPoint += chunkSize
-            if(endPoint>len(data1D)):
-                endPoint = len(data1D)
+        compressed_data = self.encode_residuals(data, chunkSize, workers)
 
         #save encoding in file
         np.save(fileout, compressed_data)
@@ -141,64 +647,167 @@ class LZWCodec:
         
         #initialize dictionary and defines max size
         max_dic_size = pow(2,int(size))
-        decoded_data = np.array([], dtype=np.int16)
-        decoded_array = np.array([], dtype=np.int16)
-        next_code = 512
-        dictionary_size = 512
-        dictionary = [[] for x in range(max_dic_size)]
-        for i in range(dictionary_size):
-            dictionary[i] = np.array([i])
+        decoded_data = []
+        dictionary_size = 512 + len(self.primer)
+        initial = [np.array([i]) for i in range(512)] + [np.array(entry) for entry in self.primer]
+        dictionary = initial + [None] * (max_dic_size - dictionary_size)
+        policy = _DictionaryPolicy(self.policy, dictionary_size, max_dic_size-1)
+        last = -1
+
+        for code in data.tolist() if isinstance(data, np.ndarray) else data:
+            #reset the dictionary
+            if (code == max_dic_size-1):
+                dictionary = initial + [None] * (max_dic_size - dictionary_size)
+                policy = _DictionaryPolicy(self.policy, dictionary_size, max_dic_size-1)
+                last = -1
+                continue
+
+            #the entry the encoder added after the last code is only known now (it ends with the first symbol of this one)
+            if (last >= 0):
+                nums = dictionary[last]
+                new_code = policy.add(last)
+                if (code == new_code):
+                    dictionary[code] = np.append(nums, nums[0])
+                elif (new_code is not None):
+                    dictionary[new_code] = np.append(nums, dictionary[code][0])
+
+            #decoded data
+            decoded_data.append(dictionary[code])
+            policy.used(code)
+            last = code
+
+        if (len(decoded_data) == 0):
+            return np.array([], dtype=np.int16)
+        return np.concatenate(decoded_data)
+
+
+    def decoded_length(self, data, size):
+        """
+        Computes how many symbols a given LZW data decodes to, following only the length of each dictionary entry.
 
-        nums =  np.array([], dtype=np.int16)
+        Parameters:
+            data (array): the data to be decoded
+            size (int): 2^size is the max size of the dictionary
 
+        Returns:
+            int: number of decoded symbols
+        """
 
-        for code in data:
-            #to increase efficiency the array is reseted when the length is bigger than 100000
-            if (len(decoded_array)>100000):
-                decoded_data = np.append(decoded_data, decoded_array)
-                decoded_array = np.array([], dtype=np.uint16)
-            
-            #reset the dictionary and clean decoded_array
+        max_dic_size = pow(2,int(size))
+        dictionary_size = 512 + len(self.primer)
+        initial = [1] * 512 + [len(entry) for entry in self.primer]
+        lengths = initial + [0] * (max_dic_size - dictionary_size)
+        policy = _DictionaryPolicy(self.policy, dictionary_size, max_dic_size-1)
+        last = -1
+        total = 0
+
+        for code in data.tolist() if isinstance(data, np.ndarray) else data:
             if (code == max_dic_size-1):
-                dictionary = [[] for x in range(max_dic_size)]
-                next_code = 512
-                nums =  np.array([], dtype=np.uint16)
-                for i in range(dictionary_size):
-                    dictionary[i] = np.array([i])
-                
-                decoded_data = np.append(decoded_data, decoded_array)
-                decoded_array = np.array([], dtype=np.uint16)
-            else:
-                #decoded data
-                if (np.array_equal(dictionary[code],[])):
-                    dictionary[code] = np.array(np.append(nums, [nums[0]]))
-        
-                decoded_array = np.append(decoded_array, dictionary[code])
-                if (next_code < max_dic_size -1 and len(nums) > 0):
-                    dictionary[next_code] = np.array(np.append(nums, [dictionary[code][0]]))
-                    next_code += 1
-                nums = dictionary[code]
-        
-        #join the rest of the decoded data
-        decoded_data = np.append(decoded_data, decoded_array)
+                lengths = initial + [0] * (max_dic_size - dictionary_size)
+                policy = _DictionaryPolicy(self.policy, dictionary_size, max_dic_size-1)
+                last = -1
+                continue
+
+            if (last >= 0):
+                new_code = policy.add(last)
+                if (new_code is not None):
+                    lengths[new_code] = lengths[last] + 1
+            total += lengths[code]
+            policy.used(code)
+            last = code
+
+        return total
+
+
+    def decode_shared(self, comp_data, size, workers):
+        """
+        Decodes the chunks of comp_data in several worker processes.
+
+        The codes and the output are kept in shared memory. Chunks are found by their reset code; the workers first compute
+        the decoded length of each chunk (cheap, no arrays are built) so each chunk knows where its output starts, and then
+        decode it directly into that region.
+
+        Parameters:
+            comp_data (array): LZW codes of every chunk
+            size (int): 2^size is the max size of the dictionary
+            workers (int): number of worker processes
+
+        Returns:
+            array: decoded data (uint8, wrapped)
+        """
+
+        ends = np.flatnonzero(comp_data == pow(2,int(size))-1) + 1
+        if (len(ends) == 0 or ends[-1] != len(comp_data)):
+            ends = np.append(ends, len(comp_data))
+        starts = np.append([0], ends[:-1])
+
+        blocks = []
+        try:
+            views, description = _create_shared(blocks, {"codes": np.asarray(comp_data, dtype=np.uint16)})
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared, initargs=(description, self.dictionary, self.policy)) as pool:
+                lengths = list(pool.map(_decoded_length_shared, starts, ends, [size] * len(starts)))
+                outPoints = np.append([0], np.cumsum(lengths)[:-1])
+
+                out, outBlock = _create_shared(blocks, {"out": (np.uint8, int(sum(lengths)))})
+                jobs = [pool.submit(_decode_shared_chunk, int(a), int(b), int(o), size, outBlock["out"])
+                        for a, b, o in zip(starts, ends, outPoints)]
+                for job in jobs:
+                    job.result()
+
+            result = np.array(out["out"])
+            del out, views
+            return result
+        finally:
+            _release_shared(blocks)
+
+
+    def decode_chunks(self, comp_data, size, length):
+        """
+        Decodes comp_data one chunk (up to each reset code) at a time, straight into the output array, so only the dictionary of
+        the chunk being decoded is alive.
+
+        Parameters:
+            comp_data (array): LZW codes of every chunk
+            size (int): 2^size is the max size of the dictionary
+            length (int): number of decoded symbols (pixels of the image)
+
+        Returns:
+            array: decoded data (uint8, wrapped)
+        """
+
+        ends = np.flatnonzero(comp_data == pow(2,int(size))-1) + 1
+        if (len(ends) == 0 or ends[-1] != len(comp_data)):
+            ends = np.append(ends, len(comp_data))
+
+        decoded_data = np.empty(length, dtype=np.uint8)
+        strPoint = 0
+        outPoint = 0
+        for endPoint in ends:
+            decoded = self.decode_LZW(comp_data[strPoint:endPoint], size)
+            decoded_data[outPoint:outPoint + len(decoded)] = decoded
+            outPoint += len(decoded)
+            strPoint = endPoint
 
         return decoded_data
-    
 
-    def decode(self, filein, fileout, vertical=False):
+
+    def decode_residuals(self, comp_data, workers=None):
         """
-        Decodes a given file and outputs the decoded data into a .bmp (bitmap) file.
+        Decodes the output of encode_residuals() back to the residuals of the image.
 
-        Vertical option must be the same as used when encoding.
+        The dictionary is checked against the one the data was encoded with, see read_stream_header().
 
         Parameters:
-            filein (string): file to be decoded (in .npy format)
-            fileout (string): file to be created and outputted (preferably .bmp format)
-            vertical (boolean): if True, calls predictive in Vertical mode. Default: False. 
+            comp_data (array): header followed by the LZW codes
+            workers (int): if given, the chunks are decoded by this many processes sharing memory (see decode_shared()). With maxMemory,
+                it may be reduced (see plan()). Default: None
+
+        Returns:
+            2D array: residuals (uint8, wrapped) to be given to PredictiveTransform
         """
 
-        #load data
-        comp_data =  np.load(filein)
+        codec, comp_data = self.read_stream_header(comp_data)
 
         #get shape of the image
         heigth = comp_data[0]
@@ -208,17 +817,77 @@ class LZWCodec:
         #get the size of the dictionary
         size = round(math.log(max(comp_data),2))
 
-        #decode using LZW
-        decoded_data = self.decode_LZW(comp_data, size)
-        decoded_data = decoded_data.astype(np.uint8)
+        #decode using LZW, workers are planned for chunks of the average size
+        pixels = int(heigth) * int(length)
+        chunks = max(1, int(np.count_nonzero(comp_data == pow(2,int(size))-1)))
+        _, workers = codec.plan(pixels, -(-pixels // chunks), workers)
+        if (workers):
+            decoded_data = codec.decode_shared(comp_data, size, workers)
+        else:
+            decoded_data = codec.decode_chunks(comp_data, size, pixels)
 
         #shift of 8 bits and reshape to the format of the image
         decoded_data[:] -= 255
-        image_data = np.reshape(decoded_data, (heigth, length)) 
+        return np.reshape(decoded_data, (heigth, length))
+
+
+    def decompress_residuals(self, payload, workers=None):
+        """
+        Decodes the output of compress_residuals() back to the residuals.
+
+        Parameters:
+            payload (bytes): data given by compress_residuals()
+            workers (int): number of worker processes sharing memory. Default: None, decodes in this process.
+
+        Returns:
+            2D array: residuals (uint8, wrapped) to be given to PredictiveTransform
+        """
+
+        comp_data = np.frombuffer(payload, dtype="<u2").astype(np.uint16)
+        return self.decode_residuals(comp_data, workers)
+
+
+    def decompress(self, payload, vertical=False, workers=None):
+        """
+        Decodes the output of compress() back to the image, in memory.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            payload (bytes): data given by compress()
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+            workers (int): number of worker processes sharing memory. Default: None, decodes in this process.
+
+        Returns:
+            2D array: decoded image (uint8)
+        """
+
+        image_data = self.decompress_residuals(payload, workers)
+
+        pt = PredictiveTransform()
+        return pt.decode(image_data, vertical)
+
+
+    def decode(self, filein, fileout, vertical=False, workers=None):
+        """
+        Decodes a given file and outputs the decoded data into a .bmp (bitmap) file.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            filein (string): file to be decoded (in .npy format)
+            fileout (string): file to be created and outputted (preferably .bmp format)
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False. 
+            workers (int): number of worker processes sharing memory. Default: None, decodes in this process.
+        """
+
+        #load data
+        comp_data =  np.load(filein)
+
+        image_data = self.decode_residuals(comp_data, workers)
 
         pt = PredictiveTransform()
         image_data = pt.decode(image_data, vertical)
 
         #save image
         imageio.imwrite(fileout, image_data)
-        
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+
+module:: PrimedDictionary
+    :synopsis: Primed (pre-trained) dictionaries for LZWCodec. They are built from a corpus of residuals of similar images and every
+    chunk starts with them, both when encoding and decoding, so small chunks do not need to relearn the common patterns.
+
+Several libs are imported here:
+    numpy
+    json
+    hashlib
+    collections
+
+
+Dictionaries are stored as JSON files named by their ID ("<id>.json"), which is a hash of their entries.
+
+"""
+
+import collections
+import hashlib
+import json
+import numpy as np
+from pathlib import Path
+
+
+class PrimedDictionary:
+    """
+    List of LZW entries (sequences of 2 or more symbols) to be added after the 512 single symbol entries.
+
+    Every prefix of an entry is also an entry and comes before it, so the encoder can reach all of them.
+
+    Use from_corpus() to build one, save() and load() to store it by ID, and give it to LZWCodec(dictionary=...).
+    """
+
+    def __init__(self, entries):
+        """
+        Constructor.
+
+        Parameters:
+            entries (list of tuples): entries, in the order their codes are given (512, 513, ...)
+        """
+        self.entries = [tuple(int(s) for s in entry) for entry in entries]
+        self.id = hashlib.sha1(json.dumps(self.entries).encode()).hexdigest()[:12]
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    @classmethod
+    def from_corpus(cls, corpus, maxEntries=4096, chunkSize=50000):
+        """
+        Builds a dictionary from residuals of a training corpus.
+
+        Each residual stream is parsed with LZW (resetting every chunkSize symbols, as LZWCodec does) and the entries which would
+        save more symbols (times used * (length - 1)) are kept, together with their prefixes.
+
+        Parameters:
+            corpus (list of arrays): residuals given by PredictiveTransform (any shape, they are flattened)
+            maxEntries (int): max number of entries. Default: 4096
+            chunkSize (int): size of the chunks used when parsing. Default: 50000
+
+        Returns:
+            PrimedDictionary: the dictionary
+        """
+        counts = collections.Counter()
+
+        for residuals in corpus:
+            data = (np.asarray(residuals).flatten().astype(np.int32) + 255).tolist()
+            for strPoint in range(0, len(data), chunkSize):
+                known = set()
+                string = ()
+                for symbol in data[strPoint:strPoint + chunkSize]:
+                    string_plus_symbol = string + (symbol,)
+                    if (len(string_plus_symbol) == 1 or string_plus_symbol in known):
+                        string = string_plus_symbol
+                    else:
+                        if (len(string) > 1):
+                            counts[string] += 1
+                        known.add(string_plus_symbol)
+                        string = (symbol,)
+                if (len(string) > 1):
+                    counts[string] += 1
+
+        # keep the best entries (and their prefixes) while they fit
+        chosen = set()
+        for entry, _ in sorted(counts.items(), key=lambda item: (-item[1] * (len(item[0]) - 1), item[0])):
+            missing = [entry[:n] for n in range(2, len(entry) + 1) if entry[:n] not in chosen]
+            if (len(chosen) + len(missing) > maxEntries):
+                continue
+            chosen.update(missing)
+            if (len(chosen) == maxEntries):
+                break
+
+        return cls(sorted(chosen, key=lambda entry: (len(entry), entry)))
+
+
+    def save(self, directory="dictionaries"):
+        """
+        Stores the dictionary as "<id>.json" in the given directory.
+
+        Parameters:
+            directory (string): directory of the stored dictionaries. Default: "dictionaries"
+
+        Returns:
+            string: ID of the dictionary
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / (self.id + ".json"), "w") as fp:
+            json.dump({"id": self.id, "entries": self.entries}, fp)
+        return self.id
+
+
+    @classmethod
+    def load(cls, id, directory="dictionaries"):
+        """
+        Loads a dictionary stored by save().
+
+        Parameters:
+            id (string): ID of the dictionary
+            directory (string): directory of the stored dictionaries. Default: "dictionaries"
+
+        Returns:
+            PrimedDictionary: the dictionary
+        """
+        with open(Path(directory) / (id + ".json")) as fp:
+            js = json.load(fp)
+        dictionary = cls(js["entries"])
+        assert dictionary.id == id, "dictionary file does not match its ID"
+        return dictionary
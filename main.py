@@ -86,7 +86,7 @@ if __name__ == '__main__':
     print("Encoder time elapsed: ", time.time() - t1)
 
     t1 = time.time()
-    codecLZW.decode("data/egg.pattern.npy", "data/pattern-LZW-DECODED.bmp")
+    codecLZW.decode("data/pattern.lzw.npy", "data/pattern-LZW-DECODED.bmp")
     print("Decoder time elapsed: ", time.time() - t1)
 
     """
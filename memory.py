@@ -0,0 +1,77 @@
+"""
+
+module:: memory
+    :synopsis: Helpers used by the codecs to fit their work in a memory budget (maxMemory): reading the budget and choosing how many
+    rows, symbols or worker processes fit in it.
+
+Only numbers are computed here. Each codec knows how many bytes its paths use per pixel (measured with tracemalloc) and passes them.
+
+"""
+
+# memory of each new worker process before it gets any work (interpreter, numpy and the codecs)
+WORKER_OVERHEAD = 48 * 2**20
+
+UNITS = {"": 1, "k": 2**10, "m": 2**20, "g": 2**30, "t": 2**40}
+
+
+def parse_memory(value):
+    """
+    Reads a memory budget.
+
+    Parameters:
+        value (int or string): bytes, or a number followed by a unit ("512M", "2GB", "64k"). None means no budget
+
+    Returns:
+        int: bytes, or None
+    """
+    if (value is None or isinstance(value, int)):
+        return value
+
+    text = str(value).strip().lower()
+    if (text.endswith("b")):
+        text = text[:-1]
+    unit = text[-1:] if text[-1:] in UNITS else ""
+    number = text[:len(text) - len(unit)]
+    assert number.replace(".", "", 1).isdigit(), "invalid memory size " + repr(value)
+
+    return int(float(number) * UNITS[unit])
+
+
+def fit(budget, fixed, perItem, minimum=1, maximum=None):
+    """
+    How many items fit in a budget.
+
+    Parameters:
+        budget (int): bytes
+        fixed (int): bytes used whatever the number of items
+        perItem (int): bytes used by each item
+        minimum (int): never less than this (the work has to be done even if it does not fit). Default: 1
+        maximum (int): never more than this. Default: None
+
+    Returns:
+        int: number of items
+    """
+    items = max(minimum, (budget - fixed) // max(1, perItem))
+    if (maximum is not None):
+        items = min(items, maximum)
+    return int(items)
+
+
+def plan_workers(budget, fixed, perWorker, workers):
+    """
+    How many worker processes fit in a budget, each one paying WORKER_OVERHEAD.
+
+    Parameters:
+        budget (int): bytes, None for no budget
+        fixed (int): bytes used by the main process
+        perWorker (int): bytes used by the work of each worker
+        workers (int): number of workers asked for
+
+    Returns:
+        int: number of workers, between 1 and workers (1 means the work is done in the main process)
+    """
+    if (not workers or workers <= 1):
+        return 1
+    if (budget is None):
+        return workers
+    return fit(budget, fixed, WORKER_OVERHEAD + perWorker, 1, workers)
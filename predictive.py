@@ -15,6 +15,37 @@ This transformer codec was made by Edgar Duarte.
 import numpy as np
 
 
+def check_image(data, codec):
+    """
+    Checks that an image can be encoded by an 8-bit codec, raises ValueError if it is not uint8.
+
+    Parameters:
+        data (2D array): image to be encoded
+        codec (string): name of the codec, for the error message
+
+    Returns:
+        2D array: the image, as an array
+    """
+    data = np.asarray(data)
+    if (data.dtype != np.uint8):
+        raise ValueError(codec + " only encodes 8-bit images, got " + str(data.dtype) + ", use HighDepthCodec for 12 and 16-bit images")
+    return data
+
+
+def check_residuals(data, codec):
+    """
+    Checks that residuals can be encoded by an 8-bit codec, raises ValueError if they are not. They must be in [-255, 255], as
+    given by PredictiveTransform (or temporalEncode()) for uint8 images, or already wrapped to [0, 255].
+
+    Parameters:
+        data (2D array): residuals to be encoded
+        codec (string): name of the codec, for the error message
+    """
+    if (np.size(data) > 0 and (np.min(data) < -255 or np.max(data) > 255)):
+        raise ValueError(codec + " only encodes residuals of 8-bit images (-255 to 255), got " + str(np.min(data)) + " to " +
+                         str(np.max(data)) + ", use HighDepthCodec for 12 and 16-bit images")
+
+
 # Predictive Transformer
 class PredictiveTransform:
     """
@@ -30,6 +61,21 @@ class PredictiveTransform:
         pass
 
 
+    def residualType(self, initial_data):
+        """
+        Type of the encoded array: int16 is enough for 8-bit images, images with more bits (uint16) need int32.
+
+        Parameters:
+            initial_data (2D array): array that will be encoded
+
+        Returns:
+            string: type of the encoded array
+        """
+        if (np.issubdtype(initial_data.dtype, np.integer) and initial_data.dtype.itemsize > 1):
+            return "int32"
+        return "int16"
+
+
     def horizontalEncode(self, initial_data):
         """
         Encodes each line of the given data via the function f(i) = f(i) - f(i-1), with i ∈ [1, array_lenght], being i the index of the current pixel
@@ -41,7 +87,7 @@ class PredictiveTransform:
             2D array: encoded array
         """
         final_data = np.copy(initial_data)
-        final_data = final_data.astype("int16")
+        final_data = final_data.astype(self.residualType(initial_data))
         _ , length = final_data.shape
         
         final_data[:,1:] = np.subtract(final_data[:,1:], final_data[:,:length-1])
@@ -49,13 +95,14 @@ class PredictiveTransform:
         return final_data
 
 
-    def horizontalDecode(self, initial_data):
+    def horizontalDecode(self, initial_data, dtype="uint8"):
         """
         Decodes each line of the given data (that was previously encoded) via the function f(i) = f(i) + f(i-1), with i ∈ [1, array_lenght],being
         i the index of the current pixel
 
         Parameters: 
             initial_data (2D array): array that will be decoded
+            dtype (string): type of the decoded array (of the original image). Default: "uint8"
         
         Returns:
             2D array: decoded array
@@ -64,7 +111,7 @@ class PredictiveTransform:
         _ , length = final_data.shape
         for i in range(1,length):
             final_data[:,i] +=  final_data[:,i-1]
-        final_data = final_data.astype("uint8")
+        final_data = final_data.astype(dtype)
         return final_data
         
 
@@ -79,19 +126,20 @@ class PredictiveTransform:
             2D array: encoded array
         """
         final_data = np.copy(initial_data)
-        final_data = final_data.astype("int16")
+        final_data = final_data.astype(self.residualType(initial_data))
         height , _ = final_data.shape
         
         final_data[1:,:] = np.subtract(final_data[1:,:], final_data[:height-1 ,: ])
         return final_data
 
 
-    def verticalDecode(self, initial_data):
+    def verticalDecode(self, initial_data, dtype="uint8"):
         """
         Decodes each column of the given data via the function f(i) = f(i) - f(i-1), with i ∈ [1, array_heigth], being i the index of the current pixel
 
         Parameters: 
             initial_data (2D array): array that will be decoded
+            dtype (string): type of the decoded array (of the original image). Default: "uint8"
         
         Returns:
             2D array: decoded array
@@ -101,7 +149,7 @@ class PredictiveTransform:
         height , _ = final_data.shape
         for i in range(1, height):
             final_data[i,:] += final_data[i-1,:]
-        final_data = final_data.astype("uint8")
+        final_data = final_data.astype(dtype)
         return final_data
 
     # Transforms data using Predictive algorithm
@@ -127,7 +175,7 @@ class PredictiveTransform:
         return encoded_data
 
 
-    def decode(self, data, vertical=False):
+    def decode(self, data, vertical=False, dtype="uint8"):
         """
         Decodes data using a predictive transformer
         
@@ -137,13 +185,123 @@ class PredictiveTransform:
         Parameters:
             data (2D array): data to be decoded
             vertical (boolean): if True it encodes using a vertical predictive encoder. Default: False, encodes horizontaly
+            dtype (string): type of the decoded array, "uint16" for 12/16-bit images. Default: "uint8"
 
         Returns:
             2D array: decoded data
         """
         if (vertical):
-            decoded_data = self.verticalDecode(data)
+            decoded_data = self.verticalDecode(data, dtype)
         else:
-            decoded_data = self.horizontalDecode(data)
+            decoded_data = self.horizontalDecode(data, dtype)
         
         return decoded_data
+
+
+    def temporalEncode(self, data, previous, blend=False, vertical=False):
+        """
+        Encodes a frame of a sequence using the previous frame as prediction.
+
+        Without blend: f(i) = f(i) - p(i), being p the previous frame.
+        With blend: f(i) = f(i) - (p(i) + f(i-1)) // 2, being f(i-1) the left pixel (or the upper pixel, if vertical). The first column
+        (or row) is predicted only by the previous frame.
+
+        Parameters:
+            data (2D array): frame to be encoded
+            previous (2D array): previous frame, as it will be decoded
+            blend (boolean): if True, blends the previous frame with the spatial prediction. Default: False
+            vertical (boolean): direction of the spatial prediction when blending. Default: False, horizontal
+
+        Returns:
+            2D array: encoded frame
+        """
+        final_data = data.astype("int16")
+        prediction = previous.astype("int16")
+
+        if (blend):
+            if (vertical):
+                prediction[1:,:] = (prediction[1:,:] + final_data[:-1,:]) // 2
+            else:
+                prediction[:,1:] = (prediction[:,1:] + final_data[:,:-1]) // 2
+
+        return final_data - prediction
+
+
+    def temporalDecode(self, data, previous, blend=False, vertical=False):
+        """
+        Decodes a frame encoded by temporalEncode(). Blend and vertical options must be the same as used when encoding.
+
+        Parameters:
+            data (2D array): frame to be decoded
+            previous (2D array): previous frame (already decoded)
+            blend (boolean): if True, blends the previous frame with the spatial prediction. Default: False
+            vertical (boolean): direction of the spatial prediction when blending. Default: False, horizontal
+
+        Returns:
+            2D array: decoded frame
+        """
+        final_data = (data.astype("int16") + previous.astype("int16")) & 255
+
+        if (blend):
+            # the spatial part of the prediction needs the pixels already decoded, so it goes column by column (or row by row)
+            if (vertical):
+                height, _ = final_data.shape
+                for i in range(1, height):
+                    final_data[i,:] = (data[i,:].astype("int16") + (previous[i,:].astype("int16") + final_data[i-1,:]) // 2) & 255
+            else:
+                _, length = final_data.shape
+                for i in range(1, length):
+                    final_data[:,i] = (data[:,i].astype("int16") + (previous[:,i].astype("int16") + final_data[:,i-1]) // 2) & 255
+
+        final_data = final_data.astype("uint8")
+        return final_data
+
+
+    def sequenceEncode(self, frames, keyInterval=30, blend=False, vertical=False):
+        """
+        Encodes a sequence of frames. Every keyInterval frames there is a keyframe, which is encoded alone (encode()), so decoding
+        can start there. The other frames are encoded from the previous one (temporalEncode()).
+
+        Parameters:
+            frames (list of 2D arrays): frames to be encoded
+            keyInterval (int): distance between keyframes. Default: 30
+            blend (boolean): see temporalEncode(). Default: False
+            vertical (boolean): direction of the spatial prediction. Default: False, horizontal
+
+        Returns:
+            list of 2D arrays: encoded frames
+        """
+        encoded_data = []
+        for i, frame in enumerate(frames):
+            if (i % keyInterval == 0):
+                encoded_data.append(self.encode(frame, vertical))
+            else:
+                encoded_data.append(self.temporalEncode(frame, frames[i-1], blend, vertical))
+
+        return encoded_data
+
+
+    def sequenceDecode(self, data, keyInterval=30, blend=False, vertical=False, start=0):
+        """
+        Decodes a sequence encoded by sequenceEncode(). Options must be the same as used when encoding.
+
+        Parameters:
+            data (list of 2D arrays): encoded frames, starting at frame "start"
+            keyInterval (int): distance between keyframes. Default: 30
+            blend (boolean): see temporalEncode(). Default: False
+            vertical (boolean): direction of the spatial prediction. Default: False, horizontal
+            start (int): index of the first given frame in the sequence. Must be a keyframe. Default: 0
+
+        Returns:
+            list of 2D arrays: decoded frames
+        """
+        assert start % keyInterval == 0, "decoding must start at a keyframe"
+
+        decoded_data = []
+        for i, frame in enumerate(data, start):
+            if (i % keyInterval == 0):
+                decoded_data.append(self.decode(frame, vertical).astype("uint8"))
+            else:
+                decoded_data.append(self.temporalDecode(frame, decoded_data[-1], blend, vertical))
+
+        return decoded_data
@@ -0,0 +1,255 @@
+"""
+
+module:: ProgressiveCodec
+    :synopsis: Progressive (multi-resolution) codec. It stores a small base image and then refinement layers, each one doubling the
+    resolution, so previews can be decoded from the beginning of the file alone.
+
+Several libs are imported here:
+    matplotlib
+    numpy
+    json
+    imageio
+    StdlibCodec
+    PredictiveTransform
+
+
+Each level is the level above it with every other row and column removed. The base (smallest level) is encoded with the predictive
+transformation, and each refinement layer stores, for the pixels which are not in the level below, the difference to a prediction
+interpolated from the level below.
+
+File format: 4 bytes (big endian) with the length of a JSON header, the JSON header, the base and then the refinement layers from
+the smallest to the full resolution. The header has the shape and the size of every layer, so decoding up to a level only reads
+the layers it needs.
+
+The base and the layers are compressed with the stdlib backends only, not with LZWCodec or RLEHuffmanCodec as in TileCodec. A
+refinement layer is not a rectangle (3/4 of the pixels of its level), while LZW and RLE + Huffman code 2D residuals and store
+their shape, and the backends of StdlibCodec compress bytes as they are and decode them in C, which keeps previews cheap. The
+base uses the same backend, so a file has only one.
+
+"""
+
+import json
+import numpy as np
+import matplotlib.image as mpimg
+import imageio
+from predictive import PredictiveTransform, check_image
+from stdcodec import StdlibCodec, BACKENDS
+
+
+def upsample(data, shape):
+    """
+    Predicts a level from the level below it (linear interpolation of the known pixels).
+
+    Pixels in even rows and columns are the pixels of the level below, the others are the mean of their known neighbors.
+
+    Parameters:
+        data (2D array): level below
+        shape (tuple): shape of the level to predict
+
+    Returns:
+        2D array: prediction (int16)
+    """
+    heigth, length = shape
+    data = data.astype("int16")
+
+    # columns
+    right = np.concatenate([data[:, 1:], data[:, -1:]], axis=1)
+    columns = np.empty((data.shape[0], length), dtype="int16")
+    columns[:, 0::2] = data
+    columns[:, 1::2] = ((data + right) // 2)[:, :length // 2]
+
+    # rows
+    below = np.concatenate([columns[1:, :], columns[-1:, :]], axis=0)
+    final_data = np.empty((heigth, length), dtype="int16")
+    final_data[0::2, :] = columns
+    final_data[1::2, :] = ((columns + below) // 2)[:heigth // 2, :]
+
+    return final_data
+
+
+def _refined_mask(shape):
+    """
+    Returns:
+        2D array: True for the pixels which are not in the level below (they are stored in the refinement layer)
+    """
+    mask = np.ones(shape, dtype=bool)
+    mask[0::2, 0::2] = False
+    return mask
+
+
+class ProgressiveCodec:
+    """
+    Progressive codec: a base image and refinement layers, compressed with zlib, lzma or bz2 (see the module notes for why not
+    with LZW or RLE + Huffman codes).
+
+    Use only encode() and decode() (or preview()), or compress() and decompress() in memory.
+    """
+
+    def __init__(self, levels=4, backend="zlib", level=None):
+        """
+        Codec constructor.
+
+        Parameters:
+            levels (int): number of refinement layers, the base has about 1/2^levels of the size of the image. Default: 4
+            backend (string): "zlib", "lzma" or "bz2". Default: "zlib"
+            level (int): compression level of the backend. Default: None, the default level of the backend
+        """
+        self.levels = levels
+        self.codec = StdlibCodec(backend, level)
+
+
+    def compress(self, data, vertical=False):
+        """
+        Encodes a given image in memory.
+
+        Parameters:
+            data (2D array): image to be encoded (uint8)
+            vertical (boolean): if True, the base is transformed by Predictive in vertical mode. Default: False.
+
+        Returns:
+            bytes: encoded data (see the file format)
+        """
+        pyramid = [check_image(data, "ProgressiveCodec")]
+        while (len(pyramid) <= self.levels and min(pyramid[-1].shape) > 1):
+            pyramid.append(pyramid[-1][0::2, 0::2])
+
+        pt = PredictiveTransform()
+        layers = [self.codec.compress_residuals(pt.encode(pyramid[-1], vertical))]
+
+        _, compress, _, _ = BACKENDS[self.codec.backend]
+        for lower, current in zip(pyramid[:0:-1], pyramid[-2::-1]):
+            residuals = current.astype("int16") - upsample(lower, current.shape)
+            residuals = residuals[_refined_mask(current.shape)].astype(np.uint8)
+            layers.append(compress(residuals.tobytes(), self.codec.level))
+
+        header = {
+            "backend": self.codec.backend,
+            "vertical": vertical,
+            "shapes": [list(level.shape) for level in pyramid[::-1]],
+            "sizes": [len(layer) for layer in layers],
+        }
+        header = json.dumps(header).encode()
+
+        return len(header).to_bytes(4, "big") + header + b"".join(layers)
+
+
+    def read_header(self, payload):
+        """
+        Parameters:
+            payload (bytes): beginning of the data given by compress()
+
+        Returns:
+            dict: header (shapes and sizes of the layers, from the base to the full resolution)
+            int: where the base starts
+        """
+        size = int.from_bytes(payload[:4], "big")
+        return json.loads(bytes(payload[4:4 + size]).decode()), 4 + size
+
+
+    def decompress(self, payload, level=None):
+        """
+        Decodes the data given by compress() up to a level. Only the layers needed are read, so payload may be just the beginning
+        of the data.
+
+        Parameters:
+            payload (bytes): data given by compress() (at least up to the requested level)
+            level (int): 0 is the base, each level doubles the resolution. Default: None, the full resolution
+
+        Returns:
+            2D array: decoded image at that level (uint8)
+        """
+        header, offset = self.read_header(payload)
+        sizes = header["sizes"]
+        shapes = header["shapes"]
+        if (level is None or level >= len(sizes)):
+            level = len(sizes) - 1
+
+        _, _, decompress, _ = BACKENDS[header["backend"]]
+        pt = PredictiveTransform()
+
+        data = pt.decode(self.codec.decompress_residuals(payload[offset:offset + sizes[0]]), header["vertical"])
+        offset += sizes[0]
+
+        for i in range(1, level + 1):
+            shape = tuple(shapes[i])
+            residuals = np.zeros(shape, dtype="int16")
+            residuals[_refined_mask(shape)] = np.frombuffer(decompress(payload[offset:offset + sizes[i]]), dtype=np.uint8)
+            offset += sizes[i]
+
+            # pixels of the level below are predicted exactly (their residual is 0)
+            data = ((upsample(data, shape) + residuals) & 255).astype(np.uint8)
+
+        return data.astype(np.uint8)
+
+
+    def encode(self, filein, fileout, vertical=False):
+        """
+        Encodes a given file and outputs it in another file.
+
+        Parameters:
+            filein (string): file to be encoded (.bmp format)
+            fileout (string): file to be created as output
+            vertical (boolean): if True, the base is transformed by Predictive in vertical mode. Default: False.
+        """
+        data = mpimg.imread(filein)
+
+        with open(fileout, "wb") as f:
+            f.write(self.compress(data, vertical))
+
+
+    def read_level(self, filein, level=None, maxSize=None):
+        """
+        Reads from a given file only the beginning needed to decode a level.
+
+        Parameters:
+            filein (string): file to be read
+            level (int): 0 is the base, each level doubles the resolution. Default: None, the full resolution
+            maxSize (int): if given, the level is the smallest one at least maxSize pixels wide or high. Default: None
+
+        Returns:
+            bytes: beginning of the file
+            int: level
+        """
+        with open(filein, "rb") as f:
+            size = f.read(4)
+            header, offset = self.read_header(size + f.read(int.from_bytes(size, "big")))
+            shapes = header["shapes"]
+
+            if (maxSize is not None):
+                level = next((i for i, shape in enumerate(shapes) if max(shape) >= maxSize), None)
+            if (level is None or level >= len(shapes)):
+                level = len(shapes) - 1
+
+            f.seek(0)
+            return f.read(offset + sum(header["sizes"][:level + 1])), level
+
+
+    def decode(self, filein, fileout, level=None):
+        """
+        Decodes a given file up to a level and outputs it into a .bmp (bitmap) file. Only the beginning of the file needed for the
+        level is read.
+
+        Parameters:
+            filein (string): file to be decoded
+            fileout (string): file to be created and outputted (preferably .bmp format)
+            level (int): 0 is the base, each level doubles the resolution. Default: None, the full resolution
+        """
+        payload, level = self.read_level(filein, level)
+
+        imageio.imwrite(fileout, self.decompress(payload, level))
+
+
+    def preview(self, filein, maxSize=256):
+        """
+        Decodes the smallest level of a given file which is at least maxSize pixels wide or high (or the full image, if smaller).
+
+        Parameters:
+            filein (string): file to be decoded
+            maxSize (int): size of the preview. Default: 256
+
+        Returns:
+            2D array: decoded preview (uint8)
+        """
+        payload, level = self.read_level(filein, maxSize=maxSize)
+
+        return self.decompress(payload, level)
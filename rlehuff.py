@@ -12,6 +12,9 @@ Several libs are imported here:
     imageio
     HuffmanCodec
     PredictiveTransform
+    collections
+    concurrent.futures (parallel decoding of streams, blocks and strips)
+    memory (maxMemory option)
 
 RLE was coded by Miguel Dinis.
 HuffmanCodec was coded by "soxofaan" as in https://github.com/soxofaan/dahuffman. His library is being used here, "HuffmanCodec".
@@ -19,13 +22,53 @@ HuffmanCodec was coded by "soxofaan" as in https://github.com/soxofaan/dahuffman
 
 """
 
-from huffmancodec import HuffmanCodec
+from huffmancodec import HuffmanCodec, PrefixCodec, PARALLEL_BYTES
+from concurrent.futures import ProcessPoolExecutor
+import collections
 import matplotlib.image as mpimg
 import json
 import numpy as np
-from predictive import PredictiveTransform
+from predictive import PredictiveTransform, check_image, check_residuals
+from memory import parse_memory, fit, plan_workers
 import imageio
 
+
+# maxMemory option (bytes per pixel, measured with tracemalloc): encoding and decoding a whole image (Python lists and strings of
+# symbols), and the arrays kept for the whole image while it is coded strip by strip or streamed
+ENCODE_BYTES = 128
+DECODE_BYTES = 96
+STRIP_BYTES = 8
+
+# strips are never smaller than this (pixels), each one stores its own table
+MIN_STRIP_PIXELS = 2**16
+
+# streaming decode: symbols decoded before they are turned into pixels
+STREAM_SYMBOLS = 2**16
+
+
+def _huff_decode_block(table, code):
+    """
+    Decodes one block of huffman codes (used by worker processes).
+    """
+    return "".join(PrefixCodec(table, check=False, eof='EOF').decode(code))
+
+
+def _huff_bits(table, frequencies):
+    """
+    Size in bits of some data (given by its symbol frequencies) coded with a table. None if a symbol is not in the table.
+    """
+    if any(s not in table for s in frequencies):
+        return None
+    return sum(f * table[s][0] for s, f in frequencies.items()) + table['EOF'][0]
+
+
+def _decode_strip(code, js):
+    """
+    Decodes the residuals of one strip (used by worker processes).
+    """
+    return RLEHuffmanCodec().decode_residuals(code, js)
+
+
 class RLEHuffmanCodec:
     """
     This codec makes a predictive transformation before encoding. RLE is used to encode and HuffmanCodes afterwards.
@@ -33,11 +76,46 @@ class RLEHuffmanCodec:
     Use only encode() and decode()
     """ 
 
-    def __init__(self):
+    def __init__(self, streams=None, workers=None, blockSize=None, maxMemory=None):
+        """
+        Codec constructor.
+
+        Parameters:
+            streams (int): if given, the huffman codes are split in this many independent streams sharing the table (see
+                PrefixCodec.encode_streams()), which can be decoded at the same time. It is stored in the table. Default: None, one stream
+            workers (int): number of processes decoding the streams (or blocks), for data of at least PARALLEL_BYTES (see
+                huffmancodec). Default: None, decodes in this process
+            blockSize (int): if given, the symbols are split in blocks of this size and each block uses the shared table, the table
+                of the previous block or its own table, whichever costs less bits (see huff_encode_blocks()). Default: None
+            maxMemory (int or string): memory budget in bytes (or "512M", "2G"...). Images which do not fit are encoded in strips of
+                rows (see strip_rows()) and decoded strip by strip, or streamed, and workers are reduced to fit. Default: None, no budget
+        """
+        assert not (streams and blockSize), "streams and blocks cannot be used together"
+        self.streams = streams
+        self.workers = workers
+        self.blockSize = blockSize
+        self.maxMemory = parse_memory(maxMemory)
+
+
+    def strip_rows(self, shape, bytesPerPixel):
         """
-        Codec constructor. Apparently empty :( 
+        Number of rows of the strips an image has to be split in to fit in maxMemory.
+
+        Parameters:
+            shape (tuple): (heigth, length) of the image
+            bytesPerPixel (int): memory used by each pixel being coded (ENCODE_BYTES or DECODE_BYTES)
+
+        Returns:
+            int: rows of each strip, None if the whole image fits (or there is no budget)
         """
-        pass
+        if (self.maxMemory is None):
+            return None
+        heigth, length = shape
+        if (heigth * length * bytesPerPixel <= self.maxMemory):
+            return None
+
+        rows = fit(self.maxMemory, heigth * length * STRIP_BYTES, length * bytesPerPixel, -(-MIN_STRIP_PIXELS // length), heigth)
+        return rows if rows < heigth else None
 
 
     def rle_encode(self, data):
@@ -56,6 +134,10 @@ class RLEHuffmanCodec:
         counter = 1
         datalen = len(data)
 
+        # a single symbol never reaches the end of the loop below
+        if (datalen == 1):
+            return str(lastChar)
+
         for i in range(1, datalen):
             currentChar = data[i]
 
@@ -125,13 +207,16 @@ class RLEHuffmanCodec:
         """
 
         codec = HuffmanCodec.from_data(data, eof='EOF')
-        enc = codec.encode(data)
+        if (self.streams):
+            enc = codec.encode_streams(data, self.streams)
+        else:
+            enc = codec.encode(data)
         table = codec.get_code_table()
 
         return enc, table
 
    
-    def huff_decode(self, code, table):
+    def huff_decode(self, code, table, streams=False, workers=None):
         """
         Decodes a given data and a given table of occurrences using Huffman codes.
 
@@ -140,6 +225,8 @@ class RLEHuffmanCodec:
         Parameters:
             code (string): data to be decoded
             table (array): table to be used to decode
+            streams (boolean): if True, code was encoded in several streams. Default: False
+            workers (int): number of processes decoding the streams. Default: None, self.workers
 
         Returns:
             string: decoded data
@@ -147,32 +234,109 @@ class RLEHuffmanCodec:
         """
 
         codec = HuffmanCodec(table, eof = 'EOF')
-        dec = codec.decode(code)
+        if (streams):
+            dec = codec.decode_streams(code, workers=workers or self.workers)
+        else:
+            dec = codec.decode(code)
 
         return "".join(dec)
 
     
-    def encode(self, filein, fileout, filetreeout, vertical=False):
+    def huff_encode_blocks(self, data):
         """
-        Transforms using PredictiveTransform and encodes a given file and outputs it in another file.
+        Encodes a given data using Huffman codes, block by block, with a table chosen for each block.
 
-        Vertical option, if chosen, calls the predictive transformer in Vertical mode, which will predict the values in a vertical order.
+        Table 0 is built from the whole data (shared). For each block the cost in bits is computed for the table of the previous
+        block, the shared table and a new table for the block (plus the cost of storing it) and the cheapest one is used.
+        Each block is coded alone (with its own "end of file"), so blocks can be decoded independently.
 
-        Parameters: 
-            filein (string): file to be encoded (.bmp format)
-            fileout (string): file to be created as output (.rlehuff format)
-            filetreeout (string): file to be created as a table resource (.json format)
-            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+        Parameters:
+            data (list): data to be encoded
 
+        Returns:
+            bytes: encoded data (all the blocks)
+            list: tables, the first is the shared one
+            list: for each block, [index of its table, size in bytes]
         """
 
-        # read data from file
-        data = mpimg.imread(filein)
+        tables = [HuffmanCodec.from_data(data, eof='EOF').get_code_table()]
+        blocks = []
+        enc = []
+        previous = 0
+
+        for i in range(0, len(data), self.blockSize):
+            block = data[i:i + self.blockSize]
+            frequencies = collections.Counter(block)
+            own = HuffmanCodec.from_frequencies(frequencies, eof='EOF').get_code_table()
+
+            # cost of storing a table: roughly the bytes of its JSON entries
+            options = [
+                (_huff_bits(tables[previous], frequencies), previous),
+                (_huff_bits(tables[0], frequencies), 0),
+                (_huff_bits(own, frequencies) + 8 * sum(len(s) + 24 for s in own), len(tables)),
+            ]
+            _, index = min(option for option in options if option[0] is not None)
+            if (index == len(tables)):
+                tables.append(own)
+
+            code = PrefixCodec(tables[index], check=False, eof='EOF').encode(block)
+            enc.append(code)
+            blocks.append([index, len(code)])
+            previous = index
+
+        return b"".join(enc), tables, blocks
+
+
+    def huff_decode_blocks(self, code, tables, blocks, workers=None):
+        """
+        Decodes the output of huff_encode_blocks().
+
+        Parameters:
+            code (bytes): encoded data
+            tables (list): tables, as given by huff_encode_blocks()
+            blocks (list): for each block, [index of its table, size in bytes]
+            workers (int): number of processes decoding the blocks, when there are at least PARALLEL_BYTES of them. Default: None,
+                self.workers
+
+        Returns:
+            string: decoded data
+        """
+
+        workers = workers or self.workers
+        parts = []
+        offset = 0
+        for index, size in blocks:
+            parts.append((tables[index], code[offset:offset + size]))
+            offset += size
+
+        if (workers and workers > 1 and len(parts) > 1 and offset >= PARALLEL_BYTES):
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                dec = list(pool.map(_huff_decode_block, *zip(*parts)))
+        else:
+            dec = [_huff_decode_block(table, part) for table, part in parts]
+
+        return "".join(dec)
+
+
+    def encode_residuals(self, data):
+        """
+        Encodes an already transformed (predictive) 2D array with RLE and Huffman codes.
+
+        Parameters:
+            data (2D array): residuals given by PredictiveTransform
+
+        Returns:
+            bytes: encoded data
+            dict: huffman table and size of the image, as stored in the JSON file
+        """
+
+        check_residuals(data, "RLEHuffmanCodec")
         heigth, length = data.shape
 
-        pt = PredictiveTransform()
+        rows = self.strip_rows(data.shape, ENCODE_BYTES)
+        if (rows is not None):
+            return self.encode_strips(data, rows)
 
-        data = pt.encode(data, vertical)
         data = data.flatten()
         data = list(data)
 
@@ -199,7 +363,269 @@ class RLEHuffmanCodec:
                 hufflist.append(symbol) 
         
         # actual encoding
-        huff_enc, huff_table = self.huff_encode(hufflist)
+        if (self.blockSize):
+            huff_enc, tables, blocks = self.huff_encode_blocks(hufflist)
+            huff_table = tables[0]
+        else:
+            huff_enc, huff_table = self.huff_encode(hufflist)
+
+        huff_table = { i : {"value1" : huff_table[i][0], "value2" : huff_table[i][1]} for i in huff_table}
+        huff_table["size"] = {"length" : length, "heigth" : heigth}
+        if (self.streams):
+            huff_table["streams"] = self.streams
+        if (self.blockSize):
+            huff_table["tables"] = [{ i : {"value1" : t[i][0], "value2" : t[i][1]} for i in t} for t in tables[1:]]
+            huff_table["blocks"] = blocks
+
+        return huff_enc, huff_table
+
+
+    def encode_strips(self, data, rows):
+        """
+        Encodes the residuals in strips of rows, one after the other, so only one strip is held as lists and strings of symbols.
+        Each strip has its own table.
+
+        Parameters:
+            data (2D array): residuals given by PredictiveTransform
+            rows (int): rows of each strip (see strip_rows())
+
+        Returns:
+            bytes: encoded data (all the strips)
+            dict: size of the image and, for each strip, [size in bytes, table as given by encode_residuals()]
+        """
+
+        heigth, length = data.shape
+        enc = []
+        strips = []
+        for i in range(0, heigth, rows):
+            strip_enc, strip_table = self.encode_residuals(data[i:i + rows])
+            enc.append(strip_enc)
+            strips.append([len(strip_enc), strip_table])
+
+        return b"".join(enc), {"size": {"length" : length, "heigth" : heigth}, "strips": strips}
+
+
+    def decode_strips(self, enc, js):
+        """
+        Decodes the output of encode_strips(). Strips are written into the output as they are decoded, in parallel if there are
+        workers (as many as fit in maxMemory).
+
+        Parameters:
+            enc (bytes): encoded data
+            js (dict): as given by encode_strips()
+
+        Returns:
+            2D array: residuals (int16) to be given to PredictiveTransform
+        """
+
+        length , height = js["size"]["length"], js["size"]["heigth"]
+        parts = []
+        offset = 0
+        for size, table in js["strips"]:
+            parts.append((enc[offset:offset + size], table))
+            offset += size
+
+        rows = max(table["size"]["heigth"] for _, table in parts)
+        workers = plan_workers(self.maxMemory, height * length * STRIP_BYTES, rows * length * DECODE_BYTES, self.workers)
+
+        final_data = np.empty((height, length), dtype=np.int16)
+        row = 0
+        pool = ProcessPoolExecutor(max_workers=workers) if (workers > 1 and len(parts) > 1) else None
+        try:
+            if (pool is not None):
+                strips = pool.map(_decode_strip, *zip(*parts))
+            else:
+                strips = (self.decode_residuals(code, table) for code, table in parts)
+            for strip in strips:
+                final_data[row:row + len(strip)] = strip
+                row += len(strip)
+        finally:
+            if (pool is not None):
+                pool.shutdown()
+
+        return final_data
+
+
+    def decode_streaming(self, enc, table, shape):
+        """
+        Decodes huffman codes and RLE together, STREAM_SYMBOLS symbols at a time, straight into the output array. Slower than
+        decode_residuals() but only holds a few symbols as strings (used when the image does not fit in maxMemory).
+
+        Parameters:
+            enc (bytes): encoded data (one stream, one table)
+            table (dict): huffman table
+            shape (tuple): (heigth, length) of the image
+
+        Returns:
+            2D array: residuals (int16) to be given to PredictiveTransform
+        """
+
+        codec = HuffmanCodec(table, eof = 'EOF')
+        final_data = np.empty(shape[0] * shape[1], dtype=np.int16)
+        position = 0
+        pending = []
+
+        # RLE fields end with "#", so the symbols are turned into pixels at a "#"
+        for symbol in codec.decode_streaming(enc):
+            if (symbol == "#" and len(pending) >= STREAM_SYMBOLS):
+                values = np.array(self.rle_decode("".join(pending))).astype("int16")
+                final_data[position:position + len(values)] = values
+                position += len(values)
+                pending = []
+            else:
+                pending.append(symbol)
+
+        values = np.array(self.rle_decode("".join(pending))).astype("int16")
+        final_data[position:position + len(values)] = values
+
+        return final_data.reshape(shape)
+
+
+    def decode_residuals(self, enc, js):
+        """
+        Decodes the output of encode_residuals() back to the residuals of the image.
+
+        Parameters:
+            enc (bytes): encoded data
+            js (dict): huffman table and size of the image, as stored in the JSON file
+
+        Returns:
+            2D array: residuals (int16) to be given to PredictiveTransform
+        """
+
+        if ("strips" in js):
+            return self.decode_strips(enc, js)
+
+        js = dict(js)
+        length , height = js["size"]["length"], js["size"]["heigth"]
+        js.pop("size")
+        streams = js.pop("streams", None)
+        tables = js.pop("tables", [])
+        blocks = js.pop("blocks", None)
+
+        table = { i: (js[i]["value1"],js[i]["value2"]) for i in js}
+
+        # too big for maxMemory: stream it (only possible with one stream and one table)
+        if (blocks is None and not streams and self.strip_rows((height, length), DECODE_BYTES) is not None):
+            return self.decode_streaming(enc, table, (height, length))
+
+        # decode huffman first and then RLE, with as many workers as fit in maxMemory (each one decodes a block or a stream)
+        parts = len(blocks) if blocks is not None else (streams or 1)
+        workers = plan_workers(self.maxMemory, height * length * DECODE_BYTES, height * length * DECODE_BYTES // parts, self.workers)
+        if (blocks is not None):
+            tables = [table] + [{ i: (t[i]["value1"],t[i]["value2"]) for i in t} for t in tables]
+            huff_dec = self.huff_decode_blocks(enc, tables, blocks, workers)
+        else:
+            huff_dec = self.huff_decode(enc, table, bool(streams), workers)
+
+        rle_dec = self.rle_decode(huff_dec)
+
+        rle_dec = np.array(rle_dec)  
+        
+        rle_dec = rle_dec.reshape(height,length)
+        return rle_dec.astype("int16")
+
+
+    def compress_residuals(self, data):
+        """
+        Encodes already transformed (predictive) residuals in memory.
+
+        The huffman table is packed together with the encoded data: 4 bytes (big endian) with the length of the JSON table,
+        the JSON table and then the encoded data.
+
+        Parameters:
+            data (2D array): residuals given by PredictiveTransform
+
+        Returns:
+            bytes: table and encoded data
+        """
+
+        huff_enc, huff_table = self.encode_residuals(data)
+        table = json.dumps(huff_table).encode()
+
+        return len(table).to_bytes(4, "big") + table + huff_enc
+
+
+    def decompress_residuals(self, payload):
+        """
+        Decodes the output of compress_residuals() back to the residuals.
+
+        Parameters:
+            payload (bytes): data given by compress_residuals()
+
+        Returns:
+            2D array: residuals (int16) to be given to PredictiveTransform
+        """
+
+        size = int.from_bytes(payload[:4], "big")
+        js = json.loads(bytes(payload[4:4 + size]).decode())
+
+        return self.decode_residuals(bytes(payload[4 + size:]), js)
+
+
+    def compress(self, data, vertical=False):
+        """
+        Transforms using PredictiveTransform and encodes a given image in memory.
+
+        Parameters:
+            data (2D array): image to be encoded (uint8)
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+
+        Returns:
+            bytes: table and encoded data (see compress_residuals())
+        """
+
+        data = check_image(data, "RLEHuffmanCodec")
+
+        pt = PredictiveTransform()
+        data = pt.encode(data, vertical)
+
+        return self.compress_residuals(data)
+
+
+    def decompress(self, payload, vertical=False):
+        """
+        Decodes the output of compress() back to the image, in memory.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            payload (bytes): data given by compress()
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+
+        Returns:
+            2D array: decoded image (uint8)
+        """
+
+        rle_dec = self.decompress_residuals(payload)
+
+        pt = PredictiveTransform()
+        rle_dec = pt.decode(rle_dec, vertical)
+        return rle_dec.astype("uint8")
+
+
+    def encode(self, filein, fileout, filetreeout, vertical=False):
+        """
+        Transforms using PredictiveTransform and encodes a given file and outputs it in another file.
+
+        Vertical option, if chosen, calls the predictive transformer in Vertical mode, which will predict the values in a vertical order.
+
+        Parameters: 
+            filein (string): file to be encoded (.bmp format)
+            fileout (string): file to be created as output (.rlehuff format)
+            filetreeout (string): file to be created as a table resource (.json format)
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+
+        """
+
+        # read data from file
+        data = mpimg.imread(filein)
+
+        pt = PredictiveTransform()
+
+        data = pt.encode(data, vertical)
+
+        huff_enc, huff_table = self.encode_residuals(data)
         
         # save encoding in file
         f = open(fileout, "wb")
@@ -208,9 +634,6 @@ class RLEHuffmanCodec:
 
         
         # save tree in a JSON file
-        huff_table = { i : {"value1" : huff_table[i][0], "value2" : huff_table[i][1]} for i in huff_table}
-        huff_table["size"] = {"length" : length, "heigth" : heigth}
-
         with open(filetreeout, "w") as fp:
             json.dump(huff_table,fp, indent=4)
 
@@ -236,25 +659,12 @@ class RLEHuffmanCodec:
     
         js = json.loads(data)
 
-        length , height = js["size"]["length"], js["size"]["heigth"]
-        js.pop("size")
-
-        table = { i: (js[i]["value1"],js[i]["value2"]) for i in js}
-
         # load data from file
         f = open(filein, "rb")
         enc = f.read()
         f.close()
 
-        # decode huffman first and then RLE
-        huff_dec = self.huff_decode(enc, table)
-
-        rle_dec = self.rle_decode(huff_dec)
-
-        rle_dec = np.array(rle_dec)  
-        
-        rle_dec = rle_dec.reshape(height,length)
-        rle_dec = rle_dec.astype("int16")       
+        rle_dec = self.decode_residuals(enc, js)
 
         pt = PredictiveTransform()
         rle_dec = pt.decode(rle_dec, vertical)
@@ -0,0 +1,155 @@
+"""
+
+module:: SequenceCodec
+    :synopsis: This codec encodes a sequence of images (time-lapse, fixed cameras...) predicting each frame from the previous one,
+    with keyframes at a fixed interval so decoding can start in the middle of the sequence.
+
+Several libs are imported here:
+    matplotlib
+    numpy
+    json
+    imageio
+    LZWCodec
+    RLEHuffmanCodec
+    PredictiveTransform
+
+
+File format: 4 bytes (big endian) with the length of a JSON header, the JSON header and then the encoded frames, one after the other.
+The header has the options used when encoding and the size of each encoded frame, so any keyframe can be found without decoding
+the frames before it.
+
+"""
+
+import json
+import imageio
+import matplotlib.image as mpimg
+from lzw import LZWCodec
+from rlehuff import RLEHuffmanCodec
+from predictive import PredictiveTransform, check_image
+
+
+CODECS = {"lzw": LZWCodec, "rlehuff": RLEHuffmanCodec}
+
+
+class SequenceCodec:
+    """
+    This codec makes a temporal predictive transformation (see PredictiveTransform.sequenceEncode()) and encodes each frame with
+    LZW or RLE + Huffman codes.
+
+    Use only encode() and decode(), or compress() and decompress() in memory.
+    """
+
+    def __init__(self, codec="lzw"):
+        """
+        Codec constructor.
+
+        Parameters:
+            codec (string): codec used for each frame, "lzw" or "rlehuff". Default: "lzw"
+        """
+        self.codec = codec
+
+
+    def compress(self, frames, keyInterval=30, blend=False, vertical=False):
+        """
+        Encodes a sequence of frames in memory.
+
+        Parameters:
+            frames (list of 2D arrays): frames to be encoded (same shape, uint8)
+            keyInterval (int): distance between keyframes. Default: 30
+            blend (boolean): if True, blends the previous frame with the spatial prediction (see PredictiveTransform.temporalEncode()). Default: False
+            vertical (boolean): direction of the spatial prediction. Default: False, horizontal
+
+        Returns:
+            bytes: encoded sequence
+        """
+        frames = [check_image(frame, "SequenceCodec") for frame in frames]
+        if (any(frame.shape != frames[0].shape for frame in frames)):
+            raise ValueError("frames must all have the same shape, got " + ", ".join(sorted(set(str(frame.shape) for frame in frames))))
+
+        codec = CODECS[self.codec]()
+        pt = PredictiveTransform()
+
+        payloads = [codec.compress_residuals(residuals) for residuals in pt.sequenceEncode(frames, keyInterval, blend, vertical)]
+
+        header = {
+            "codec": self.codec,
+            "keyInterval": keyInterval,
+            "blend": blend,
+            "vertical": vertical,
+            "sizes": [len(p) for p in payloads],
+        }
+        header = json.dumps(header).encode()
+
+        return len(header).to_bytes(4, "big") + header + b"".join(payloads)
+
+
+    def decompress(self, payload, start=0, stop=None):
+        """
+        Decodes a sequence encoded by compress(). Only the frames from the keyframe before "start" are decoded.
+
+        Parameters:
+            payload (bytes): data given by compress()
+            start (int): index of the first frame to return. Default: 0
+            stop (int): index after the last frame to return. Default: None, until the end
+
+        Returns:
+            list of 2D arrays: decoded frames from start to stop
+        """
+        size = int.from_bytes(payload[:4], "big")
+        header = json.loads(bytes(payload[4:4 + size]).decode())
+        sizes = header["sizes"]
+        keyInterval = header["keyInterval"]
+
+        if (stop is None or stop > len(sizes)):
+            stop = len(sizes)
+        key = start - start % keyInterval
+
+        # skip the frames before the keyframe
+        offset = 4 + size + sum(sizes[:key])
+
+        codec = CODECS[header["codec"]]()
+        residuals = []
+        for i in range(key, stop):
+            residuals.append(codec.decompress_residuals(payload[offset:offset + sizes[i]]))
+            offset += sizes[i]
+
+        pt = PredictiveTransform()
+        frames = pt.sequenceDecode(residuals, keyInterval, header["blend"], header["vertical"], start=key)
+
+        return frames[start - key:]
+
+
+    def encode(self, filesin, fileout, keyInterval=30, blend=False, vertical=False):
+        """
+        Encodes a sequence of image files and outputs it in one file.
+
+        Parameters:
+            filesin (list of strings): files of the frames, in order (.bmp format)
+            fileout (string): file to be created as output
+            keyInterval (int): distance between keyframes. Default: 30
+            blend (boolean): if True, blends the previous frame with the spatial prediction. Default: False
+            vertical (boolean): direction of the spatial prediction. Default: False, horizontal
+        """
+        frames = [mpimg.imread(f) for f in filesin]
+
+        with open(fileout, "wb") as f:
+            f.write(self.compress(frames, keyInterval, blend, vertical))
+
+
+    def decode(self, filein, filesout, start=0):
+        """
+        Decodes a sequence file and outputs each frame into a .bmp (bitmap) file.
+
+        Options are read from the file, they do not need to be given again.
+
+        Parameters:
+            filein (string): file to be decoded
+            filesout (list of strings): files to be created, one for each decoded frame (from "start" on)
+            start (int): index of the first frame to decode. Default: 0
+        """
+        with open(filein, "rb") as f:
+            payload = f.read()
+
+        frames = self.decompress(payload, start, start + len(filesout))
+        for name, frame in zip(filesout, frames):
+            imageio.imwrite(name, frame)
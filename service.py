@@ -0,0 +1,506 @@
+"""
+
+module:: CompressionService
+    :synopsis: Local compression service. An asyncio TCP front-end receives raw images (or compressed data) and a warm process pool
+    runs LZWCodec and RLEHuffmanCodec on them.
+
+Several libs are imported here:
+    asyncio
+    concurrent.futures (process pool)
+    json
+    numpy
+    LZWCodec
+    RLEHuffmanCodec
+
+
+Protocol (every message, in both directions):
+
+    4 bytes (big endian) with the length of the JSON header, the JSON header and then "length" bytes of payload.
+
+    Request header:
+        op (string): "compress", "decompress" or "metrics"
+        codec (string): "lzw" or "rlehuff"
+        vertical (boolean): predictive direction. Must be the same when compressing and decompressing.
+        shape (list): [heigth, length] of the raw image (compress only). Payload is the raw uint8 pixels.
+        chunkSize (int): LZW chunk size (optional)
+        length (int): size of the payload
+
+    Response header:
+        status (string): "ok", "busy" (queue is full, try again later), "timeout" or "error"
+        shape (list): [heigth, length] of the decoded image (decompress only). Payload is the raw uint8 pixels.
+        length (int): size of the payload
+        message (string): reason, when status is not "ok"
+
+Requests larger than maxMessage bytes (or with a header over MAX_HEADER bytes) are answered with status "error" without reading
+their payload, and the connection is closed.
+
+Everything runs on localhost, so it can be tested on a single machine with CompressionClient.
+
+"""
+
+import asyncio
+import collections
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lzw import LZWCodec
+from rlehuff import RLEHuffmanCodec
+
+
+CODECS = {"lzw": LZWCodec, "rlehuff": RLEHuffmanCodec}
+
+# largest JSON header a message may have (bytes)
+MAX_HEADER = 2**16
+
+# codec instances of each worker process, created once when the process starts
+_worker_codecs = {}
+
+
+def _init_worker():
+    """
+    Process pool initializer. Creates the codecs once per worker so requests do not pay for it.
+    """
+    for name, cls in CODECS.items():
+        _worker_codecs[name] = cls()
+
+
+def _warm_up():
+    """
+    Does nothing, it is used to start the worker processes before the first request.
+    """
+    return os.getpid()
+
+
+def _run_job(op, codec, payload, shape, vertical, chunkSize):
+    """
+    Runs one request inside a worker process.
+
+    Parameters:
+        op (string): "compress" or "decompress"
+        codec (string): "lzw" or "rlehuff"
+        payload (bytes): raw pixels (compress) or compressed data (decompress)
+        shape (tuple): (heigth, length) of the raw image (compress only)
+        vertical (boolean): predictive direction
+        chunkSize (int): LZW chunk size, None for the default
+
+    Returns:
+        bytes: result of the operation
+        tuple: shape of the decoded image (decompress only)
+    """
+    c = _worker_codecs[codec]
+
+    if (op == "compress"):
+        data = np.frombuffer(payload, dtype=np.uint8).reshape(shape)
+        if (codec == "lzw" and chunkSize):
+            return c.compress(data, chunkSize, vertical=vertical), None
+        return c.compress(data, vertical=vertical), None
+
+    image = c.decompress(payload, vertical=vertical)
+    return np.ascontiguousarray(image, dtype=np.uint8).tobytes(), image.shape
+
+
+class MessageError(ValueError):
+    """
+    Raised by read_message() when a message is too large or its header is not valid. The payload is not read.
+    """
+
+
+async def read_message(reader, maxSize=None):
+    """
+    Reads one framed message (JSON header and payload) from a stream.
+
+    Parameters:
+        reader (asyncio.StreamReader): stream to read from
+        maxSize (int): largest payload accepted (bytes), the header is at most MAX_HEADER bytes. Default: None, no limit
+
+    Returns:
+        dict: header
+        bytes: payload
+    """
+    size = int.from_bytes(await reader.readexactly(4), "big")
+    if (maxSize is not None and size > MAX_HEADER):
+        raise MessageError("header of %d bytes is larger than %d" % (size, MAX_HEADER))
+    try:
+        header = json.loads((await reader.readexactly(size)).decode())
+    except ValueError:
+        raise MessageError("header is not valid JSON") from None
+    length = header.get("length", 0) if isinstance(header, dict) else None
+    if (not isinstance(length, int) or isinstance(length, bool) or length < 0):
+        raise MessageError("header must be a JSON object with a non-negative integer length")
+    if (maxSize is not None and length > maxSize):
+        raise MessageError("message of %d bytes is larger than %d" % (length, maxSize))
+    payload = await reader.readexactly(length)
+    return header, payload
+
+
+async def write_message(writer, header, payload=b""):
+    """
+    Writes one framed message (JSON header and payload) to a stream.
+
+    Parameters:
+        writer (asyncio.StreamWriter): stream to write to
+        header (dict): header, "length" is filled in here
+        payload (bytes): payload
+    """
+    header = dict(header, length=len(payload))
+    raw = json.dumps(header).encode()
+    writer.write(len(raw).to_bytes(4, "big") + raw)
+    writer.write(payload)
+    await writer.drain()
+
+
+class ServiceMetrics:
+    """
+    Latency and queue depth statistics of a CompressionService.
+    """
+
+    def __init__(self, window=1000):
+        """
+        Constructor.
+
+        Parameters:
+            window (int): how many of the latest latencies are used for the percentiles
+        """
+        self.latencies = collections.deque(maxlen=window)
+        self.counters = collections.Counter()
+        self.queueDepth = 0
+        self.maxQueueDepth = 0
+
+
+    def record(self, status, latency=None):
+        """
+        Records the end of a request.
+
+        Parameters:
+            status (string): response status
+            latency (float): seconds since the request arrived, only stored for successful requests
+        """
+        self.counters[status] += 1
+        if (latency is not None):
+            self.latencies.append(latency)
+
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: requests per status, latency percentiles (seconds) and queue depth
+        """
+        result = {
+            "requests": dict(self.counters),
+            "queueDepth": self.queueDepth,
+            "maxQueueDepth": self.maxQueueDepth,
+        }
+        if (len(self.latencies) > 0):
+            p50, p90, p99 = np.percentile(np.array(self.latencies), [50, 90, 99])
+            result["latency"] = {"p50": float(p50), "p90": float(p90), "p99": float(p99), "max": max(self.latencies)}
+        return result
+
+
+class CompressionService:
+    """
+    asyncio TCP server on localhost which sends the CPU work to a warm process pool.
+
+    Requests wait in a bounded queue. When it is full the request is answered right away with status "busy" (backpressure),
+    and requests which are not done after "timeout" seconds are answered with status "timeout".
+
+    Use start() and stop(), or serve() to run until cancelled.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, workers=None, queueSize=16, timeout=30.0, maxMessage=256 * 2**20):
+        """
+        Service constructor.
+
+        Parameters:
+            host (string): address to listen on. Default: localhost
+            port (int): port to listen on. Default: 0, any free port (see self.port after start())
+            workers (int): number of worker processes. Default: number of CPUs
+            queueSize (int): max number of requests waiting for a worker. Default: 16
+            timeout (float): seconds a request may wait and run before giving up. Default: 30
+            maxMessage (int): largest request payload accepted (bytes). Default: 256 MiB
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.queueSize = queueSize
+        self.timeout = timeout
+        self.maxMessage = maxMessage
+        self.metrics = ServiceMetrics()
+
+        self._pool = None
+        self._server = None
+        self._queue = None
+        self._dispatchers = []
+
+
+    async def start(self):
+        """
+        Starts the worker processes (waiting for all of them to be ready) and the TCP server.
+        """
+        loop = asyncio.get_running_loop()
+
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        await asyncio.gather(*[loop.run_in_executor(self._pool, _warm_up) for _ in range(self.workers)])
+
+        self._queue = asyncio.Queue(maxsize=self.queueSize)
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+
+    async def stop(self):
+        """
+        Stops the TCP server and the worker processes.
+        """
+        if (self._server is not None):
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        if (self._pool is not None):
+            self._pool.shutdown(cancel_futures=True)
+        self._server = None
+        self._pool = None
+        self._dispatchers = []
+
+
+    async def serve(self):
+        """
+        Starts the service and runs it until cancelled.
+        """
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+
+    async def _dispatch(self):
+        """
+        Takes requests from the queue and runs them in the process pool, one at a time.
+
+        There is one dispatcher per worker, so the queue only drains as fast as the workers do.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future = await self._queue.get()
+            try:
+                if (not future.done()):
+                    result = await loop.run_in_executor(self._pool, _run_job, *job)
+                    if (not future.done()):
+                        future.set_result(result)
+            except Exception as e:
+                if (not future.done()):
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+                self.metrics.queueDepth = self._queue.qsize()
+
+
+    async def _handle(self, reader, writer):
+        """
+        Serves one client connection. Requests of the same connection are answered in order.
+        """
+        try:
+            while True:
+                try:
+                    header, payload = await read_message(reader, self.maxMessage)
+                except asyncio.IncompleteReadError:
+                    break
+                except MessageError as e:
+                    # the payload was not read, so the next messages cannot be found: answer and close the connection
+                    self.metrics.record("error")
+                    await write_message(writer, {"status": "error", "message": str(e)})
+                    break
+                response, result = await self._request(header, payload)
+                await write_message(writer, response, result)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+    async def _request(self, header, payload):
+        """
+        Answers one request.
+
+        Parameters:
+            header (dict): request header
+            payload (bytes): request payload
+
+        Returns:
+            dict: response header
+            bytes: response payload
+        """
+        t1 = time.perf_counter()
+        op = header.get("op")
+
+        if (op == "metrics"):
+            return {"status": "ok"}, json.dumps(self.metrics.snapshot()).encode()
+
+        codec = header.get("codec", "lzw")
+        if (op not in ("compress", "decompress") or codec not in CODECS):
+            self.metrics.record("error")
+            return {"status": "error", "message": "unknown op or codec"}, b""
+
+        shape = None
+        if (op == "compress"):
+            shape = header.get("shape")
+            if (not isinstance(shape, list) or len(shape) != 2 or
+                    not all(isinstance(n, int) and not isinstance(n, bool) and n > 0 for n in shape)):
+                self.metrics.record("error")
+                return {"status": "error", "message": "shape must be [heigth, length] with positive integers"}, b""
+            shape = tuple(shape)
+            if (len(payload) != shape[0] * shape[1]):
+                self.metrics.record("error")
+                return {"status": "error", "message": "payload does not match shape"}, b""
+
+        chunkSize = header.get("chunkSize")
+        if (chunkSize is not None and (not isinstance(chunkSize, int) or isinstance(chunkSize, bool) or chunkSize <= 0)):
+            self.metrics.record("error")
+            return {"status": "error", "message": "chunkSize must be a positive integer"}, b""
+
+        job = (op, codec, payload, shape, bool(header.get("vertical", False)), chunkSize)
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            self.metrics.record("busy")
+            return {"status": "busy", "message": "queue is full"}, b""
+
+        self.metrics.queueDepth = self._queue.qsize()
+        self.metrics.maxQueueDepth = max(self.metrics.maxQueueDepth, self.metrics.queueDepth)
+
+        try:
+            result, shape = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics.record("timeout")
+            return {"status": "timeout", "message": "request took more than %s seconds" % self.timeout}, b""
+        except Exception as e:
+            self.metrics.record("error")
+            return {"status": "error", "message": repr(e)}, b""
+
+        self.metrics.record("ok", time.perf_counter() - t1)
+        response = {"status": "ok"}
+        if (shape is not None):
+            response["shape"] = list(shape)
+        return response, result
+
+
+class ServiceError(Exception):
+    """
+    Raised by CompressionClient when the service does not answer with status "ok".
+    """
+
+    def __init__(self, status, message):
+        super().__init__("%s: %s" % (status, message))
+        self.status = status
+
+
+class CompressionClient:
+    """
+    Client of a CompressionService. One connection, requests are sent one at a time.
+
+    Use it as an async context manager, or call connect() and close().
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765):
+        """
+        Client constructor.
+
+        Parameters:
+            host (string): address of the service
+            port (int): port of the service
+        """
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+    async def _call(self, header, payload=b""):
+        await write_message(self._writer, header, payload)
+        response, result = await read_message(self._reader)
+        if (response["status"] != "ok"):
+            raise ServiceError(response["status"], response.get("message", ""))
+        return response, result
+
+
+    async def compress(self, image, codec="lzw", vertical=False, chunkSize=None):
+        """
+        Compresses an image.
+
+        Parameters:
+            image (2D array): image to be compressed (uint8)
+            codec (string): "lzw" or "rlehuff". Default: "lzw"
+            vertical (boolean): if True, predictive in vertical mode. Default: False
+            chunkSize (int): LZW chunk size. Default: the codec default
+
+        Returns:
+            bytes: compressed data
+        """
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        header = {"op": "compress", "codec": codec, "vertical": vertical, "shape": list(image.shape)}
+        if (chunkSize):
+            header["chunkSize"] = chunkSize
+        _, result = await self._call(header, image.tobytes())
+        return result
+
+
+    async def decompress(self, payload, codec="lzw", vertical=False):
+        """
+        Decompresses data given by compress(). Codec and vertical option must be the same as used when compressing.
+
+        Parameters:
+            payload (bytes): compressed data
+            codec (string): "lzw" or "rlehuff". Default: "lzw"
+            vertical (boolean): if True, predictive in vertical mode. Default: False
+
+        Returns:
+            2D array: decoded image (uint8)
+        """
+        response, result = await self._call({"op": "decompress", "codec": codec, "vertical": vertical}, payload)
+        return np.frombuffer(result, dtype=np.uint8).reshape(response["shape"])
+
+
+    async def metrics(self):
+        """
+        Returns:
+            dict: metrics of the service (see ServiceMetrics.snapshot())
+        """
+        _, result = await self._call({"op": "metrics"})
+        return json.loads(result.decode())
+
+
+if __name__ == '__main__':
+
+    # Runs the service on localhost:8765 until interrupted (Ctrl+C)
+
+    service = CompressionService(port=8765)
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        pass
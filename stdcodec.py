@@ -0,0 +1,185 @@
+"""
+
+module:: StdlibCodec
+    :synopsis: Fast codec. After the predictive transformation the residuals are compressed with zlib, lzma or bz2 from the standard
+    library, which are written in C (and release the GIL, so chunks can be compressed by threads).
+
+Several libs are imported here:
+    matplotlib
+    numpy
+    zlib, lzma, bz2
+    concurrent.futures (thread pool)
+    imageio
+    PredictiveTransform
+
+
+File format (big endian):
+    1 byte with the backend (see BACKENDS), 4 bytes heigth, 4 bytes length, 4 bytes number of chunks, 4 bytes with the size of each
+    chunk and then the compressed chunks.
+
+Each residual is stored as one byte (residual mod 256), which is enough since the predictive decoder works mod 256.
+
+"""
+
+import bz2
+import lzma
+import struct
+import zlib
+import numpy as np
+import matplotlib.image as mpimg
+import imageio
+from concurrent.futures import ThreadPoolExecutor
+from predictive import PredictiveTransform, check_image, check_residuals
+
+
+# backend name -> (id stored in the file, compress function (data, level), decompress function, default level)
+BACKENDS = {
+    "zlib": (0, lambda data, level: zlib.compress(data, level), zlib.decompress, 6),
+    "lzma": (1, lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 6),
+    "bz2":  (2, lambda data, level: bz2.compress(data, level), bz2.decompress, 9),
+}
+
+
+class StdlibCodec:
+    """
+    This codec makes a predictive transformation before encoding. zlib, lzma or bz2 are used to encode and decode afterwards.
+
+    Use only encode() and decode(), or compress() and decompress() in memory.
+    """
+
+    def __init__(self, backend="zlib", level=None, chunkRows=256, workers=None):
+        """
+        Codec constructor.
+
+        Parameters:
+            backend (string): "zlib", "lzma" or "bz2". Default: "zlib"
+            level (int): compression level of the backend. Default: None, the default level of the backend
+            chunkRows (int): number of rows of each chunk, compressed independently. Default: 256
+            workers (int): number of threads compressing or decompressing chunks. Default: None, one
+        """
+        assert backend in BACKENDS, "unknown backend " + repr(backend)
+        assert chunkRows > 0, "chunkRows must be positive"
+        self.backend = backend
+        self.level = BACKENDS[backend][3] if level is None else level
+        self.chunkRows = chunkRows
+        self.workers = workers
+
+
+    def _map(self, function, items):
+        if (self.workers and self.workers > 1 and len(items) > 1):
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                return list(pool.map(function, items))
+        return [function(item) for item in items]
+
+
+    def compress_residuals(self, data):
+        """
+        Encodes already transformed (predictive) residuals in memory.
+
+        Parameters:
+            data (2D array): residuals given by PredictiveTransform
+
+        Returns:
+            bytes: encoded data (see the file format)
+        """
+        check_residuals(data, "StdlibCodec")
+        heigth, length = data.shape
+        data = np.ascontiguousarray(data.astype(np.uint8))
+        backend_id, compress, _, _ = BACKENDS[self.backend]
+
+        chunks = [data[i:i + self.chunkRows].tobytes() for i in range(0, heigth, self.chunkRows)]
+        chunks = self._map(lambda chunk: compress(chunk, self.level), chunks)
+
+        header = struct.pack(">BIII", backend_id, heigth, length, len(chunks))
+        sizes = struct.pack(">%dI" % len(chunks), *[len(chunk) for chunk in chunks])
+
+        return header + sizes + b"".join(chunks)
+
+
+    def decompress_residuals(self, payload):
+        """
+        Decodes the output of compress_residuals() back to the residuals. The backend is read from the data.
+
+        Parameters:
+            payload (bytes): data given by compress_residuals()
+
+        Returns:
+            2D array: residuals (uint8, wrapped) to be given to PredictiveTransform
+        """
+        backend_id, heigth, length, count = struct.unpack(">BIII", payload[:13])
+        sizes = struct.unpack(">%dI" % count, payload[13:13 + 4 * count])
+        decompress = [b[2] for b in BACKENDS.values() if b[0] == backend_id][0]
+
+        chunks = []
+        offset = 13 + 4 * count
+        for size in sizes:
+            chunks.append(payload[offset:offset + size])
+            offset += size
+
+        chunks = self._map(decompress, chunks)
+
+        return np.frombuffer(b"".join(chunks), dtype=np.uint8).reshape(heigth, length)
+
+
+    def compress(self, data, vertical=False):
+        """
+        Transforms using PredictiveTransform and encodes a given image in memory.
+
+        Parameters:
+            data (2D array): image to be encoded (uint8)
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+
+        Returns:
+            bytes: encoded data (see the file format)
+        """
+        pt = PredictiveTransform()
+        return self.compress_residuals(pt.encode(check_image(data, "StdlibCodec"), vertical))
+
+
+    def decompress(self, payload, vertical=False):
+        """
+        Decodes the output of compress() back to the image, in memory.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            payload (bytes): data given by compress()
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+
+        Returns:
+            2D array: decoded image (uint8)
+        """
+        pt = PredictiveTransform()
+        return pt.decode(self.decompress_residuals(payload), vertical)
+
+
+    def encode(self, filein, fileout, vertical=False):
+        """
+        Transforms using PredictiveTransform and encodes a given file and outputs it in another file.
+
+        Parameters:
+            filein (string): file to be encoded (.bmp format)
+            fileout (string): file to be created as output
+            vertical (boolean): if True, calls Predictive in vertical mode. Default: False.
+        """
+        data = mpimg.imread(filein)
+
+        with open(fileout, "wb") as f:
+            f.write(self.compress(data, vertical))
+
+
+    def decode(self, filein, fileout, vertical=False):
+        """
+        Decodes a given file and outputs the decoded data into a .bmp (bitmap) file.
+
+        Vertical option must be the same as used when encoding.
+
+        Parameters:
+            filein (string): file to be decoded
+            fileout (string): file to be created and outputted (preferably .bmp format)
+            vertical (boolean): if True, calls predictive in Vertical mode. Default: False.
+        """
+        with open(filein, "rb") as f:
+            payload = f.read()
+
+        imageio.imwrite(fileout, self.decompress(payload, vertical))
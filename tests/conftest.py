@@ -0,0 +1,93 @@
+"""
+
+Shared helpers of the test suite: the repository root on sys.path (modules are imported as in main.py), edge-case images and
+random images for the property-style round trip tests.
+
+Run from the repository root: python -m pytest -q
+
+Tests marked "perf" measure time on this machine, so they are skipped unless PERF_TESTS=1 (or UPDATE_BASELINES=1) is set.
+
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+PERF = os.environ.get("PERF_TESTS") == "1" or os.environ.get("UPDATE_BASELINES") == "1"
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: measures time on this machine, run only with PERF_TESTS=1")
+
+
+def pytest_collection_modifyitems(config, items):
+    if (PERF):
+        return
+    skip = pytest.mark.skip(reason="timing test, set PERF_TESTS=1 to run it")
+    for item in items:
+        if ("perf" in item.keywords):
+            item.add_marker(skip)
+
+
+# images that broke (or could break) a codec: single pixels, runs at the very end, full-range residuals...
+EDGE_IMAGES = {
+    "single-pixel": np.array([[7]], dtype=np.uint8),
+    "single-pixel-zero": np.array([[0]], dtype=np.uint8),
+    "single-pixel-max": np.array([[255]], dtype=np.uint8),
+    "two-equal": np.array([[3, 3]], dtype=np.uint8),
+    "two-different": np.array([[3, 4]], dtype=np.uint8),
+    "one-column": np.arange(0, 250, 5, dtype=np.uint8).reshape(-1, 1),
+    "constant": np.full((20, 30), 9, dtype=np.uint8),
+    "run-of-2-at-end": np.array([[1, 2, 3, 5, 5]], dtype=np.uint8),
+    "run-of-3-at-end": np.array([[1, 2, 3, 5, 5, 5]], dtype=np.uint8),
+    "run-at-start": np.array([[4, 4, 4, 1, 2]], dtype=np.uint8),
+    "full-range": np.tile(np.array([[0, 255]], dtype=np.uint8), (10, 10)),
+    "full-range-vertical": np.tile(np.array([[0], [255]], dtype=np.uint8), (10, 10)),
+    "all-max": np.full((3, 3), 255, dtype=np.uint8),
+}
+
+
+def random_image(rng, maxSize=40):
+    """
+    A random image of a random kind: noise, smooth, runs, full range (0 and 255 only) or constant.
+
+    Parameters:
+        rng (np.random.RandomState): generator
+        maxSize (int): max heigth and length
+
+    Returns:
+        2D array: image (uint8)
+    """
+    shape = (rng.randint(1, maxSize + 1), rng.randint(1, maxSize + 1))
+    kind = rng.randint(5)
+
+    if (kind == 0):
+        data = rng.randint(0, 256, size=shape)
+    elif (kind == 1):
+        data = np.cumsum(rng.randint(-3, 4, size=shape), axis=1) % 256
+    elif (kind == 2):
+        values = rng.randint(0, 256, size=shape[0] * shape[1])
+        data = np.repeat(values, rng.randint(1, 12, size=len(values)))[:shape[0] * shape[1]].reshape(shape)
+    elif (kind == 3):
+        data = rng.choice([0, 255], size=shape)
+    else:
+        data = np.full(shape, rng.randint(0, 256))
+
+    return data.astype(np.uint8)
+
+
+def random_images(count, seed):
+    """
+    Parameters:
+        count (int): number of images
+        seed (int): seed, so a failure can be reproduced
+
+    Returns:
+        list: random images (see random_image())
+    """
+    rng = np.random.RandomState(seed)
+    return [random_image(rng) for _ in range(count)]
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import auto
+from auto import CODECS, AutoCodec
+from conftest import EDGE_IMAGES
+from estimator import estimate
+
+
+def _images():
+    rng = np.random.RandomState(30)
+    rows = np.cumsum(rng.randint(-2, 3, size=(60, 80)), axis=1) % 256
+    return {
+        # smooth along the rows (horizontal wins) and along the columns (vertical wins)
+        False: rows.astype(np.uint8),
+        True: rows.T.copy().astype(np.uint8),
+    }
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("codec", CODECS)
+def test_tags(codec, vertical):
+    image = _images()[vertical]
+    auto_codec = AutoCodec(codecs=(codec,), workers=1)
+    payload = auto_codec.compress(image)
+
+    assert payload[0] == CODECS.index(codec) * 2 + int(vertical)
+    assert auto_codec.read_tag(payload) == (codec, vertical)
+    # the tag is enough to decode, whatever the codecs of the decoder
+    np.testing.assert_array_equal(AutoCodec().decompress(payload), image)
+
+
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_edge_images(name):
+    auto_codec = AutoCodec(codecs=CODECS, workers=1)
+    image = EDGE_IMAGES[name]
+    np.testing.assert_array_equal(auto_codec.decompress(auto_codec.compress(image)), image)
+
+
+def test_smallest_candidate():
+    image = _images()[True]
+    payload = AutoCodec(codecs=CODECS, workers=1).compress(image)
+    for codec in CODECS:
+        assert len(payload) <= len(AutoCodec(codecs=(codec,), workers=1).compress(image))
+
+
+def test_time_budget():
+    image = _images()[True]
+    # without workers, the first candidate is always kept
+    payload = AutoCodec(workers=1, timeBudget=0).compress(image)
+    assert AutoCodec().read_tag(payload) == ("lzw", False)
+    np.testing.assert_array_equal(AutoCodec().decompress(payload), image)
+
+
+def test_workers(monkeypatch):
+    monkeypatch.setattr(auto, "PARALLEL_PIXELS", 1000)
+    image = _images()[True]
+    expected = AutoCodec(workers=1).compress(image)
+
+    with AutoCodec(workers=2) as auto_codec:
+        assert auto_codec.compress(image) == expected
+        # the worker processes are kept for the next image
+        pool = auto_codec._pool
+        assert pool is not None
+        assert auto_codec.compress(image) == expected
+        assert auto_codec._pool is pool
+    assert auto_codec._pool is None
+
+    # small images do not start the workers
+    with AutoCodec(workers=2) as auto_codec:
+        auto_codec.compress(EDGE_IMAGES["constant"])
+        assert auto_codec._pool is None
+
+
+def test_time_budget_workers(monkeypatch):
+    monkeypatch.setattr(auto, "PARALLEL_PIXELS", 1000)
+    image = np.random.RandomState(31).randint(0, 256, size=(300, 300)).astype(np.uint8)
+
+    with AutoCodec(codecs=CODECS, workers=2, timeBudget=0) as auto_codec:
+        payload = auto_codec.compress(image)
+        np.testing.assert_array_equal(auto_codec.decompress(payload), image)
+        # the same pool is used after the budget ran out
+        pool = auto_codec._pool
+        processes = list(pool._processes.values())
+        np.testing.assert_array_equal(auto_codec.decompress(auto_codec.compress(image)), image)
+        assert auto_codec._pool is pool
+
+    # close() waits for the workers
+    assert all(not process.is_alive() for process in processes)
+
+
+def test_rejects_wider_images():
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        AutoCodec(workers=1).compress(_images()[False].astype(np.uint16) * 100)
+
+
+def test_estimator():
+    image = _images()[True]
+    codec, vertical, _ = estimate(image)["best"]
+
+    auto_codec = AutoCodec(workers=1, useEstimator=True)
+    assert auto_codec.candidates(image) == [(codec, vertical)]
+    payload = auto_codec.compress(image)
+    assert auto_codec.read_tag(payload) == (codec, vertical)
+    np.testing.assert_array_equal(auto_codec.decompress(payload), image)
+
+    # when the best codec is not a candidate, every candidate is tried
+    others = tuple(c for c in CODECS if c != codec)
+    assert len(AutoCodec(codecs=others, useEstimator=True).candidates(image)) == 2 * len(others)
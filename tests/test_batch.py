@@ -0,0 +1,95 @@
+import os
+import time
+
+import imageio
+import numpy as np
+import pytest
+
+from batch import CODECS, BatchProcessor, BatchReport, _busy_time, _overlap_time
+from conftest import random_images
+
+
+def _write_images(directory, count=5):
+    os.makedirs(directory, exist_ok=True)
+    images = random_images(count, seed=34)
+    names = []
+    for i, image in enumerate(images):
+        names.append(os.path.join(directory, "image%d.bmp" % i))
+        imageio.imwrite(names[-1], image)
+    return images, names
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_files(tmp_path, codec):
+    images, names = _write_images(str(tmp_path / "in"))
+    encoded = [str(tmp_path / ("image%d.%s" % (i, codec))) for i in range(len(names))]
+    decoded = [str(tmp_path / ("decoded%d.bmp" % i)) for i in range(len(names))]
+
+    processor = BatchProcessor(codec, prefetch=1, inFlight=1, readThreads=2, writeThreads=2)
+    report = processor.compress_files(names, encoded, vertical=True)
+    summary = report.summary()
+    assert summary["files"] == len(names)
+    assert summary["bytesRead"] == sum(os.path.getsize(name) for name in names)
+    assert summary["bytesWritten"] == sum(os.path.getsize(name) for name in encoded)
+    assert len(report.reads) == len(report.computes) == len(report.writes) == len(names)
+
+    summary = processor.decompress_files(encoded, decoded, vertical=True).summary()
+    assert summary["bytesRead"] == sum(os.path.getsize(name) for name in encoded)
+    assert summary["bytesWritten"] == sum(os.path.getsize(name) for name in decoded)
+    for name, image in zip(decoded, images):
+        np.testing.assert_array_equal(imageio.v2.imread(name), image)
+
+
+def test_directories(tmp_path):
+    images, _ = _write_images(str(tmp_path / "in"))
+    processor = BatchProcessor("zlib")
+    assert processor.compress_directory(str(tmp_path / "in"), str(tmp_path / "enc")).files == len(images)
+    assert sorted(os.listdir(tmp_path / "enc")) == ["image%d.zlib" % i for i in range(len(images))]
+
+    processor.decompress_directory(str(tmp_path / "enc"), str(tmp_path / "out"))
+    for i, image in enumerate(images):
+        np.testing.assert_array_equal(imageio.v2.imread(tmp_path / "out" / ("image%d.bmp" % i)), image)
+
+
+def test_overlap():
+    assert _busy_time([(3, 4), (0, 2), (1, 2.5)]) == [[0, 2.5], [3, 4]]
+    assert _overlap_time([(0, 2), (3, 5)], [(1, 4)]) == pytest.approx(2)
+    assert _overlap_time([(0, 1)], [(1, 2)]) == 0
+
+    report = BatchReport()
+    report.record("read", 0, 2, size=10)
+    report.record("compute", 1, 5)
+    report.record("write", 4, 6, size=3)
+    report.record("read", 4.5, 5.5, size=10)
+    summary = report.summary()
+    assert summary["bytesRead"] == 20 and summary["bytesWritten"] == 3
+    assert summary["read"] == pytest.approx(3)
+    assert summary["compute"] == pytest.approx(4)
+    assert summary["write"] == pytest.approx(2)
+    # I/O is busy during [0, 2] and [4, 6], compute during [1, 5]
+    assert summary["io"] == pytest.approx(4)
+    assert summary["overlap"] == pytest.approx(2)
+    assert summary["hiddenIO"] == pytest.approx(0.5)
+    assert BatchReport().summary()["hiddenIO"] == 0.0
+
+
+def test_io_hidden_behind_compute(tmp_path):
+    # slow reads and writes run while the next files are encoded
+    def read(name):
+        time.sleep(0.02)
+        return name, 1
+
+    def compute(data):
+        time.sleep(0.02)
+        return data
+
+    def write(output, name):
+        time.sleep(0.02)
+        return 1
+
+    names = ["file%d" % i for i in range(8)]
+    report = BatchProcessor(prefetch=2, inFlight=2)._run(names, names, read, compute, write)
+    summary = report.summary()
+    assert summary["files"] == 8
+    assert summary["hiddenIO"] > 0.5
+    assert summary["wall"] < summary["read"] + summary["compute"] + summary["write"]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from conftest import EDGE_IMAGES, random_images
+from contextcodec import ContextHuffmanCodec, activity
+from predictive import PredictiveTransform
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_edge_images(name, vertical):
+    codec = ContextHuffmanCodec()
+    image = EDGE_IMAGES[name]
+    decoded = codec.decompress(codec.compress(image, vertical), vertical)
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, image)
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (1, 37), (41, 1)])
+def test_round_trip_lines(shape):
+    codec = ContextHuffmanCodec()
+    image = np.random.RandomState(32).randint(0, 256, size=shape).astype(np.uint8)
+    for vertical in (False, True):
+        np.testing.assert_array_equal(codec.decompress(codec.compress(image, vertical), vertical), image)
+
+
+def test_round_trip_random_images():
+    codec = ContextHuffmanCodec(thresholds=(1, 40))
+    for image in random_images(10, seed=33):
+        np.testing.assert_array_equal(codec.decompress(codec.compress(image)), image)
+
+
+def test_empty_contexts():
+    # every residual of a black image is 0, so every context but the first one has no symbols
+    image = np.zeros((20, 30), dtype=np.uint8)
+    enc, js = ContextHuffmanCodec().encode_residuals(PredictiveTransform().encode(image))
+    assert js["tables"][0] != {}
+    assert all(table == {} for table in js["tables"][1:])
+    assert js["sizes"][1:] == [0] * (len(js["sizes"]) - 1)
+
+    codec = ContextHuffmanCodec()
+    np.testing.assert_array_equal(codec.decompress(codec.compress(image)), image)
+
+    # a context in the middle with no symbols
+    image = np.tile(np.array([0, 100], dtype=np.uint8), (10, 10))
+    codec = ContextHuffmanCodec(thresholds=(0, 2, 6, 16, 150))
+    enc, js = codec.encode_residuals(PredictiveTransform().encode(image))
+    assert js["tables"][2] == {}
+    np.testing.assert_array_equal(codec.decompress(codec.compress(image)), image)
+
+
+def test_activity():
+    residuals = np.array([[1, -2], [-3, 4]])
+    np.testing.assert_array_equal(activity(residuals), [[0, 1], [1, 5]])
+
+
+def test_rejects_wider_images():
+    image = np.random.RandomState(36).randint(0, 4096, size=(10, 12)).astype(np.uint16)
+    codec = ContextHuffmanCodec()
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        codec.compress(image)
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        codec.encode_residuals(PredictiveTransform().encode(image))
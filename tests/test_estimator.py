@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from estimator import SAMPLE_FRACTION, estimate, run_statistics
+from lzw import LZWCodec
+from rlehuff import RLEHuffmanCodec
+
+
+def _images():
+    rng = np.random.RandomState(16)
+    return {
+        "smooth": (np.cumsum(rng.randint(-3, 4, size=(256, 256)), axis=1) % 256).astype(np.uint8),
+        "noise": rng.randint(0, 256, size=(256, 256)).astype(np.uint8),
+        "runs": np.repeat(rng.randint(0, 6, size=9000), rng.randint(1, 20, size=9000))[:300 * 200].reshape(300, 200).astype(np.uint8),
+    }
+
+
+@pytest.mark.parametrize("name", sorted(_images()))
+def test_estimate_against_real_sizes(name):
+    image = _images()[name]
+    result = estimate(image)
+
+    for direction, vertical in (("horizontal", False), ("vertical", True)):
+        lzw = len(LZWCodec().compress(image, vertical=vertical))
+        rle = len(RLEHuffmanCodec().compress(image, vertical))
+        assert result[direction]["lzwBytes"] == pytest.approx(lzw, rel=0.15)
+        # the JSON table is not part of the estimate
+        assert result[direction]["rleHuffmanBytes"] == pytest.approx(rle, rel=0.25)
+
+
+def test_estimate_samples_a_fraction(monkeypatch):
+    # LZW only sees a few short windows: count the symbols it is given
+    encoded = []
+    encode_LZW = LZWCodec.encode_LZW
+
+    def counting(self, data):
+        encoded.append(len(data))
+        return encode_LZW(self, data)
+
+    monkeypatch.setattr(LZWCodec, "encode_LZW", counting)
+    rng = np.random.RandomState(38)
+    image = (np.cumsum(rng.randint(-3, 4, size=(512, 512)), axis=1) % 256).astype(np.uint8)
+
+    estimate(image)
+    # two directions, 3 windows (5% of the pixels) each, every window and its first half
+    assert encoded == [4096, 2048] * 6
+    assert sum(encoded) <= 2 * 1.5 * SAMPLE_FRACTION * image.size
+
+    # "samples" caps the windows
+    encoded.clear()
+    estimate(image, samples=2)
+    assert len(encoded) == 2 * 2 * 2
+
+
+def test_run_statistics():
+    values, lengths = run_statistics(np.array([1, 1, 2, 3, 3, 3]))
+    np.testing.assert_array_equal(values, [1, 2, 3])
+    np.testing.assert_array_equal(lengths, [2, 1, 3])
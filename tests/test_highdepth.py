@@ -0,0 +1,80 @@
+import imageio
+import numpy as np
+import pytest
+
+from conftest import EDGE_IMAGES
+from highdepth import HighDepthCodec, join_residuals, split_residuals
+from lzw import LZWCodec
+from predictive import PredictiveTransform
+from rlehuff import RLEHuffmanCodec
+
+
+def _images():
+    rng = np.random.RandomState(24)
+    return {
+        "noise16": rng.randint(0, 65536, size=(40, 50)).astype(np.uint16),
+        "smooth12": (np.cumsum(rng.randint(-20, 21, size=(60, 70)), axis=1) % 4096).astype(np.uint16),
+        "extremes": np.array([[0, 65535, 0], [65535, 0, 65535]], dtype=np.uint16),
+        "single": np.array([[40000]], dtype=np.uint16),
+    }
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("coder", ["huffman", "lzw"])
+@pytest.mark.parametrize("name", sorted(_images()))
+def test_round_trip(name, coder, vertical):
+    codec = HighDepthCodec(coder=coder, chunkSize=1000)
+    image = _images()[name]
+    decoded = codec.decompress(codec.compress(image, vertical), vertical)
+    assert decoded.dtype == np.uint16
+    np.testing.assert_array_equal(decoded, image)
+
+
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_8_bit(name):
+    codec = HighDepthCodec()
+    image = EDGE_IMAGES[name]
+    np.testing.assert_array_equal(codec.decompress(codec.compress(image)), image)
+
+
+def test_split_join_residuals():
+    data = np.arange(-32768, 32768)
+    classes, raw = split_residuals(data)
+    assert classes.min() == 0 and classes.max() == 16
+    np.testing.assert_array_equal(join_residuals(classes, raw), data)
+    # wider values are wrapped to 16 bits
+    np.testing.assert_array_equal(join_residuals(*split_residuals(np.array([65535, 65536, -65537]))), [-1, 0, -1])
+
+
+def test_files(tmp_path):
+    image = _images()["smooth12"]
+    imageio.imwrite(tmp_path / "image.png", image)
+
+    codec = HighDepthCodec()
+    codec.encode(tmp_path / "image.png", tmp_path / "image.hd")
+    codec.decode(tmp_path / "image.hd", tmp_path / "decoded.png")
+
+    np.testing.assert_array_equal(imageio.v2.imread(tmp_path / "decoded.png"), image)
+
+
+@pytest.mark.parametrize("codec", [LZWCodec(), RLEHuffmanCodec()])
+def test_8_bit_codecs_reject_wider_images(codec):
+    image = _images()["noise16"]
+    residuals = PredictiveTransform().encode(image)
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        codec.compress(image)
+    # the other codecs go through the residuals
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        codec.compress_residuals(residuals)
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        codec.encode_residuals(residuals)
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        codec.encode_residuals(np.array([[0, 256]]))
+
+
+@pytest.mark.parametrize("codec", [LZWCodec(), RLEHuffmanCodec()])
+def test_8_bit_codecs_take_8_bit_residuals(codec):
+    # the extremes of uint8 residuals, signed or wrapped
+    for residuals in (np.array([[-255, 255, 0]], dtype=np.int16), np.array([[0, 255, 1]], dtype=np.uint8)):
+        decoded = codec.decompress_residuals(codec.compress_residuals(residuals)).astype(np.int32)
+        np.testing.assert_array_equal(decoded % 256, residuals.astype(np.int32) % 256)
@@ -0,0 +1,85 @@
+import pickle
+import random
+
+import pytest
+
+from huffmancodec import HuffmanCodec, PrefixCodec
+
+
+def random_data(seed):
+    rng = random.Random(seed)
+    return [
+        "",
+        "a",
+        "aaaa",
+        "".join(rng.choice("aaaaaabbbcdefgh") for _ in range(rng.randint(1, 2000))),
+        bytes(rng.randrange(256) for _ in range(rng.randint(1, 2000))),
+        [rng.randint(-300, 300) for _ in range(rng.randint(1, 2000))],
+        [str(rng.randint(-20, 20)) for _ in range(rng.randint(1, 2000))] + ["#", "*"],
+    ]
+
+
+def assert_prefix_code(table):
+    codes = [bin(v)[2:].rjust(b, "0") for b, v in table.values()]
+    for a in codes:
+        for b in codes:
+            assert a is b or not b.startswith(a)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_round_trip(seed):
+    for data in random_data(seed)[1:]:
+        codec = HuffmanCodec.from_data(data)
+        assert_prefix_code(codec.get_code_table())
+        assert codec.decode(codec.encode(data)) == data
+
+
+def test_empty():
+    codec = HuffmanCodec.from_data("abc")
+    assert codec.encode("") == b""
+    assert codec.decode(b"") == ""
+
+
+@pytest.mark.parametrize("interleave", [False, True])
+@pytest.mark.parametrize("streams", [1, 3, 8])
+def test_streams(streams, interleave):
+    for data in random_data(streams)[3:]:
+        codec = HuffmanCodec.from_data(data)
+        assert codec.decode_streams(codec.encode_streams(data, streams, interleave)) == data
+
+
+@pytest.mark.parametrize("lut_bits", [0, 3, 12])
+@pytest.mark.parametrize("seed", range(3))
+def test_save_load(tmp_path, seed, lut_bits):
+    for i, data in enumerate(random_data(seed)[1:]):
+        codec = HuffmanCodec.from_data(data)
+        encoded = codec.encode(data)
+        codec.save(tmp_path / ("%d.table" % i), metadata={"seed": seed}, lut_bits=lut_bits)
+
+        loaded = PrefixCodec.load(tmp_path / ("%d.table" % i))
+        assert isinstance(loaded, HuffmanCodec)
+        assert dict(loaded.get_code_table().items()) == codec.get_code_table()
+        assert loaded.decode(encoded) == data
+        assert loaded.encode(data) == encoded
+
+
+def test_save_load_custom_eof(tmp_path):
+    frequencies = {i: 2**max(0, 30 - i) for i in range(40)}
+    codec = HuffmanCodec.from_frequencies(frequencies, eof=-1)
+    data = list(range(40)) * 3
+    codec.save(tmp_path / "table", lut_bits=8)
+
+    loaded = PrefixCodec.load(tmp_path / "table")
+    assert loaded.decode(codec.encode(data)) == data
+    # the table is pickled by path, for worker processes
+    table = pickle.loads(pickle.dumps(loaded.get_code_table()))
+    assert table[5] == codec.get_code_table()[5]
+
+
+def test_load_refuses_pickle(tmp_path):
+    with open(tmp_path / "old.table", "wb") as f:
+        pickle.dump({"code_table": {"a": (1, 0)}, "type": PrefixCodec, "concat": list}, f)
+
+    with pytest.raises(ValueError):
+        PrefixCodec.load(tmp_path / "old.table")
+    assert PrefixCodec.load(tmp_path / "old.table", allow_pickle=True).get_code_table() == {"a": (1, 0)}
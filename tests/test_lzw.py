@@ -0,0 +1,115 @@
+import imageio
+import numpy as np
+import pytest
+
+from conftest import EDGE_IMAGES, random_images
+from lzw import LZWCodec, POLICIES
+from lzwdict import PrimedDictionary
+from predictive import PredictiveTransform
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_edge_images(name, vertical):
+    codec = LZWCodec()
+    image = EDGE_IMAGES[name]
+    decoded = codec.decompress(codec.compress(image, vertical=vertical), vertical)
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, image)
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+def test_round_trip_random_images(vertical):
+    codec = LZWCodec()
+    for image in random_images(30, seed=9):
+        np.testing.assert_array_equal(codec.decompress(codec.compress(image, chunkSize=257, vertical=vertical), vertical), image)
+
+
+@pytest.mark.parametrize("policy", POLICIES)
+def test_policies(policy):
+    # noise fills the dictionary, so every policy has to do something
+    rng = np.random.RandomState(10)
+    data = rng.randint(0, 511, size=120000)
+
+    codec = LZWCodec(policy=policy)
+    codes = codec.encode_LZW(data)
+    assert codes[-1] == 2**16 - 1
+    assert codec.decoded_length(codes, 16) == len(data)
+    np.testing.assert_array_equal(codec.decode_LZW(codes, 16), data)
+
+
+def test_reset_policy():
+    # residuals of a smooth image (few symbols, long strings) fill the dictionary, then noise makes the ratio fall
+    rng = np.random.RandomState(37)
+    data = np.concatenate([rng.randint(247, 263, size=250000), rng.randint(0, 511, size=40000)])
+
+    codec = LZWCodec(policy="reset")
+    codes = codec.encode_LZW(data)
+    resets = np.flatnonzero(codes == 2**16 - 1)
+    assert len(resets) >= 2
+    assert resets[-1] == len(codes) - 1
+    # the dictionary (512 single symbols at first) was full before the first reset
+    assert resets[0] > 2**16 - 1 - 512
+    np.testing.assert_array_equal(codec.decode_LZW(codes, 16), data)
+    np.testing.assert_array_equal(LZWCodec().decode_LZW(codes, 16), data)
+
+    # the other policies never reset in the middle of a chunk
+    assert np.count_nonzero(LZWCodec().encode_LZW(data) == 2**16 - 1) == 1
+
+
+def test_max_memory():
+    rng = np.random.RandomState(11)
+    image = (np.cumsum(rng.randint(-2, 3, size=(300, 400)), axis=1) % 256).astype(np.uint8)
+
+    # a budget which fits leaves the output as it is, a tiny one makes smaller chunks which decode the same
+    assert LZWCodec(maxMemory="1G").compress(image) == LZWCodec().compress(image)
+    payload = LZWCodec(maxMemory=1).compress(image)
+    np.testing.assert_array_equal(LZWCodec().decompress(payload), image)
+
+
+def test_files(tmp_path):
+    image = random_images(1, seed=12)[0]
+    imageio.imwrite(tmp_path / "image.bmp", image)
+
+    codec = LZWCodec()
+    codec.encode(tmp_path / "image.bmp", tmp_path / "image.lzw", 1000, vertical=True)
+    codec.decode(tmp_path / "image.lzw.npy", tmp_path / "decoded.bmp", vertical=True)
+
+    np.testing.assert_array_equal(imageio.v2.imread(tmp_path / "decoded.bmp"), image)
+
+
+@pytest.mark.parametrize("policy", POLICIES)
+def test_policy_stored_in_stream(policy):
+    # the decoder does not need to be given the policy
+    rng = np.random.RandomState(21)
+    image = rng.randint(0, 256, size=(300, 400)).astype(np.uint8)
+
+    payload = LZWCodec(policy=policy).compress(image, chunkSize=120000)
+    np.testing.assert_array_equal(LZWCodec().decompress(payload), image)
+    np.testing.assert_array_equal(LZWCodec(policy="lfu").decompress(payload), image)
+
+
+def _workers_images():
+    # (image, chunk size, vertical): the noise fills the dictionary, so the policy is used
+    rng = np.random.RandomState(25)
+    smooth = (np.cumsum(rng.randint(-2, 3, size=(200, 300)), axis=1) % 256).astype(np.uint8)
+    noise = rng.randint(0, 256, size=(300, 400)).astype(np.uint8)
+    return [(smooth, 7000, False), (smooth, 7000, True), (noise, 100000, False), (EDGE_IMAGES["single-pixel"], 7000, False)]
+
+
+@pytest.mark.parametrize("options", [{}, {"policy": "lru"}, {"primed": True}, {"primed": True, "policy": "lfu"}])
+def test_workers(options):
+    # the shared-memory workers give the same bytes as this process, and decode them the same
+    options = dict(options)
+    images = _workers_images()
+    if (options.pop("primed", False)):
+        pt = PredictiveTransform()
+        options["dictionary"] = PrimedDictionary.from_corpus([pt.encode(images[0][0][:50])], maxEntries=300)
+    codec = LZWCodec(**options)
+
+    for image, chunkSize, vertical in images:
+        payload = codec.compress(image, chunkSize, vertical)
+        for workers in (1, 3):
+            assert codec.compress(image, chunkSize, vertical, workers=workers) == payload
+            np.testing.assert_array_equal(codec.decompress(payload, vertical, workers=workers), image)
+        np.testing.assert_array_equal(codec.decompress(payload, vertical), image)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from lzw import LZWCodec
+from lzwdict import PrimedDictionary
+from predictive import PredictiveTransform
+
+
+def _images(count, seed):
+    rng = np.random.RandomState(seed)
+    return [(np.cumsum(rng.randint(-1, 2, size=(60, 80)), axis=1) % 256).astype(np.uint8) for _ in range(count)]
+
+
+@pytest.fixture
+def dictionary():
+    pt = PredictiveTransform()
+    return PrimedDictionary.from_corpus([pt.encode(image) for image in _images(4, seed=17)], maxEntries=500)
+
+
+def test_from_corpus(dictionary):
+    assert 0 < len(dictionary) <= 500
+    entries = set(dictionary.entries)
+    for position, entry in enumerate(dictionary.entries):
+        assert len(entry) >= 2
+        # every prefix is an entry and comes first
+        if (len(entry) > 2):
+            assert entry[:-1] in entries
+            assert dictionary.entries.index(entry[:-1]) < position
+
+
+def test_id_depends_on_entries(dictionary):
+    assert PrimedDictionary(dictionary.entries).id == dictionary.id
+    assert PrimedDictionary(dictionary.entries[:-1]).id != dictionary.id
+
+
+def test_save_load(tmp_path, dictionary):
+    id = dictionary.save(tmp_path)
+    assert id == dictionary.id
+    loaded = PrimedDictionary.load(id, tmp_path)
+    assert loaded.entries == dictionary.entries
+
+
+def test_primed_round_trip(dictionary):
+    codec = LZWCodec(dictionary=dictionary)
+    for image in _images(3, seed=18):
+        payload = codec.compress(image, chunkSize=1000)
+        assert len(payload) < len(LZWCodec().compress(image, chunkSize=1000))
+        np.testing.assert_array_equal(codec.decompress(payload), image)
+
+
+def test_dictionary_loaded_from_stream(tmp_path, monkeypatch, dictionary):
+    image = _images(1, seed=19)[0]
+    payload = LZWCodec(dictionary=dictionary).compress(image)
+
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match=dictionary.id):
+        LZWCodec().decompress(payload)
+
+    dictionary.save()
+    np.testing.assert_array_equal(LZWCodec().decompress(payload), image)
+
+
+def test_wrong_dictionary(dictionary):
+    image = _images(1, seed=20)[0]
+    other = PrimedDictionary(dictionary.entries[:-1])
+
+    with pytest.raises(ValueError, match="dictionary"):
+        LZWCodec(dictionary=other).decompress(LZWCodec(dictionary=dictionary).compress(image))
+    with pytest.raises(ValueError, match="dictionary"):
+        LZWCodec(dictionary=dictionary).decompress(LZWCodec().compress(image))
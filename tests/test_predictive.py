@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from conftest import EDGE_IMAGES, random_images
+from predictive import PredictiveTransform
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_edge_images(name, vertical):
+    pt = PredictiveTransform()
+    image = EDGE_IMAGES[name]
+    decoded = pt.decode(pt.encode(image, vertical), vertical)
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, image)
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+def test_round_trip_random_images(vertical):
+    pt = PredictiveTransform()
+    for image in random_images(50, seed=1):
+        np.testing.assert_array_equal(pt.decode(pt.encode(image, vertical), vertical), image)
+
+
+def test_residuals():
+    pt = PredictiveTransform()
+    image = np.array([[10, 12, 9], [0, 255, 0]], dtype=np.uint8)
+
+    horizontal = pt.encode(image)
+    assert horizontal.dtype == np.int16
+    np.testing.assert_array_equal(horizontal, [[10, 2, -3], [0, 255, -255]])
+
+    vertical = pt.encode(image, vertical=True)
+    np.testing.assert_array_equal(vertical, [[10, 12, 9], [-10, 243, -9]])
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+def test_wrapped_residuals(vertical):
+    # LZW gives the residuals back as uint8 (mod 256), decoding must not care
+    pt = PredictiveTransform()
+    for image in random_images(20, seed=2):
+        residuals = pt.encode(image, vertical)
+        np.testing.assert_array_equal(pt.decode(residuals.astype(np.uint8), vertical), image)
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+def test_high_bit_depth(vertical):
+    pt = PredictiveTransform()
+    rng = np.random.RandomState(3)
+    image = rng.randint(0, 2**16, size=(17, 23)).astype(np.uint16)
+
+    residuals = pt.encode(image, vertical)
+    assert residuals.dtype == np.int32
+    np.testing.assert_array_equal(pt.decode(residuals, vertical, dtype="uint16"), image)
@@ -0,0 +1,73 @@
+import imageio
+import numpy as np
+import pytest
+
+from conftest import EDGE_IMAGES
+from progressive import ProgressiveCodec
+from stdcodec import BACKENDS
+
+
+def _image():
+    rng = np.random.RandomState(29)
+    return (np.cumsum(rng.randint(-3, 4, size=(75, 102)), axis=1) % 256).astype(np.uint8)
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_levels(backend, vertical):
+    image = _image()
+    codec = ProgressiveCodec(levels=3, backend=backend)
+    payload = codec.compress(image, vertical)
+    header, offset = codec.read_header(payload)
+    assert len(header["sizes"]) == 4
+
+    np.testing.assert_array_equal(codec.decompress(payload), image)
+    for level in range(4):
+        # a level only needs the beginning of the data
+        end = offset + sum(header["sizes"][:level + 1])
+        step = 2 ** (3 - level)
+        np.testing.assert_array_equal(codec.decompress(payload[:end], level), image[::step, ::step])
+    np.testing.assert_array_equal(codec.decompress(payload, 10), image)
+
+
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_edge_images(name):
+    codec = ProgressiveCodec()
+    image = EDGE_IMAGES[name]
+    np.testing.assert_array_equal(codec.decompress(codec.compress(image)), image)
+
+
+def test_read_level(tmp_path):
+    image = _image()
+    codec = ProgressiveCodec(levels=3)
+    payload = codec.compress(image)
+    header, offset = codec.read_header(payload)
+    (tmp_path / "image.prog").write_bytes(payload)
+
+    for level in range(4):
+        data, read = codec.read_level(tmp_path / "image.prog", level)
+        assert read == level
+        assert data == payload[:offset + sum(header["sizes"][:level + 1])]
+
+    # widths are 13, 26, 51 and 102
+    assert codec.read_level(tmp_path / "image.prog", maxSize=20)[1] == 1
+    assert codec.read_level(tmp_path / "image.prog", maxSize=51)[1] == 2
+    assert codec.read_level(tmp_path / "image.prog", maxSize=1000)[1] == 3
+    assert codec.read_level(tmp_path / "image.prog")[0] == payload
+
+
+def test_preview_and_files(tmp_path):
+    image = _image()
+    codec = ProgressiveCodec(levels=3)
+    (tmp_path / "image.prog").write_bytes(codec.compress(image, vertical=True))
+
+    np.testing.assert_array_equal(codec.preview(tmp_path / "image.prog", maxSize=40), image[::2, ::2])
+    np.testing.assert_array_equal(codec.preview(tmp_path / "image.prog"), image)
+
+    codec.decode(tmp_path / "image.prog", tmp_path / "level1.bmp", level=1)
+    np.testing.assert_array_equal(imageio.v2.imread(tmp_path / "level1.bmp"), image[::4, ::4])
+
+
+def test_rejects_wider_images():
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        ProgressiveCodec().compress(_image().astype(np.uint16) * 100)
@@ -0,0 +1,107 @@
+import imageio
+import numpy as np
+import pytest
+
+import huffmancodec
+import rlehuff
+from conftest import EDGE_IMAGES, random_images
+from rlehuff import RLEHuffmanCodec
+
+
+@pytest.mark.parametrize("data, expected", [
+    ([7], "7"),
+    ([3, 3], "2*3"),
+    ([3, 4], "3#4"),
+    ([5, 5, 5, 5], "4*5"),
+    ([1, 2, 2], "1#2#2"),
+    ([1, 2, 2, 2], "1#3*2"),
+    ([4, 4, 4, 1, 2], "3*4#1#2"),
+])
+def test_rle_encode(data, expected):
+    assert RLEHuffmanCodec().rle_encode(data) == expected
+
+
+def test_rle_round_trip_random():
+    codec = RLEHuffmanCodec()
+    rng = np.random.RandomState(4)
+    for _ in range(300):
+        # runs of 1 to 5 of a few values, so every run length shows up at the very end too
+        values = rng.randint(-3, 4, size=rng.randint(1, 30))
+        data = np.repeat(values, rng.randint(1, 6, size=len(values))).tolist()
+        assert codec.rle_decode(codec.rle_encode(data)) == [str(x) for x in data]
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_edge_images(name, vertical):
+    codec = RLEHuffmanCodec()
+    image = EDGE_IMAGES[name]
+    decoded = codec.decompress(codec.compress(image, vertical), vertical)
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, image)
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+def test_round_trip_random_images(vertical):
+    codec = RLEHuffmanCodec()
+    for image in random_images(30, seed=5):
+        np.testing.assert_array_equal(codec.decompress(codec.compress(image, vertical), vertical), image)
+
+
+@pytest.mark.parametrize("options", [
+    {"streams": 4},
+    {"blockSize": 50},
+    {"maxMemory": 1},
+])
+def test_round_trip_options(options):
+    # options are stored in the table, a plain codec decodes them
+    rng = np.random.RandomState(6)
+    image = (np.cumsum(rng.randint(-2, 3, size=(300, 400)), axis=1) % 256).astype(np.uint8)
+    payload = RLEHuffmanCodec(**options).compress(image)
+    np.testing.assert_array_equal(RLEHuffmanCodec().decompress(payload), image)
+
+
+def test_streaming_decode():
+    # encoded as a whole, decoded in a budget too small for it
+    image = random_images(1, seed=7)[0]
+    image = np.tile(image, (8, 8))
+    payload = RLEHuffmanCodec().compress(image)
+    np.testing.assert_array_equal(RLEHuffmanCodec(maxMemory=1).decompress(payload), image)
+
+
+def test_files(tmp_path):
+    image = random_images(1, seed=8)[0]
+    imageio.imwrite(tmp_path / "image.bmp", image)
+
+    codec = RLEHuffmanCodec()
+    codec.encode(tmp_path / "image.bmp", tmp_path / "image.rlehuff", tmp_path / "image.json", vertical=True)
+    codec.decode(tmp_path / "image.rlehuff", tmp_path / "decoded.bmp", tmp_path / "image.json", vertical=True)
+
+    np.testing.assert_array_equal(imageio.v2.imread(tmp_path / "decoded.bmp"), image)
+
+
+@pytest.mark.parametrize("options", [{"streams": 4}, {"blockSize": 500}])
+def test_workers(monkeypatch, options):
+    # small data is decoded in this process, the workers only start above PARALLEL_BYTES
+    pools = []
+    for module in (huffmancodec, rlehuff):
+        executor = module.ProcessPoolExecutor
+
+        def counting(*args, executor=executor, **kwargs):
+            pools.append(args)
+            return executor(*args, **kwargs)
+
+        monkeypatch.setattr(module, "ProcessPoolExecutor", counting)
+
+    rng = np.random.RandomState(39)
+    image = (np.cumsum(rng.randint(-3, 4, size=(60, 80)), axis=1) % 256).astype(np.uint8)
+    codec = RLEHuffmanCodec(workers=2, **options)
+    payload = codec.compress(image)
+
+    np.testing.assert_array_equal(codec.decompress(payload), image)
+    assert pools == []
+
+    monkeypatch.setattr(huffmancodec, "PARALLEL_BYTES", 0)
+    monkeypatch.setattr(rlehuff, "PARALLEL_BYTES", 0)
+    np.testing.assert_array_equal(codec.decompress(payload), image)
+    assert len(pools) == 1
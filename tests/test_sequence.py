@@ -0,0 +1,99 @@
+import imageio
+import numpy as np
+import pytest
+
+from conftest import EDGE_IMAGES
+from predictive import PredictiveTransform
+from sequence import SequenceCodec
+
+
+def _frames(count=12, shape=(30, 40)):
+    # a moving gradient with some noise, so frames are close but not equal
+    rng = np.random.RandomState(26)
+    y, x = np.indices(shape)
+    return [((x * 3 + y * 2 + 5 * t + rng.randint(0, 4, size=shape)) % 256).astype(np.uint8) for t in range(count)]
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("blend", [False, True])
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_temporal_round_trip(name, blend, vertical):
+    pt = PredictiveTransform()
+    frame = EDGE_IMAGES[name]
+    previous = (255 - frame).astype(np.uint8)
+
+    residuals = pt.temporalEncode(frame, previous, blend, vertical)
+    # the codecs give the residuals back wrapped to 8 bits
+    for given in (residuals, (residuals & 255).astype(np.uint8)):
+        np.testing.assert_array_equal(pt.temporalDecode(given, previous, blend, vertical), frame)
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("blend", [False, True])
+def test_sequence_decode_from_keyframe(blend, vertical):
+    pt = PredictiveTransform()
+    frames = _frames()
+    residuals = pt.sequenceEncode(frames, 4, blend, vertical)
+
+    for start in (0, 4, 8):
+        decoded = pt.sequenceDecode(residuals[start:], 4, blend, vertical, start=start)
+        for frame, expected in zip(decoded, frames[start:]):
+            np.testing.assert_array_equal(frame, expected)
+
+    with pytest.raises(AssertionError):
+        pt.sequenceDecode(residuals[5:], 4, blend, vertical, start=5)
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("blend", [False, True])
+@pytest.mark.parametrize("codec", ["lzw", "rlehuff"])
+def test_round_trip(codec, blend, vertical):
+    frames = _frames()
+    sequence = SequenceCodec(codec)
+    payload = sequence.compress(frames, keyInterval=5, blend=blend, vertical=vertical)
+
+    decoded = sequence.decompress(payload)
+    assert len(decoded) == len(frames)
+    for frame, expected in zip(decoded, frames):
+        np.testing.assert_array_equal(frame, expected)
+
+    # options are read from the payload, and decoding can start at any frame
+    for start, stop in ((7, None), (3, 6), (10, 11), (11, 50)):
+        decoded = SequenceCodec().decompress(payload, start, stop)
+        expected = frames[start:stop]
+        assert len(decoded) == len(expected)
+        for frame, e in zip(decoded, expected):
+            np.testing.assert_array_equal(frame, e)
+
+
+def test_single_frame():
+    frame = EDGE_IMAGES["single-pixel"]
+    sequence = SequenceCodec()
+    decoded = sequence.decompress(sequence.compress([frame, frame]), start=1)
+    assert len(decoded) == 1
+    np.testing.assert_array_equal(decoded[0], frame)
+
+
+def test_files(tmp_path):
+    frames = _frames(count=6)
+    names = []
+    for i, frame in enumerate(frames):
+        names.append(tmp_path / ("frame%d.bmp" % i))
+        imageio.imwrite(names[-1], frame)
+
+    sequence = SequenceCodec("rlehuff")
+    sequence.encode(names, tmp_path / "frames.seq", keyInterval=4, blend=True)
+    outputs = [tmp_path / ("decoded%d.bmp" % i) for i in range(3)]
+    sequence.decode(tmp_path / "frames.seq", outputs, start=2)
+
+    for name, frame in zip(outputs, frames[2:]):
+        np.testing.assert_array_equal(imageio.v2.imread(name), frame)
+
+
+@pytest.mark.parametrize("codec", ["lzw", "rlehuff"])
+def test_rejects_bad_frames(codec):
+    frames = _frames(count=3)
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        SequenceCodec(codec).compress(frames[:2] + [frames[2].astype(np.uint16) * 200])
+    with pytest.raises(ValueError, match="shape"):
+        SequenceCodec(codec).compress(frames[:2] + [frames[2][:-1]])
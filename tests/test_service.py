@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from conftest import random_images
+from service import CompressionClient, CompressionService, ServiceError, read_message, write_message
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def _started(**options):
+    service = CompressionService(port=0, workers=1, **options)
+    await service.start()
+    return service
+
+
+def _noise(size):
+    return np.random.RandomState(22).randint(0, 256, size=size).astype(np.uint8)
+
+
+@pytest.mark.parametrize("codec", ["lzw", "rlehuff"])
+def test_round_trips(codec):
+    async def main():
+        service = await _started()
+        try:
+            async with CompressionClient(port=service.port) as client:
+                for vertical in (False, True):
+                    for image in random_images(5, seed=23):
+                        payload = await client.compress(image, codec=codec, vertical=vertical)
+                        decoded = await client.decompress(payload, codec=codec, vertical=vertical)
+                        np.testing.assert_array_equal(decoded, image)
+                return await client.metrics()
+        finally:
+            await service.stop()
+
+    metrics = _run(main())
+    assert metrics["requests"] == {"ok": 20}
+    assert metrics["queueDepth"] == 0
+    assert 1 <= metrics["maxQueueDepth"]
+    latency = metrics["latency"]
+    assert 0 < latency["p50"] <= latency["p90"] <= latency["p99"] <= latency["max"]
+
+
+def test_busy():
+    image = _noise((600, 600))
+
+    async def send(port):
+        async with CompressionClient(port=port) as client:
+            try:
+                await client.compress(image)
+                return "ok"
+            except ServiceError as e:
+                return e.status
+
+    async def main():
+        service = await _started(queueSize=1)
+        try:
+            statuses = await asyncio.gather(*[send(service.port) for _ in range(6)])
+            return statuses, service.metrics.snapshot()
+        finally:
+            await service.stop()
+
+    statuses, metrics = _run(main())
+    # one request runs, one waits in the queue and the others are turned away
+    assert "busy" in statuses
+    assert "ok" in statuses
+    assert metrics["requests"]["busy"] == statuses.count("busy")
+    assert metrics["maxQueueDepth"] == 1
+
+
+def test_timeout():
+    async def main():
+        service = await _started(timeout=0.01)
+        try:
+            async with CompressionClient(port=service.port) as client:
+                with pytest.raises(ServiceError) as error:
+                    await client.compress(_noise((800, 800)))
+                return error.value.status, await client.metrics()
+        finally:
+            await service.stop()
+
+    status, metrics = _run(main())
+    assert status == "timeout"
+    assert metrics["requests"] == {"timeout": 1}
+    assert "latency" not in metrics
+
+
+@pytest.mark.parametrize("header", [
+    {"op": "compress", "codec": "lzw"},
+    {"op": "compress", "codec": "lzw", "shape": 4},
+    {"op": "compress", "codec": "lzw", "shape": [2]},
+    {"op": "compress", "codec": "lzw", "shape": [2, "2"]},
+    {"op": "compress", "codec": "lzw", "shape": [-2, -2]},
+    {"op": "compress", "codec": "lzw", "shape": [2, 3]},
+    {"op": "compress", "codec": "lzw", "shape": [2, 2], "chunkSize": "big"},
+    {"op": "resize", "codec": "lzw"},
+    {"op": "compress", "codec": "png", "shape": [2, 2]},
+])
+def test_bad_requests(header):
+    async def main():
+        service = await _started()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+            await write_message(writer, header, bytes(4))
+            response, _ = await read_message(reader)
+            # the connection is still served after the error
+            await write_message(writer, {"op": "metrics"})
+            _, metrics = await read_message(reader)
+            writer.close()
+            await writer.wait_closed()
+            return response, json.loads(metrics.decode())
+        finally:
+            await service.stop()
+
+    response, metrics = _run(main())
+    assert response["status"] == "error"
+    assert response["message"]
+    assert metrics["requests"] == {"error": 1}
+
+
+@pytest.mark.parametrize("header", [
+    {"op": "compress", "codec": "lzw", "shape": [100, 100], "length": 10000},
+    {"op": "compress", "codec": "lzw", "length": "big"},
+    [1, 2],
+])
+def test_too_large_or_invalid_messages(header):
+    async def main():
+        service = await _started(maxMessage=1000)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+            # the length is given by hand, the payload is never sent
+            raw = json.dumps(header).encode()
+            writer.write(len(raw).to_bytes(4, "big") + raw)
+            await writer.drain()
+            response, _ = await read_message(reader)
+            # the connection is closed after the error
+            closed = await reader.read() == b""
+            writer.close()
+            await writer.wait_closed()
+
+            async with CompressionClient(port=service.port) as client:
+                image = random_images(1, seed=40)[0]
+                np.testing.assert_array_equal(await client.decompress(await client.compress(image)), image)
+                return response, closed, await client.metrics()
+        finally:
+            await service.stop()
+
+    response, closed, metrics = _run(main())
+    assert response["status"] == "error"
+    assert response["message"]
+    assert closed
+    assert metrics["requests"] == {"error": 1, "ok": 2}
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from conftest import EDGE_IMAGES, random_images
+from stdcodec import BACKENDS, StdlibCodec
+
+
+def _image():
+    rng = np.random.RandomState(27)
+    return (np.cumsum(rng.randint(-3, 4, size=(70, 90)), axis=1) % 256).astype(np.uint8)
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+@pytest.mark.parametrize("chunkRows", [1, 7, 256])
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_round_trip(backend, chunkRows, vertical):
+    codec = StdlibCodec(backend, chunkRows=chunkRows)
+    image = _image()
+    payload = codec.compress(image, vertical)
+    assert payload[0] == BACKENDS[backend][0]
+    np.testing.assert_array_equal(codec.decompress(payload, vertical), image)
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_edge_images(name, backend):
+    codec = StdlibCodec(backend, chunkRows=1)
+    image = EDGE_IMAGES[name]
+    np.testing.assert_array_equal(codec.decompress(codec.compress(image)), image)
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_backend_read_from_data(backend):
+    image = _image()
+    np.testing.assert_array_equal(StdlibCodec().decompress(StdlibCodec(backend, level=1).compress(image)), image)
+
+
+@pytest.mark.parametrize("chunkRows", [1, 5, 256])
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_workers(backend, chunkRows):
+    # the threads give the same bytes as one thread
+    single = StdlibCodec(backend, chunkRows=chunkRows)
+    threaded = StdlibCodec(backend, chunkRows=chunkRows, workers=4)
+    for image in random_images(5, seed=28) + [_image()]:
+        payload = single.compress(image)
+        assert threaded.compress(image) == payload
+        np.testing.assert_array_equal(threaded.decompress(payload), image)
+
+
+def test_rejects_wider_images():
+    image = _image().astype(np.uint16) * 200
+    codec = StdlibCodec()
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        codec.compress(image)
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        codec.compress_residuals(np.array([[0, -300]]))
+
+
+def test_chunk_rows_must_be_positive():
+    with pytest.raises(AssertionError):
+        StdlibCodec(chunkRows=0)
@@ -0,0 +1,117 @@
+"""
+
+Throughput regression gate: each operation must keep at least THROUGHPUT_TOLERANCE (default 0.5) times the throughput stored in
+baselines.json, so a faster engine can be swapped in and a slower one is caught.
+
+Throughputs are relative to a reference loop (Python and numpy work, like the codecs) timed in the same run: the baselines are
+pixels per reference loop, not pixels per second. The ratio still depends on the interpreter, numpy and the CPU, so the gate is
+opt-in (marked "perf", run with PERF_TESTS=1) and is meant to compare runs on the same machine. Set UPDATE_BASELINES=1 to store
+the throughput measured here instead of checking it, and THROUGHPUT_TOLERANCE to loosen or tighten the gate (0 disables it).
+
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from lzw import LZWCodec
+from predictive import PredictiveTransform
+from rlehuff import RLEHuffmanCodec
+
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+TOLERANCE = float(os.environ.get("THROUGHPUT_TOLERANCE", "0.5"))
+UPDATE = os.environ.get("UPDATE_BASELINES") == "1"
+REPEAT = 3
+MIN_TIME = 0.05
+
+
+def _image():
+    rng = np.random.RandomState(13)
+    return (np.cumsum(rng.randint(-3, 4, size=(256, 256)), axis=1) % 256).astype(np.uint8)
+
+
+def _reference_loop(data):
+    """
+    Fixed amount of work to compare the operations with: a dictionary filled in a Python loop and a few numpy passes.
+    """
+    counts = {}
+    for value in data.tolist():
+        counts[value] = counts.get(value, 0) + 1
+    return int(np.cumsum(data).sum() + np.sort(data)[len(data) // 2]), len(counts)
+
+
+def _measure(function, argument):
+    """
+    Returns:
+        float: runs per second, best of REPEAT measures (the others may be slowed down by the machine), each one running for at
+        least MIN_TIME seconds
+    """
+    best = 0
+    for _ in range(REPEAT):
+        runs = 0
+        t1 = time.perf_counter()
+        while (runs == 0 or time.perf_counter() - t1 < MIN_TIME):
+            function(argument)
+            runs += 1
+        best = max(best, runs / (time.perf_counter() - t1))
+    return best
+
+
+def _reference():
+    """
+    Returns:
+        float: reference loops per second on this machine, now
+    """
+    return _measure(_reference_loop, np.random.RandomState(35).randint(0, 512, size=2**16))
+
+
+def _operations():
+    """
+    Returns:
+        dict: name -> (function to be timed, its argument)
+    """
+    image = _image()
+    pt = PredictiveTransform()
+    lzw = LZWCodec()
+    rle = RLEHuffmanCodec()
+    return {
+        "predictive-encode": (pt.encode, image),
+        "predictive-decode": (pt.decode, pt.encode(image)),
+        "lzw-compress": (lzw.compress, image),
+        "lzw-decompress": (lzw.decompress, lzw.compress(image)),
+        "rlehuff-compress": (rle.compress, image),
+        "rlehuff-decompress": (rle.decompress, rle.compress(image)),
+    }
+
+
+def _load_baselines():
+    if not os.path.exists(BASELINES):
+        return {}
+    with open(BASELINES) as fp:
+        return json.load(fp)
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("name", sorted(_operations()))
+def test_throughput(name):
+    function, argument = _operations()[name]
+    pixels = _image().size
+
+    # the reference is timed right before the operation, so both see the machine in the same state
+    reference = _reference()
+    throughput = pixels * _measure(function, argument) / reference
+
+    baselines = _load_baselines()
+    if (UPDATE):
+        baselines[name] = round(throughput, 1)
+        with open(BASELINES, "w") as fp:
+            json.dump(baselines, fp, indent=4, sort_keys=True)
+        return
+
+    if (name not in baselines):
+        pytest.skip("no baseline for " + name + " (run with UPDATE_BASELINES=1)")
+    assert throughput >= TOLERANCE * baselines[name], "%s: %.1f pixels per reference loop, baseline %.1f" % (name, throughput, baselines[name])
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from conftest import EDGE_IMAGES
+from tiling import CODECS, TileCodec, new_tiles_grid
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_many_new_tiles(codec):
+    # more than 4096 new tiles: a single column of them used to overflow the 16-bit shape of LZW
+    rng = np.random.RandomState(14)
+    image = rng.randint(0, 256, size=(272, 276)).astype(np.uint8)
+
+    tiles = TileCodec(tileSize=4, codec=codec)
+    kinds, _, _, new, _ = tiles.tile_map(image)
+    assert len(new) > 4096
+    np.testing.assert_array_equal(tiles.decompress(tiles.compress(image)), image)
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_constant_and_repeated_tiles(codec):
+    rng = np.random.RandomState(15)
+    tile = rng.randint(0, 256, size=(16, 16))
+    image = np.full((70, 90), 200, dtype=np.uint8)
+    image[:16, :16] = tile
+    image[32:48, 48:64] = tile
+    image[-3:, -5:] = 7
+
+    tiles = TileCodec(codec=codec)
+    np.testing.assert_array_equal(tiles.decompress(tiles.compress(image, vertical=True)), image)
+
+
+@pytest.mark.parametrize("name", sorted(EDGE_IMAGES))
+def test_round_trip_edge_images(name):
+    tiles = TileCodec(tileSize=4, codec="lzw")
+    np.testing.assert_array_equal(tiles.decompress(tiles.compress(EDGE_IMAGES[name])), EDGE_IMAGES[name])
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 5, 4097])
+def test_new_tiles_grid(count):
+    rows, columns = new_tiles_grid(count)
+    assert rows * columns >= count
+    assert rows * columns - count < max(columns, 1)
+
+
+def test_rejects_wider_images():
+    image = np.full((20, 20), 1000, dtype=np.uint16)
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        TileCodec().compress(image)
+    with pytest.raises(ValueError, match="HighDepthCodec"):
+        TileCodec().tile_map(image.astype(np.int64))
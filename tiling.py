@@ -0,0 +1,255 @@
+"""
+
+module:: TileCodec
+    :synopsis: Tiling pre-pass for images with large constant areas and repeated tiles (synthetic images, scanned documents...).
+    Constant tiles are stored as one value, repeated tiles as a reference to the first one, and only the new tiles go to a codec.
+
+Several libs are imported here:
+    matplotlib
+    numpy
+    json
+    zlib
+    imageio
+    LZWCodec
+    RLEHuffmanCodec
+    StdlibCodec
+    check_image (predictive)
+
+
+File format: 4 bytes (big endian) with the length of a JSON header, the JSON header, the tile map (compressed with zlib) and then the
+new tiles, laid out as a near-square grid of tiles (see new_tiles_grid()), encoded by the chosen codec.
+
+The tile map has one kind per tile (CONSTANT, REPEATED or NEW), the value of each constant tile (uint8) and the index of the new tile
+each repeated tile refers to (uint32).
+
+"""
+
+import json
+import math
+import zlib
+import numpy as np
+import matplotlib.image as mpimg
+import imageio
+from lzw import LZWCodec
+from rlehuff import RLEHuffmanCodec
+from stdcodec import StdlibCodec
+from predictive import check_image
+
+
+CODECS = {"lzw": LZWCodec, "rlehuff": RLEHuffmanCodec, "zlib": StdlibCodec}
+
+CONSTANT = 0
+REPEATED = 1
+NEW = 2
+
+
+def split_tiles(data, tileSize):
+    """
+    Splits an image in square tiles (row by row). The image is padded by repeating its last row and column.
+
+    Parameters:
+        data (2D array): image
+        tileSize (int): size of the tiles
+
+    Returns:
+        3D array: tiles (number of tiles, tileSize, tileSize)
+        tuple: number of tiles in each direction
+    """
+    heigth, length = data.shape
+    data = np.pad(data, ((0, -heigth % tileSize), (0, -length % tileSize)), mode="edge")
+    rows, columns = data.shape[0] // tileSize, data.shape[1] // tileSize
+
+    tiles = data.reshape(rows, tileSize, columns, tileSize).swapaxes(1, 2)
+    return tiles.reshape(rows * columns, tileSize, tileSize), (rows, columns)
+
+
+def join_tiles(tiles, grid, shape):
+    """
+    Inverse of split_tiles().
+
+    Parameters:
+        tiles (3D array): tiles (number of tiles, tileSize, tileSize)
+        grid (tuple): number of tiles in each direction
+        shape (tuple): shape of the image
+
+    Returns:
+        2D array: image
+    """
+    rows, columns = grid
+    tileSize = tiles.shape[1]
+    data = tiles.reshape(rows, columns, tileSize, tileSize).swapaxes(1, 2).reshape(rows * tileSize, columns * tileSize)
+    return data[:shape[0], :shape[1]]
+
+
+def new_tiles_grid(count):
+    """
+    Near-square grid the new tiles are laid out in, so neither side of the image given to the codec grows with the number of
+    tiles as fast as a single column would (LZW stores the shape in 16 bits).
+
+    Parameters:
+        count (int): number of new tiles
+
+    Returns:
+        tuple: number of tiles in each direction (rows, columns), rows * columns >= count
+    """
+    columns = math.isqrt(count - 1) + 1 if count > 0 else 0
+    return (-(-count // columns) if columns > 0 else 0), columns
+
+
+class TileCodec:
+    """
+    This codec finds constant and repeated tiles, and encodes the other tiles with LZW, RLE + Huffman or zlib.
+
+    Use only encode() and decode(), or compress() and decompress() in memory.
+    """
+
+    def __init__(self, tileSize=16, codec="zlib"):
+        """
+        Codec constructor.
+
+        Parameters:
+            tileSize (int): size of the (square) tiles. Default: 16
+            codec (string): codec of the new tiles, "lzw", "rlehuff" or "zlib". Default: "zlib"
+        """
+        self.tileSize = tileSize
+        self.codec = codec
+
+
+    def tile_map(self, data):
+        """
+        Classifies the tiles of an image.
+
+        Parameters:
+            data (2D array): image (uint8)
+
+        Returns:
+            array: kind of each tile (CONSTANT, REPEATED or NEW)
+            array: value of each constant tile
+            array: for each repeated tile, index (among the new tiles) of the tile it repeats
+            3D array: new tiles
+            tuple: number of tiles in each direction
+        """
+        tiles, grid = split_tiles(check_image(data, "TileCodec"), self.tileSize)
+
+        flat = tiles.reshape(len(tiles), -1)
+        constant = flat.min(axis=1) == flat.max(axis=1)
+
+        kinds = np.full(len(tiles), NEW, dtype=np.uint8)
+        kinds[constant] = CONSTANT
+        references = []
+        new = []
+        seen = {}
+        for i in np.flatnonzero(~constant):
+            key = flat[i].tobytes()
+            if key in seen:
+                kinds[i] = REPEATED
+                references.append(seen[key])
+            else:
+                seen[key] = len(new)
+                new.append(i)
+
+        return kinds, flat[constant, 0], np.array(references, dtype=np.uint32), tiles[new], grid
+
+
+    def compress(self, data, vertical=False):
+        """
+        Encodes a given image in memory.
+
+        Parameters:
+            data (2D array): image to be encoded (uint8)
+            vertical (boolean): if True, the codec calls Predictive in vertical mode. Default: False.
+
+        Returns:
+            bytes: encoded data (see the file format)
+        """
+        kinds, values, references, new, _ = self.tile_map(data)
+
+        tile_map = zlib.compress(kinds.tobytes() + values.astype(np.uint8).tobytes() + references.astype(">u4").tobytes())
+        tiles = b""
+        if (len(new) > 0):
+            # the grid is completed by repeating the last new tile
+            grid = new_tiles_grid(len(new))
+            new = np.concatenate([new, np.repeat(new[-1:], grid[0] * grid[1] - len(new), axis=0)])
+            new = join_tiles(new, grid, (grid[0] * self.tileSize, grid[1] * self.tileSize))
+            tiles = CODECS[self.codec]().compress(new, vertical=vertical)
+
+        header = {
+            "shape": list(np.shape(data)),
+            "tileSize": self.tileSize,
+            "codec": self.codec,
+            "vertical": vertical,
+            "tiles": len(kinds),
+            "sizes": [len(tile_map), len(tiles)],
+        }
+        header = json.dumps(header).encode()
+
+        return len(header).to_bytes(4, "big") + header + tile_map + tiles
+
+
+    def decompress(self, payload):
+        """
+        Decodes the output of compress() back to the image, in memory. Options are read from the data.
+
+        Parameters:
+            payload (bytes): data given by compress()
+
+        Returns:
+            2D array: decoded image (uint8)
+        """
+        size = int.from_bytes(payload[:4], "big")
+        header = json.loads(bytes(payload[4:4 + size]).decode())
+        offset = 4 + size
+        count = header["tiles"]
+        tileSize = header["tileSize"]
+        map_size, tiles_size = header["sizes"]
+
+        tile_map = zlib.decompress(payload[offset:offset + map_size])
+        offset += map_size
+        kinds = np.frombuffer(tile_map[:count], dtype=np.uint8)
+        constants = np.count_nonzero(kinds == CONSTANT)
+        values = np.frombuffer(tile_map[count:count + constants], dtype=np.uint8)
+        references = np.frombuffer(tile_map[count + constants:], dtype=">u4")
+
+        new = np.zeros((0, tileSize, tileSize), dtype=np.uint8)
+        if (tiles_size > 0):
+            new = CODECS[header["codec"]]().decompress(payload[offset:offset + tiles_size], vertical=header["vertical"])
+            new, _ = split_tiles(new.astype(np.uint8), tileSize)
+            new = new[:np.count_nonzero(kinds == NEW)]
+
+        tiles = np.empty((count, tileSize, tileSize), dtype=np.uint8)
+        tiles[kinds == CONSTANT] = values[:, None, None]
+        tiles[kinds == REPEATED] = new[references.astype(np.int64)]
+        tiles[kinds == NEW] = new
+
+        shape = header["shape"]
+        grid = (-(-shape[0] // tileSize), -(-shape[1] // tileSize))
+        return join_tiles(tiles, grid, shape)
+
+
+    def encode(self, filein, fileout, vertical=False):
+        """
+        Encodes a given file and outputs it in another file.
+
+        Parameters:
+            filein (string): file to be encoded (.bmp format)
+            fileout (string): file to be created as output
+            vertical (boolean): if True, the codec calls Predictive in vertical mode. Default: False.
+        """
+        data = mpimg.imread(filein)
+
+        with open(fileout, "wb") as f:
+            f.write(self.compress(data, vertical))
+
+
+    def decode(self, filein, fileout):
+        """
+        Decodes a given file and outputs the decoded data into a .bmp (bitmap) file. Options are read from the file.
+
+        Parameters:
+            filein (string): file to be decoded
+            fileout (string): file to be created and outputted (preferably .bmp format)
+        """
+        with open(filein, "rb") as f:
+            payload = f.read()
+
+        imageio.imwrite(fileout, self.decompress(payload))